@@ -10,11 +10,15 @@ To adapt it for the cross-language execution, the following two different method
 """
 
 import argparse, sys, ontology_reader, dataset_walker, time, json, copy
-from fuzzywuzzy import fuzz
+from profiler import Profiler, get_profile_filename
+from ontology_matcher import CandidateIndex
 
 class BaselineMethod1(object):
-    def __init__(self, tagsets):
+    def __init__(self, tagsets, nbest=1, index=None):
         self.tagsets = tagsets
+        self.nbest = nbest
+        # the index can be shared by the trackers of several sessions
+        self.index = index or CandidateIndex.from_tagsets(tagsets)
         self.frame = {}
         self.memory = {}
 
@@ -23,9 +27,9 @@ class BaselineMethod1(object):
     def addUtter(self, utter, translations):
         output = {'utter_index': utter['utter_index']}
         
-        top_hyp = ''
-        if len(translations['translated']) > 0:
-            top_hyp = translations['translated'][0]['hyp']
+        hyps = [hypothesis['hyp'] for hypothesis in translations['translated'][:self.nbest]]
+        if len(hyps) == 0:
+            hyps = ['']
 
         topic = utter['segment_info']['topic']
 
@@ -33,14 +37,7 @@ class BaselineMethod1(object):
             self.frame = {}
             
         if topic in self.tagsets:
-            for slot in self.tagsets[topic]:
-                for value in self.tagsets[topic][slot]:
-                    ratio = fuzz.partial_ratio(value, top_hyp)
-                    if ratio > 80:
-                        if slot not in self.frame:
-                            self.frame[slot] = []
-                        if value not in self.frame[slot]:
-                            self.frame[slot].append(value)
+            self.index.match(topic, hyps, self.frame)
             if topic == 'ATTRACTION' and 'PLACE' in self.frame and 'NEIGHBOURHOOD' in self.frame and self.frame['PLACE'] == self.frame['NEIGHBOURHOOD']:
                 del self.frame['PLACE']
 
@@ -51,8 +48,11 @@ class BaselineMethod1(object):
         self.frame = {}
 
 class BaselineMethod2(object):
-    def __init__(self, translated_tagsets):
+    def __init__(self, translated_tagsets, nbest=1, index=None):
         self.translated_tagsets = translated_tagsets
+        self.nbest = nbest
+        # the index can be shared by the trackers of several sessions
+        self.index = index or CandidateIndex.from_translated_tagsets(translated_tagsets, nbest)
         self.frame = {}
         self.memory = {}
 
@@ -68,18 +68,7 @@ class BaselineMethod2(object):
             self.frame = {}
             
         if topic in self.translated_tagsets:
-            for slot in self.translated_tagsets[topic]:
-                for value_obj in self.translated_tagsets[topic][slot]:
-                    entry_en = value_obj['entry_en']
-                    if len(value_obj['translated_cn']) > 0:
-                        top_hyp = value_obj['translated_cn'][0]
-                    
-                        ratio = fuzz.partial_ratio(top_hyp, transcript)
-                        if ratio > 80:
-                            if slot not in self.frame:
-                                self.frame[slot] = []
-                            if entry_en not in self.frame[slot]:
-                                self.frame[slot].append(entry_en)
+            self.index.match(topic, [transcript], self.frame)
             if topic == 'ATTRACTION' and 'PLACE' in self.frame and 'NEIGHBOURHOOD' in self.frame and self.frame['PLACE'] == self.frame['NEIGHBOURHOOD']:
                 del self.frame['PLACE']
 
@@ -96,8 +85,12 @@ def main(argv):
     parser.add_argument('--trackfile',dest='trackfile',action='store',required=True,metavar='JSON_FILE', help='File to write with tracker output')
     parser.add_argument('--ontology',dest='ontology',action='store',metavar='JSON_FILE',required=True,help='JSON Ontology file')
     parser.add_argument('--method',dest='method',action='store',choices=['1', '2'],required=True,help='Baseline mode')
+    parser.add_argument('--nbest',dest='nbest',action='store',type=int,default=1,metavar='N',help='Number of translations to match: of the utterances for method 1, of the ontology entries for method 2')
+    parser.add_argument('--profile',dest='profile',action='store_true',help='Write the stage timings, utterance latencies and peak memory to <trackfile>.profile.json')
+    parser.add_argument('--timing',dest='timing',action='store_true',help='Include the time taken to track each utterance in the tracker output')
 
     args = parser.parse_args()
+    profiler = Profiler()
     dataset = dataset_walker.dataset_walker(args.dataset, dataroot=args.dataroot, labels=False, translations = True)
 
     track_file = open(args.trackfile, "wb")
@@ -105,29 +98,38 @@ def main(argv):
     track["dataset"]  = args.dataset
     start_time = time.time()
 
-    if args.method == '1':
-        tagsets = ontology_reader.OntologyReader(args.ontology).get_tagsets()
-        tracker = BaselineMethod1(tagsets)
-    elif args.method == '2':
-        translated_tagsets = ontology_reader.OntologyReader(args.ontology).get_translated_tagsets()
-        tracker = BaselineMethod2(translated_tagsets)
+    with profiler.stage('loading'):
+        if args.method == '1':
+            tagsets = ontology_reader.OntologyReader(args.ontology).get_tagsets()
+            tracker = BaselineMethod1(tagsets, args.nbest)
+        elif args.method == '2':
+            translated_tagsets = ontology_reader.OntologyReader(args.ontology).get_translated_tagsets()
+            tracker = BaselineMethod2(translated_tagsets, args.nbest)
 
-    for call in dataset:
+    for call in profiler.iter_stage('loading', dataset):
         this_session = {"session_id":call.log["session_id"], "utterances":[]}
         tracker.reset()
         for (utter, translations, _) in call:
             sys.stderr.write('%d:%d      \r'%(call.log['session_id'], utter['utter_index']))
-            tracker_result = tracker.addUtter(utter, translations)
+            with profiler.utterance('matching'):
+                tracker_result = tracker.addUtter(utter, translations)
             if tracker_result is not None:
-                this_session["utterances"].append(copy.deepcopy(tracker_result))
+                tracker_result = copy.deepcopy(tracker_result)
+                if args.timing:
+                    tracker_result['wall_time'] = profiler.get_last_latency()
+                this_session["utterances"].append(tracker_result)
         track["sessions"].append(this_session)
     end_time = time.time()
     elapsed_time = end_time - start_time
     track['wall_time'] = elapsed_time
 
-    json.dump(track, track_file, indent=4)
+    with profiler.stage('serialisation'):
+        json.dump(track, track_file, indent=4)
 
     track_file.close()
 
+    if args.profile:
+        profiler.save(get_profile_filename(args.trackfile))
+
 if __name__ =="__main__":
     main(sys.argv)
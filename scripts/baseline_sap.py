@@ -9,40 +9,49 @@ Then, the models are used in analyzing the English translation of each Chinese u
 Finally, the predicted annotations on the English side are projected to the original Chinese utterances.
 """
 
-from sklearn.pipeline import Pipeline
 from sklearn.svm import LinearSVC
 from sklearn.multiclass import OneVsRestClassifier
-from sklearn.feature_extraction.text import CountVectorizer
 from sklearn import preprocessing
 
-from itertools import combinations
-
 import pickle
 import argparse
 import sys
 import dataset_walker
 import time
 import json
+from profiler import Profiler, get_profile_filename
+from sap_features import SAPContextBuilder, SAPFeatureIndexer, SAPFeatureHasher, combine_acts
+
 
-import operator
-import copy
+def iter_contexts(call, roletype):
+    """
+    Walks a session once and yields (log_utter, label_utter, context) for every utterance spoken by the target role.
+    """
+    builder = SAPContextBuilder(roletype)
 
-import re
+    for (log_utter, translations, label_utter) in call:
+        context = builder.add(log_utter)
+        if context is not None:
+            yield log_utter, label_utter, context
 
 
 class SimpleSAP:
-    def __init__(self):
+    def __init__(self, hashbits=None):
         self.__speech_act_instance_list = []
+        if hashbits is None:
+            self.__indexer = SAPFeatureIndexer()
+        else:
+            self.__indexer = SAPFeatureHasher(hashbits)
         self.__speech_act_model = None
         self.__speech_act_lb = None
 
     def load_model(self, modelfile):
-        with open(modelfile, 'r') as f:
-            self.__speech_act_model, self.__speech_act_lb = pickle.load(f)
+        with open(modelfile, 'rb') as f:
+            self.__indexer, self.__speech_act_model, self.__speech_act_lb = pickle.load(f)
 
         return True
 
-    def add_instance(self, instance, speech_act):
+    def add_instance(self, context, speech_act):
         sa_label_list = []
         for sa in speech_act:
             sa_labels = ['%s_%s' % (sa['act'], attr) for attr in sa['attributes']]
@@ -50,80 +59,54 @@ class SimpleSAP:
 
         sa_label_list = sorted(set(sa_label_list))
 
-        feats = self.__get_feats(instance)
-        bi_feats = ['%s+%s' % (x, y) for x, y in combinations(feats, 2)]
-
-        self.__speech_act_instance_list.append((' '.join(feats + bi_feats), sa_label_list))
+        self.__speech_act_instance_list.append((context, sa_label_list))
 
         return True
 
-    def __get_feats(self, instance):
-        result = []
-        # current semantic tag features
-        if len(instance['curr_semantic_tags']) == 0:
-            result.append('curr_semantic_tag:null')
-        else:
-            for tag in instance['curr_semantic_tags']:
-                main_cat = tag['main']
-                sub_cat = tag['attributes']['cat']
-                result.append('curr_semantic_tag:%s' % (main_cat,))
-                result.append('curr_semantic_tag:%s_%s' % (main_cat, sub_cat))
-
-        # previous semantic tag features
-        if instance['prev_semantic_tags'] is None or len(instance['prev_semantic_tags']) == 0:
-            result.append('prev_semantic_tag:null')
-        else:
-            for tag in instance['prev_semantic_tags']:
-                main_cat = tag['main']
-                sub_cat = tag['attributes']['cat']
-                result.append('prev_semantic_tag:%s' % (main_cat,))
-                result.append('prev_semantic_tag:%s_%s' % (main_cat, sub_cat))
-
-        # previous turn speech act features
-        if instance['prev_turn_act'] is None:
-            result.append('prev_turn_act:null')
-        else:
-            for act in instance['prev_turn_act']:
-                main_act = act['act']
-                result.append('prev_turn_act:%s' % (main_act,))
-
-                for attr in act['attributes']:
-                    result.append('prev_turn_act:%s_%s' % (main_act, attr))
-
-        # distance from the previuos turn features
-        dist = instance['dist_from_prev_turn']
-        if dist == 1:
-            result.append('dist_from_prev_turn:1')
-        elif dist == 2:
-            result.append('dist_from_prev_turn:2')
-        else:
-            result.append('dist_from_prev_turn>2')
-
-        return result
-
     def train(self, modelfile):
-        sa_feats = [x for x, _ in self.__speech_act_instance_list]
+        sa_feats = self.__indexer.transform([x for x, _ in self.__speech_act_instance_list])
         sa_labels = [y for _, y in self.__speech_act_instance_list]
 
+        report = self.__indexer.get_collision_report()
+        if report is not None:
+            sys.stderr.write('Hashed %d features into %d of %d columns, %d features share a column with others\n' % (
+                report['features'], report['used_columns'], report['columns'], report['colliding_features']))
+        self.__indexer.freeze()
+
         self.__speech_act_lb = preprocessing.MultiLabelBinarizer()
         sa_labels = self.__speech_act_lb.fit_transform(sa_labels)
 
-        self.__speech_act_model = Pipeline([
-            ('vectorizer', CountVectorizer()),
-            ('clf', OneVsRestClassifier(LinearSVC(verbose=True)))])
-
+        self.__speech_act_model = OneVsRestClassifier(LinearSVC(verbose=True))
         self.__speech_act_model.fit(sa_feats, sa_labels)
 
-        with open(modelfile, 'wb') as f:
-            pickle.dump((self.__speech_act_model, self.__speech_act_lb), f)
+        if report is not None:
+            # most of the hashed columns are never used, so the weights are stored as sparse matrices
+            for estimator in self.__speech_act_model.estimators_:
+                if hasattr(estimator, 'sparsify'):
+                    estimator.sparsify()
 
-    def pred(self, instance):
-        feats = self.__get_feats(instance)
-        bi_feats = ['%s+%s' % (x, y) for x, y in combinations(feats, 2)]
+        with open(modelfile, 'wb') as f:
+            pickle.dump((self.__indexer, self.__speech_act_model, self.__speech_act_lb), f, pickle.HIGHEST_PROTOCOL)
 
-        pred_act = self.__speech_act_lb.inverse_transform(self.__speech_act_model.predict([' '.join(feats + bi_feats)]))
+    def pred(self, context):
+        pred_act = self.__speech_act_lb.inverse_transform(self.__speech_act_model.predict(self.__indexer.transform([context])))
         return pred_act
 
+    def pred_many(self, contexts):
+        if len(contexts) == 0:
+            return []
+        pred_acts = self.__speech_act_lb.inverse_transform(self.__speech_act_model.predict(self.__indexer.transform(contexts)))
+        return pred_acts
+
+
+def predict_pending(sap, pending):
+    """
+    Predicts the speech acts for a list of (sap_result, context) pairs in a single call.
+    """
+    pred_acts = sap.pred_many([context for _, context in pending])
+    for (sap_result, _), act_labels in zip(pending, pred_acts):
+        sap_result['speech_act'] = combine_acts(act_labels)
+
 
 def main(argv):
     parser = argparse.ArgumentParser(description='Simple SAP baseline.')
@@ -133,29 +116,25 @@ def main(argv):
     parser.add_argument('--modelfile', dest='modelfile', action='store', required=True, metavar='MODEL_FILE',  help='File to write with trained model')
     parser.add_argument('--outfile', dest='outfile', action='store', required=True, metavar='JSON_FILE',  help='File to write with SAP output')
     parser.add_argument('--roletype', dest='roletype', action='store', choices=['GUIDE',  'TOURIST'], required=True,  help='Target role')
+    parser.add_argument('--batch', dest='batch', action='store', choices=['session', 'testset'], default='session', help='Predict the utterances of each session or of the whole test set at once')
+    parser.add_argument('--hashbits', dest='hashbits', action='store', type=int, metavar='BITS', help='Hash the features and their conjunctions into 2^BITS columns instead of keeping a vocabulary')
+    parser.add_argument('--profile', dest='profile', action='store_true', help='Write the stage timings, utterance latencies and peak memory to <outfile>.profile.json')
 
     args = parser.parse_args()
+    profiler = Profiler()
 
-    sap = SimpleSAP()
+    sap = SimpleSAP(args.hashbits)
 
     trainset = dataset_walker.dataset_walker(args.trainset, dataroot=args.dataroot, labels=True, translations=True, task='SAP', roletype=args.roletype.lower())
     sys.stderr.write('Loading training instances ... ')
 
-    for call in trainset:
-        instance = {'prev_turn_act': None, 'curr_semantic_tags': None, 'prev_semantic_tags': None, 'dist_from_prev_turn': 0}
-        for (log_utter, translations, label_utter) in call:
-            if log_utter['speaker'].lower() == args.roletype.lower():
-                instance['curr_semantic_tags'] = log_utter['semantic_tags']
-                instance['dist_from_prev_turn'] += 1
-
-                sap.add_instance(copy.deepcopy(instance), label_utter['speech_act'])
-            else:
-                instance['prev_turn_act'] = log_utter['speech_act']
-                instance['dist_from_prev_turn'] = 0
-            instance['prev_semantic_tags'] = log_utter['semantic_tags']
+    for call in profiler.iter_stage('loading', trainset):
+        for (log_utter, label_utter, context) in iter_contexts(call, args.roletype):
+            sap.add_instance(context, label_utter['speech_act'])
     sys.stderr.write('Done\n')
 
-    sap.train(args.modelfile)
+    with profiler.stage('training'):
+        sap.train(args.modelfile)
 
     output = {'sessions': []}
     output['dataset'] = args.testset
@@ -165,51 +144,37 @@ def main(argv):
 
     testset = dataset_walker.dataset_walker(args.testset, dataroot=args.dataroot, labels=False, translations=True, task='SAP', roletype=args.roletype.lower())
     sys.stderr.write('Loading testing instances ... ')
-    for call in testset:
+    pending = []
+    for call in profiler.iter_stage('loading', testset):
         this_session = {"session_id": call.log["session_id"], "utterances": []}
 
-        instance = {'prev_turn_act': None, 'curr_semantic_tags': None, 'prev_semantic_tags': None, 'dist_from_prev_turn': 0}
-
-        for (log_utter, translations, label_utter) in call:
-            if log_utter['speaker'].lower() == args.roletype.lower():
-                sap_result = {'utter_index': log_utter['utter_index']}
-
-                instance['curr_semantic_tags'] = log_utter['semantic_tags']
-                instance['dist_from_prev_turn'] += 1
-
-                pred_act = sap.pred(copy.deepcopy(instance))
-                combined_act = {}
-                for act_label in reduce(operator.add, pred_act):
-                    m = re.match('^([^_]+)_(.+)$', act_label)
-                    act = m.group(1)
-                    attr = m.group(2)
-                    if act not in combined_act:
-                        combined_act[act] = []
-                    if attr not in combined_act[act]:
-                        combined_act[act].append(attr)
-
-                sap_result['speech_act'] = []
-                for act in combined_act:
-                    attr = combined_act[act]
-                    sap_result['speech_act'].append({'act': act, 'attributes': attr})
-
-                this_session['utterances'].append(sap_result)
-            else:
-                instance['prev_turn_act'] = log_utter['speech_act']
-                instance['dist_from_prev_turn'] = 0
-            instance['prev_semantic_tags'] = log_utter['semantic_tags']
+        for (log_utter, label_utter, context) in iter_contexts(call, args.roletype):
+            this_session['utterances'].append({'utter_index': log_utter['utter_index']})
+            pending.append((this_session['utterances'][-1], context))
 
         output['sessions'].append(this_session)
+
+        if args.batch == 'session':
+            with profiler.batch('prediction', len(pending)):
+                predict_pending(sap, pending)
+            pending = []
+    with profiler.batch('prediction', len(pending)):
+        predict_pending(sap, pending)
     sys.stderr.write('Done\n')
 
     end_time = time.time()
     elapsed_time = end_time - start_time
     output['wall_time'] = elapsed_time
 
-    with open(args.outfile, "wb") as of:
-        json.dump(output, of, indent=4)
+    with profiler.stage('serialisation'):
+        with open(args.outfile, "wb") as of:
+            json.dump(output, of, indent=4)
+
+    if args.profile:
+        profiler.save(get_profile_filename(args.outfile))
 
     sys.stderr.write('Done\n')
 
 if __name__ == "__main__":
     main(sys.argv)
+
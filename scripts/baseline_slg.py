@@ -8,23 +8,203 @@ A simple baseline system for SLG pilot task of DSTC5.
 
 import argparse
 import sys
+import os
 
 import time
 import json
+from profiler import Profiler, get_profile_filename
 
 import dataset_walker
 
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.neighbors import NearestNeighbors
 
+from scipy.sparse import csr_matrix
+
+import numpy as np
+
+
+class BruteForceRetriever:
+    """
+    1-NN retrieval with sklearn NearestNeighbors (euclidean distance), which computes the distances to all the training instances,
+    as sklearn does for any sparse feature matrix.
+    """
+    def __init__(self, metric='euclidean'):
+        if metric != 'euclidean':
+            raise RuntimeError('Unsupported metric for brute force retrieval: %s' % (metric,))
+        self.__model = None
+
+    def fit(self, vecs, postings=None):
+        self.__model = NearestNeighbors(n_neighbors=1, algorithm='brute').fit(vecs)
+
+    def query(self, vecs):
+        distances, indices = self.__model.kneighbors(vecs)
+        return [idx[0] for idx in indices]
+
+
+class InvertedIndexRetriever:
+    """
+    1-NN retrieval over an inverted index of the feature tokens.
+    Only the training instances sharing at least one token with a query are scored by the index,
+    then the candidates of all the queries are ranked at once with the exact cosine similarity or euclidean distance.
+    The closest instance without any shared token is the one with the smallest norm which isn't a candidate.
+    Ties are broken by the lower instance index.
+    """
+    def __init__(self, metric='euclidean'):
+        if metric not in ['euclidean', 'cosine']:
+            raise RuntimeError('Unsupported metric for inverted index retrieval: %s' % (metric,))
+        self.__metric = metric
+        self.__postings = None
+        self.__sq_norms = None
+        self.__by_sq_norm = None
+        self.__sq_norm_ranks = None
+
+    def fit(self, vecs, postings=None):
+        """
+        Takes the CSR feature matrix of the training instances, and optionally its transpose in CSR, such as the memory-mapped one of a saved index.
+        """
+        vecs = vecs.tocsr()
+        if vecs.dtype != np.float64:
+            vecs = vecs.astype(np.float64)
+        # term x instance matrix, whose rows are the posting lists
+        if postings is None:
+            postings = get_postings(vecs)
+        self.__postings = postings
+        self.__sq_norms = np.asarray(vecs.multiply(vecs).sum(axis=1)).ravel()
+        # instances ordered by norm, and the position of each instance in that order
+        self.__by_sq_norm = np.lexsort((np.arange(len(self.__sq_norms)), self.__sq_norms))
+        self.__sq_norm_ranks = np.empty(len(self.__by_sq_norm), dtype=np.int64)
+        self.__sq_norm_ranks[self.__by_sq_norm] = np.arange(len(self.__by_sq_norm))
+
+    def query(self, vecs):
+        vecs = vecs.tocsr().astype(np.float64)
+        q_sq_norms = np.asarray(vecs.multiply(vecs).sum(axis=1)).ravel()
+        # the candidates of each query are the non-zero dot products of its row
+        dots = vecs.dot(self.__postings).tocsr()
+        num_candidates = np.diff(dots.indptr)
+        rows = np.repeat(np.arange(vecs.shape[0]), num_candidates)
+
+        if self.__metric == 'cosine':
+            scores = dots.data / np.sqrt(q_sq_norms[rows] * self.__sq_norms[dots.indices])
+        else:
+            scores = -(q_sq_norms[rows] + self.__sq_norms[dots.indices] - 2.0 * dots.data)
+
+        # without any shared token, all the instances are at the euclidean distance given by their norm
+        result = np.empty(vecs.shape[0], dtype=np.int64)
+        result[:] = self.__by_sq_norm[0]
+        has_candidates = num_candidates > 0
+        if not has_candidates.any():
+            return result.tolist()
+
+        # the best score of each row, and the lowest index among the candidates which have it
+        starts = dots.indptr[:-1][has_candidates]
+        best_scores = np.maximum.reduceat(scores, starts)
+        is_best = scores == np.repeat(best_scores, num_candidates[has_candidates])
+        best_indices = np.minimum.reduceat(np.where(is_best, dots.indices, len(self.__sq_norms)), starts)
+        result[has_candidates] = best_indices
+
+        if self.__metric == 'euclidean':
+            # an instance without a shared token can only be closer if the smallest norm is, which is seldom the case
+            best_dists = -best_scores
+            min_dists = q_sq_norms[has_candidates] + self.__sq_norms[self.__by_sq_norm[0]]
+            close = min_dists <= best_dists
+            for i, best_dist in zip(np.flatnonzero(has_candidates)[close], best_dists[close]):
+                candidates = dots.indices[dots.indptr[i]:dots.indptr[i+1]]
+                result[i] = self.__compare_non_candidate(q_sq_norms[i], candidates, result[i], best_dist)
+        return result.tolist()
+
+    def __compare_non_candidate(self, q_sq_norm, candidates, best_idx, best_dist):
+        # the first position of the norm order which isn't taken by a candidate is the closest instance without a shared token
+        ranks = np.sort(self.__sq_norm_ranks[candidates])
+        gaps = np.flatnonzero(ranks != np.arange(len(ranks)))
+        rank = gaps[0] if len(gaps) > 0 else len(ranks)
+        if rank == len(self.__by_sq_norm):
+            return int(best_idx)
+        idx = int(self.__by_sq_norm[rank])
+        dist = q_sq_norm + self.__sq_norms[idx]
+        if dist < best_dist or (dist == best_dist and idx < best_idx):
+            return idx
+        return int(best_idx)
+
+
+def get_postings(vecs):
+    """
+    Returns the term x instance CSR matrix of the posting lists of the feature matrix of the training instances.
+    """
+    return vecs.T.tocsr()
+
+
+RETRIEVERS = {'brute': BruteForceRetriever, 'inverted': InvertedIndexRetriever}
+
+
+class MappedStrings:
+    """
+    Read-only list of unicode strings stored as a UTF-8 blob and an array of offsets, both memory-mapped.
+    """
+    def __init__(self, blob_filename, offsets_filename):
+        self.__offsets = np.load(offsets_filename, mmap_mode='r')
+        if self.__offsets[-1] > 0:
+            self.__blob = np.memmap(blob_filename, dtype=np.uint8, mode='r')
+        else:
+            self.__blob = np.zeros(0, dtype=np.uint8)
+
+    @staticmethod
+    def save(strings, blob_filename, offsets_filename):
+        offsets = [0]
+        with open(blob_filename, 'wb') as f:
+            for string in strings:
+                encoded = string.encode('utf-8')
+                f.write(encoded)
+                offsets.append(offsets[-1] + len(encoded))
+        np.save(offsets_filename, np.array(offsets, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.__offsets) - 1
+
+    def __getitem__(self, idx):
+        return self.__blob[self.__offsets[idx]:self.__offsets[idx+1]].tostring().decode('utf-8')
+
 
 class SimpleSLG:
-    def __init__(self):
+    def __init__(self, backend='brute', metric='euclidean'):
         self.__features = []
         self.__translations = []
 
         self.__vectorizer = CountVectorizer()
-        self.__model = None
+        self.__vecs = None
+        self.__model = RETRIEVERS[backend](metric)
+
+    def load_model(self, modelfile):
+        """
+        Loads the index written by train(), which consists of the following files:
+        - <modelfile>.vocab.json: the vocabulary of the feature tokens
+        - <modelfile>.{data,indices,indptr}.npy: the CSR feature matrix of the training instances
+        - <modelfile>.postings.{data,indices,indptr}.npy: its transpose in CSR, the posting lists of the inverted index
+        - <modelfile>.translations.bin and <modelfile>.offsets.npy: the translations of the training instances
+        The arrays and the translations are memory-mapped.
+        """
+        with open('%s.vocab.json' % modelfile, 'r') as f:
+            vocab = json.load(f)
+        self.__vectorizer = CountVectorizer(vocabulary=vocab)
+
+        data = np.load('%s.data.npy' % modelfile, mmap_mode='r')
+        indices = np.load('%s.indices.npy' % modelfile, mmap_mode='r')
+        indptr = np.load('%s.indptr.npy' % modelfile, mmap_mode='r')
+        self.__vecs = csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, len(vocab)), copy=False)
+
+        # the posting lists are only built again for an index saved without them
+        postings = None
+        if os.path.exists('%s.postings.indptr.npy' % modelfile):
+            postings_data = np.load('%s.postings.data.npy' % modelfile, mmap_mode='r')
+            postings_indices = np.load('%s.postings.indices.npy' % modelfile, mmap_mode='r')
+            postings_indptr = np.load('%s.postings.indptr.npy' % modelfile, mmap_mode='r')
+            postings = csr_matrix((postings_data, postings_indices, postings_indptr), shape=(len(vocab), len(indptr) - 1), copy=False)
+
+        self.__translations = MappedStrings('%s.translations.bin' % modelfile, '%s.offsets.npy' % modelfile)
+
+        self.__model.fit(self.__vecs, postings)
+
+        return True
 
     def __get_feats(self, instance):
         feats = []
@@ -48,39 +228,74 @@ class SimpleSLG:
         self.__features.append(' '.join(feats))
         self.__translations.append(translations['translated'][0]['hyp'])
 
-    def train(self):
-        vecs = self.__vectorizer.fit_transform(self.__features)
-        self.__model = NearestNeighbors(n_neighbors=1, algorithm='ball_tree').fit(vecs)
+    def train(self, modelfile=None):
+        self.__vecs = self.__vectorizer.fit_transform(self.__features).tocsr().astype(np.float64)
+        postings = get_postings(self.__vecs)
+        self.__model.fit(self.__vecs, postings)
+
+        if modelfile is not None:
+            vocab = dict([(term, int(idx)) for term, idx in self.__vectorizer.vocabulary_.items()])
+            with open('%s.vocab.json' % modelfile, 'w') as f:
+                json.dump(vocab, f)
+
+            np.save('%s.data.npy' % modelfile, self.__vecs.data)
+            np.save('%s.indices.npy' % modelfile, self.__vecs.indices)
+            np.save('%s.indptr.npy' % modelfile, self.__vecs.indptr)
+            np.save('%s.postings.data.npy' % modelfile, postings.data)
+            np.save('%s.postings.indices.npy' % modelfile, postings.indices)
+            np.save('%s.postings.indptr.npy' % modelfile, postings.indptr)
+
+            MappedStrings.save(self.__translations, '%s.translations.bin' % modelfile, '%s.offsets.npy' % modelfile)
 
     def generate(self, instance):
-        feats = self.__get_feats(instance)
-        vecs = self.__vectorizer.transform([' '.join(feats)])
-        distances, indices = self.__model.kneighbors(vecs)
-        return self.__translations[indices[0][0]]
+        return self.generate_many([instance])[0]
+
+    def generate_many(self, instances):
+        if len(instances) == 0:
+            return []
+        vecs = self.__vectorizer.transform([' '.join(self.__get_feats(instance)) for instance in instances])
+        return [self.__translations[idx] for idx in self.__model.query(vecs)]
 
 def main(argv):
     parser = argparse.ArgumentParser(description='Simple SLG baseline.')
-    parser.add_argument('--trainset', dest='trainset', action='store', metavar='TRAINSET', required=True, help='The training dataset')
+    parser.add_argument('--trainset', dest='trainset', action='store', metavar='TRAINSET', help='The training dataset, which can be omitted if the model file already exists')
     parser.add_argument('--testset', dest='testset', action='store', metavar='TESTSET', required=True, help='The test dataset')
     parser.add_argument('--dataroot', dest='dataroot', action='store', required=True, metavar='PATH',  help='Will look for corpus in <destroot>/...')
+    parser.add_argument('--modelfile', dest='modelfile', action='store', metavar='MODEL_FILE',  help='Prefix of the files to write with trained index, or to load it from without --trainset')
     parser.add_argument('--outfile', dest='outfile', action='store', required=True, metavar='JSON_FILE',  help='File to write with SLG output')
     parser.add_argument('--roletype', dest='roletype', action='store', choices=['GUIDE',  'TOURIST'], required=True,  help='Target role')
+    parser.add_argument('--backend', dest='backend', action='store', choices=sorted(RETRIEVERS.keys()), default='brute', help='Nearest neighbour retrieval backend')
+    parser.add_argument('--metric', dest='metric', action='store', choices=['euclidean', 'cosine'], default='euclidean', help='Similarity used to pick the nearest neighbour')
+    parser.add_argument('--profile', dest='profile', action='store_true', help='Write the stage timings, utterance latencies and peak memory to <outfile>.profile.json')
 
     args = parser.parse_args()
+    profiler = Profiler()
 
-    slg = SimpleSLG()
+    if args.trainset is None and args.modelfile is None:
+        parser.error('either --trainset or --modelfile is required')
 
-    trainset = dataset_walker.dataset_walker(args.trainset, dataroot=args.dataroot, labels=True, translations=True, task='SLG', roletype=args.roletype.lower())
-    sys.stderr.write('Loading training instances ... ')
+    slg = SimpleSLG(args.backend, args.metric)
 
-    for call in trainset:
-        for (log_utter, translations, label_utter) in call:
-            if log_utter['speaker'].lower() == args.roletype.lower():
-                instance = {'semantic_tags': log_utter['semantic_tags'], 'speech_act': log_utter['speech_act']}
-                slg.add_instance(instance, translations)
+    if args.trainset is not None:
+        trainset = dataset_walker.dataset_walker(args.trainset, dataroot=args.dataroot, labels=True, translations=True, task='SLG', roletype=args.roletype.lower())
+        sys.stderr.write('Loading training instances ... ')
 
-    slg.train()
-    sys.stderr.write('Done\n')
+        for call in profiler.iter_stage('loading', trainset):
+            for (log_utter, translations, label_utter) in call:
+                if log_utter['speaker'].lower() == args.roletype.lower():
+                    instance = {'semantic_tags': log_utter['semantic_tags'], 'speech_act': log_utter['speech_act']}
+                    slg.add_instance(instance, translations)
+
+        with profiler.stage('training'):
+            slg.train(args.modelfile)
+        sys.stderr.write('Done\n')
+    else:
+        if not os.path.exists('%s.vocab.json' % args.modelfile):
+            raise RuntimeError('Cant open model file %s.vocab.json' % (args.modelfile,))
+        sys.stderr.write('Loading model ... ')
+        with profiler.stage('loading'):
+            slg.load_model(args.modelfile)
+        sys.stderr.write('Done\n')
 
     output = {'sessions': []}
     output['dataset'] = args.testset
@@ -90,25 +305,37 @@ def main(argv):
 
     testset = dataset_walker.dataset_walker(args.testset, dataroot=args.dataroot, labels=False, translations=True, task='SLG', roletype=args.roletype.lower())
     sys.stderr.write('Loading testing instances ... ')
-    for call in testset:
+    pending = []
+    for call in profiler.iter_stage('loading', testset):
         this_session = {"session_id": call.log["session_id"], "utterances": []}
 
         for (log_utter, translations, label_utter) in call:
             if log_utter['speaker'].lower() == args.roletype.lower():
                 instance = {'semantic_tags': log_utter['semantic_tags'], 'speech_act': log_utter['speech_act']}
 
-                slg_result = {'utter_index': log_utter['utter_index'], 'generated': slg.generate(instance)}
+                slg_result = {'utter_index': log_utter['utter_index']}
                 this_session['utterances'].append(slg_result)
+                pending.append((slg_result, instance))
 
         output['sessions'].append(this_session)
+
+    # all the instances of the test set are retrieved in a single batch
+    with profiler.batch('generation', len(pending)):
+        generated = slg.generate_many([instance for _, instance in pending])
+    for (slg_result, _), sent in zip(pending, generated):
+        slg_result['generated'] = sent
     sys.stderr.write('Done\n')
 
     end_time = time.time()
     elapsed_time = end_time - start_time
     output['wall_time'] = elapsed_time
 
-    with open(args.outfile, "wb") as of:
-        json.dump(output, of, indent=4)
+    with profiler.stage('serialisation'):
+        with open(args.outfile, "wb") as of:
+            json.dump(output, of, indent=4)
+
+    if args.profile:
+        profiler.save(get_profile_filename(args.outfile))
 
     sys.stderr.write('Done\n')
 
@@ -21,11 +21,9 @@ from sklearn import preprocessing
 
 import pickle
 import argparse, sys, dataset_walker, time, json
+from profiler import Profiler, get_profile_filename
 from semantic_tag_parser import SemanticTagParser
-
-import operator
-
-import re
+from slu_projection import DirectLabelProjection, get_slu_result
 
 
 class SimpleSLU:
@@ -106,6 +104,19 @@ class SimpleSLU:
 
         return (pred_act, pred_semantic)
 
+    def pred_many(self, utters):
+        """
+        Predicts several utterances with a single call to each model. The i-th result is the same as pred(utters[i]).
+        """
+        if len(utters) == 0:
+            return []
+        word_seqs = [[word.lower() for word, _ in self.__tokenize(utter)] for utter in utters]
+
+        pred_acts = self.__speech_act_lb.inverse_transform(self.__speech_act_model.predict([' '.join(word_seq) for word_seq in word_seqs]))
+        pred_semantics = self.__semantic_model.tag_sents(word_seqs)
+
+        return [([pred_act], pred_semantic) for pred_act, pred_semantic in zip(pred_acts, pred_semantics)]
+
     def __tokenize(self, utter, semantic_tagged=None):
         result = None
         if semantic_tagged is None:
@@ -138,92 +149,6 @@ class SimpleSLU:
         return result
 
 
-class DirectLabelProjection:
-    def __init__(self):
-        pass
-
-    def project(self, cn_utter, en_translated, align, en_tagged):
-        cn_word_id_map = self.__get_char_word_map(cn_utter, [word for word, _ in align])
-        en_word_id_map = self.__get_char_word_map(en_translated, en_translated.split())
-
-        en_tagged_unit_id_map = self.__get_char_word_map(en_translated.lower(), [word for word, _ in en_tagged])
-
-        result = {}
-
-        for cn_idx in range(len(cn_word_id_map)):
-            cn_chr = cn_utter[cn_idx]
-            cn_word_id = cn_word_id_map[cn_idx]
-
-            aligned_en_word_id_list = []
-            if cn_word_id is not None:
-                _, aligned_en_word_id_list = align[cn_word_id]
-
-            projected_tag_count = {'O': 0}
-
-            for en_word_id in aligned_en_word_id_list:
-                for en_chr_id in self.__get_char_index_list(en_word_id_map, en_word_id):
-                    en_tagged_unit_id = en_tagged_unit_id_map[en_chr_id]
-                    if en_tagged_unit_id is not None:
-                        _, tag = en_tagged[en_tagged_unit_id]
-                        tag = tag.replace('B-', '').replace('I-', '')
-                        if tag not in projected_tag_count:
-                            projected_tag_count[tag] = 0
-                        projected_tag_count[tag] += 1
-
-            tags_w_max_freq = [key for key, val in projected_tag_count.iteritems() if key != 'O' and val == max(projected_tag_count.values())]
-
-            if len(tags_w_max_freq) > 0:
-                result[cn_idx] = {'char': cn_chr, 'tag': tags_w_max_freq[0]}
-            else:
-                result[cn_idx] = {'char': cn_chr, 'tag': None}
-
-        return result
-
-    def convert_to_tagged_utter(self, projection_result):
-        result = ''
-        prev_tag = None
-        for idx in sorted(projection_result.keys()):
-            char = projection_result[idx]['char']
-            tag = projection_result[idx]['tag']
-
-            if tag != prev_tag:
-                if prev_tag is not None:
-                    result += '</%s>' % (prev_tag.split('_')[0],)
-                if tag is not None:
-                    result += '<%s cat="%s">' % (tag.split('_')[0], tag.split('_')[1])
-
-            result += char
-            prev_tag = tag
-
-        if prev_tag is not None:
-            result += '</%s>' % (prev_tag.split('_')[0])
-
-        return result
-
-    def __get_char_index_list(self, word_id_map, word_id):
-        result = []
-        for idx in word_id_map:
-            if word_id_map[idx] == word_id:
-                result.append(idx)
-        return sorted(set(result))
-
-    def __get_char_word_map(self, utter, tokenized):
-        chr_word_id_map = {}
-        for idx in range(len(utter)):
-            chr_word_id_map[idx] = None
-
-        cur = 0
-        for word_id in range(len(tokenized)):
-            word = tokenized[word_id]
-            pos = utter.find(word, cur)
-
-            if pos >= 0:
-                for idx in range(pos, pos+len(word)):
-                    chr_word_id_map[idx] = word_id
-                cur = pos + len(word)
-        return chr_word_id_map
-
-
 def main(argv):
     parser = argparse.ArgumentParser(description='Simple SLU baseline.')
     parser.add_argument('--trainset', dest='trainset', action='store', metavar='TRAINSET', required=True, help='The training dataset')
@@ -232,20 +157,23 @@ def main(argv):
     parser.add_argument('--modelfile', dest='modelfile', action='store', required=True, metavar='MODEL_FILE',  help='File to write with trained model')
     parser.add_argument('--outfile', dest='outfile', action='store', required=True, metavar='JSON_FILE',  help='File to write with SLU output')
     parser.add_argument('--roletype', dest='roletype', action='store', choices=['GUIDE',  'TOURIST'], required=True,  help='Target role')
+    parser.add_argument('--profile', dest='profile', action='store_true', help='Write the stage timings, utterance latencies and peak memory to <outfile>.profile.json')
 
     args = parser.parse_args()
+    profiler = Profiler()
 
     slu = SimpleSLU()
 
     trainset = dataset_walker.dataset_walker(args.trainset, dataroot=args.dataroot, labels=True, translations=True)
     sys.stderr.write('Loading training instances ... ')
-    for call in trainset:
+    for call in profiler.iter_stage('loading', trainset):
         for (log_utter, translations, label_utter) in call:
             if (log_utter['speaker'] == 'Guide' and args.roletype == 'GUIDE') or (log_utter['speaker'] == 'Tourist' and args.roletype == 'TOURIST'):
                 slu.add_instance(log_utter['transcript'], label_utter['speech_act'], label_utter['semantic_tagged'])
     sys.stderr.write('Done\n')
 
-    slu.train(args.modelfile)
+    with profiler.stage('training'):
+        slu.train(args.modelfile)
 
     projection = DirectLabelProjection()
 
@@ -257,37 +185,15 @@ def main(argv):
 
     testset = dataset_walker.dataset_walker(args.testset, dataroot=args.dataroot, labels=False, translations=True)
     sys.stderr.write('Loading testing instances ... ')
-    for call in testset:
+    for call in profiler.iter_stage('loading', testset):
         this_session = {"session_id": call.log["session_id"], "utterances": []}
         for (log_utter, translations, label_utter) in call:
             if (log_utter['speaker'] == 'Guide' and args.roletype == 'GUIDE') or (log_utter['speaker'] == 'Tourist' and args.roletype == 'TOURIST'):
-                slu_result = {'utter_index': log_utter['utter_index']}
-                if len(translations['translated']) > 0:
-                    top_hyp = translations['translated'][0]['hyp']
-                    pred_act, pred_semantic = slu.pred(top_hyp)
-
-                    combined_act = {}
-                    for act_label in reduce(operator.add, pred_act):
-                        m = re.match('^([^_]+)_(.+)$', act_label)
-                        act = m.group(1)
-                        attr = m.group(2)
-                        if act not in combined_act:
-                            combined_act[act] = []
-                        if attr not in combined_act[act]:
-                            combined_act[act].append(attr)
-
-                    slu_result['speech_act'] = []
-                    for act in combined_act:
-                        attr = combined_act[act]
-                        slu_result['speech_act'].append({'act': act, 'attributes': attr})
-
-                    align = translations['translated'][0]['align']
-
-                    projected = projection.project(log_utter['transcript'], top_hyp, align, pred_semantic)
-                    slu_result['semantic_tagged'] = projection.convert_to_tagged_utter(projected)
-                else:
-                    slu_result['semantic_tagged'] = log_utter['transcript']
-                    slu_result['speech_act'] = []
+                with profiler.utterance('prediction'):
+                    prediction = None
+                    if len(translations['translated']) > 0:
+                        prediction = slu.pred(translations['translated'][0]['hyp'])
+                    slu_result = get_slu_result(log_utter, translations, prediction, projection)
                 this_session['utterances'].append(slu_result)
         output['sessions'].append(this_session)
 
@@ -295,8 +201,12 @@ def main(argv):
     elapsed_time = end_time - start_time
     output['wall_time'] = elapsed_time
 
-    with open(args.outfile, "wb") as of:
-        json.dump(output, of, indent=4)
+    with profiler.stage('serialisation'):
+        with open(args.outfile, "wb") as of:
+            json.dump(output, of, indent=4)
+
+    if args.profile:
+        profiler.save(get_profile_filename(args.outfile))
 
     sys.stderr.write('Done\n')
 
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark suite for the scripts of DSTC5 on a synthetic corpus.
+
+It generates a synthetic dataset with generate_corpus.py and times each stage of the evaluation pipeline a few times:
+- walk: reading all the sessions with dataset_walker
+- track: running the baseline tracker (baseline.py)
+- check: validating the tracker output (check_main.py)
+- score: scoring the tracker output (score_main.py)
+- lm_load: loading the language model of the FM metric
+- slg_metric: scoring an SLG output with the AM-FM and BLEU metrics (score_slg.py)
+The scripts are run in their own processes as they would be from the command line, so their times include the start of the interpreter.
+The results are written as JSON, where every metric keeps its samples and whether lower or higher is better, to be compared by compare_benchmarks.py.
+"""
+
+import argparse
+import sys
+import os
+import json
+import time
+import platform
+import subprocess
+
+import dataset_walker
+import generate_corpus
+import convert_tasks
+from lm import ArpaLM
+
+STAGES = ['walk', 'track', 'check', 'score', 'lm_load', 'slg_metric']
+
+SCRIPTS_PATH = os.path.abspath(os.path.dirname(os.path.abspath(__file__)))
+INSTALL_PATH = os.path.dirname(SCRIPTS_PATH)
+
+LM_FILENAME = os.path.join(SCRIPTS_PATH, 'dstc5.cn.3.lm')
+AM_FILENAMES = [os.path.join(SCRIPTS_PATH, 'dstc5.cn.500.h5'), os.path.join(SCRIPTS_PATH, 'dstc5.cn.500.dic')]
+
+
+def summarize(samples, better):
+    values = sorted(samples)
+    mean = sum(values) / len(values)
+    return {
+        'better': better,
+        'samples': samples,
+        'min': values[0],
+        'median': values[len(values) // 2] if len(values) % 2 == 1 else (values[len(values) // 2 - 1] + values[len(values) // 2]) / 2.0,
+        'mean': mean,
+        'stdev': (sum([(x - mean) ** 2 for x in values]) / len(values)) ** 0.5
+    }
+
+
+def run_script(script, args):
+    """
+    Runs a script in scripts/ from the root of the repository, which is where the AM-FM models are looked for,
+    and returns the elapsed time.
+    """
+    command = [sys.executable, os.path.join(SCRIPTS_PATH, script)] + args
+    with open(os.devnull, 'w') as devnull:
+        start_time = time.time()
+        returncode = subprocess.call(command, cwd=INSTALL_PATH, stdout=devnull, stderr=devnull)
+        elapsed_time = time.time() - start_time
+    if returncode != 0:
+        raise RuntimeError('%s failed with exit status %d: %s' % (script, returncode, ' '.join(command)))
+    return elapsed_time
+
+
+class Benchmark(object):
+    def __init__(self, dataset, dataroot, ontology, repeat, method):
+        self.dataset = dataset
+        self.dataroot = os.path.abspath(dataroot)
+        self.ontology = os.path.abspath(ontology)
+        self.repeat = repeat
+        self.method = method
+        self.workdir = os.path.join(self.dataroot, '%s.benchmark' % (dataset,))
+        self.trackfile = os.path.join(self.workdir, 'track.json')
+        if not os.path.exists(self.workdir):
+            os.makedirs(self.workdir)
+
+    def __get_common_args(self):
+        return ['--dataset', self.dataset, '--dataroot', self.dataroot]
+
+    def bench_walk(self):
+        times = []
+        throughputs = []
+        for _ in range(self.repeat):
+            num_utterances = 0
+            start_time = time.time()
+            for call in dataset_walker.dataset_walker(self.dataset, dataroot=self.dataroot, labels=True, translations=True):
+                for _ in call:
+                    num_utterances += 1
+            elapsed_time = time.time() - start_time
+            times.append(elapsed_time)
+            throughputs.append(num_utterances / elapsed_time)
+        return {'time': summarize(times, 'lower'), 'utterances_per_second': summarize(throughputs, 'higher')}
+
+    def bench_track(self):
+        times = []
+        wall_times = []
+        for _ in range(self.repeat):
+            times.append(run_script('baseline.py', self.__get_common_args() + ['--trackfile', self.trackfile, '--ontology', self.ontology, '--method', self.method]))
+            with open(self.trackfile) as f:
+                track = json.load(f)
+            num_utterances = sum([len(session['utterances']) for session in track['sessions']])
+            wall_times.append(track['wall_time'] / num_utterances)
+        return {'time': summarize(times, 'lower'), 'wall_time_per_utterance': summarize(wall_times, 'lower')}
+
+    def bench_check(self):
+        self.__prepare_track()
+        times = [run_script('check_main.py', self.__get_common_args() + ['--trackfile', self.trackfile, '--ontology', self.ontology]) for _ in range(self.repeat)]
+        return {'time': summarize(times, 'lower')}
+
+    def bench_score(self):
+        self.__prepare_track()
+        scorefile = os.path.join(self.workdir, 'score.csv')
+        times = [run_script('score_main.py', self.__get_common_args() + ['--trackfile', self.trackfile, '--ontology', self.ontology, '--scorefile', scorefile]) for _ in range(self.repeat)]
+        return {'time': summarize(times, 'lower')}
+
+    def bench_lm_load(self):
+        times = []
+        for _ in range(self.repeat):
+            start_time = time.time()
+            ArpaLM(LM_FILENAME)
+            times.append(time.time() - start_time)
+        return {'time': summarize(times, 'lower')}
+
+    def bench_slg_metric(self):
+        convert_tasks.convert(self.dataset, self.dataroot, ['SLG'])
+        outfile = os.path.join(self.workdir, 'slg.json')
+        run_script('baseline_slg.py', ['--trainset', self.dataset, '--testset', self.dataset, '--dataroot', self.dataroot, '--outfile', outfile, '--roletype', 'GUIDE'])
+
+        scorefile = os.path.join(self.workdir, 'slg.score.csv')
+        times = [run_script('score_slg.py', self.__get_common_args() + ['--jsonfile', outfile, '--roletype', 'GUIDE', '--scorefile', scorefile]) for _ in range(self.repeat)]
+        return {'time': summarize(times, 'lower')}
+
+    def __prepare_track(self):
+        if not os.path.exists(self.trackfile):
+            run_script('baseline.py', self.__get_common_args() + ['--trackfile', self.trackfile, '--ontology', self.ontology, '--method', self.method])
+
+    def get_skip_reason(self, stage):
+        """
+        Returns why a stage can't be run here, e.g. because the AM-FM models are not in scripts/, or None.
+        """
+        required = {'lm_load': [LM_FILENAME], 'slg_metric': AM_FILENAMES + [LM_FILENAME]}
+        for filename in required.get(stage, []):
+            if not os.path.exists(filename):
+                return '%s is missing' % (os.path.basename(filename),)
+        return None
+
+    def run(self, stages):
+        results = {}
+        for stage in stages:
+            sys.stderr.write('Running %s ... ' % (stage,))
+            skip_reason = self.get_skip_reason(stage)
+            if skip_reason is not None:
+                results[stage] = {'skipped': skip_reason}
+                sys.stderr.write('Skipped (%s)\n' % (skip_reason,))
+            else:
+                metrics = getattr(self, 'bench_%s' % (stage,))()
+                results[stage] = {'metrics': metrics}
+                sys.stderr.write('%.3f sec\n' % (metrics['time']['median'],))
+        return results
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark of the DSTC5 scripts on a synthetic corpus.')
+    parser.add_argument('--dataroot', dest='dataroot', action='store', required=True, metavar='PATH', help='Will write the synthetic corpus and the outputs in <destroot>/...')
+    parser.add_argument('--dataset', dest='dataset', action='store', metavar='DATASET', default='synthetic', help='Name of the synthetic dataset')
+    parser.add_argument('--ontology', dest='ontology', action='store', metavar='JSON_FILE', default=os.path.join(SCRIPTS_PATH, 'config', 'ontology_dstc5.json'), help='JSON Ontology file')
+    parser.add_argument('--sessions', dest='sessions', action='store', type=int, default=10, metavar='N', help='Number of synthetic sessions')
+    parser.add_argument('--seed', dest='seed', action='store', type=int, default=0, help='Seed of the synthetic corpus')
+    parser.add_argument('--repeat', dest='repeat', action='store', type=int, default=3, metavar='N', help='Number of times each stage is run')
+    parser.add_argument('--method', dest='method', action='store', choices=['1', '2'], default='2', help='Method of the baseline tracker')
+    parser.add_argument('--stages', dest='stages', action='store', nargs='+', choices=STAGES, default=STAGES, help='Stages to run')
+    parser.add_argument('--outfile', dest='outfile', action='store', required=True, metavar='JSON_FILE', help='File to write with the benchmark results')
+
+    args = parser.parse_args()
+
+    sys.stderr.write('Generating %d sessions ... ' % (args.sessions,))
+    num_utterances = generate_corpus.generate(args.dataset, args.dataroot, args.sessions, args.ontology, args.seed)
+    sys.stderr.write('%d utterances\n' % (num_utterances,))
+
+    benchmark = Benchmark(args.dataset, args.dataroot, args.ontology, args.repeat, args.method)
+    # the outputs of the previous runs are not reused, since the corpus has just been generated again
+    if os.path.exists(benchmark.trackfile):
+        os.remove(benchmark.trackfile)
+
+    output = {
+        'config': {
+            'dataset': args.dataset,
+            'sessions': args.sessions,
+            'utterances': num_utterances,
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'method': args.method
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform()
+        },
+        'stages': benchmark.run([stage for stage in STAGES if stage in args.stages])
+    }
+
+    with open(args.outfile, 'w') as of:
+        json.dump(output, of, indent=4, sort_keys=True)
+
+if __name__ == "__main__":
+    main(sys.argv)
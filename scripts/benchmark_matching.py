@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+"""
+Latency benchmark of the matching of the ontology entries in the baseline trackers of the main task.
+
+The baseline tracker of a method is run on a dataset with each matching of the ontology:
+- fuzzy: fuzz.partial_ratio of the 1-best strings and text for every candidate, as the trackers did before the candidate index
+- none: the candidate index without the prefilter
+- automaton: the candidate index with the Aho-Corasick and character prefilter
+The frames are compared to the ones from the first matching, which is fuzzy with the 1-best translations.
+"""
+
+import argparse
+import sys
+import time
+import copy
+
+from fuzzywuzzy import fuzz
+
+import dataset_walker
+import ontology_reader
+from baseline import BaselineMethod1, BaselineMethod2
+from ontology_matcher import CandidateIndex, DEFAULT_THRESHOLD
+from benchmark_utils import get_latency_percentiles, run_benchmark, print_benchmark
+
+
+class FuzzyIndex(object):
+    """
+    The matching of the trackers before the candidate index, which computes fuzz.partial_ratio for every candidate of the topic.
+    """
+    def __init__(self, candidate_index):
+        self.topics = candidate_index.topics
+        self.threshold = candidate_index.threshold
+
+    def match(self, topic, texts, frame):
+        topic_index = self.topics.get(topic)
+        if topic_index is None:
+            return frame
+        for slot, value, string_ids in topic_index.candidates:
+            ratio = fuzz.partial_ratio(topic_index.strings[string_ids[0]], texts[0])
+            if ratio > self.threshold:
+                if slot not in frame:
+                    frame[slot] = []
+                if value not in frame[slot]:
+                    frame[slot].append(value)
+        return frame
+
+
+def run_tracker(sessions, create_tracker):
+    """
+    Returns the frames of all the utterances, the latencies of the utterances and the total time.
+    """
+    frames = []
+    latencies = []
+    total_start_time = time.time()
+    for call in sessions:
+        tracker = create_tracker()
+        for (utter, translations, _) in call:
+            start_time = time.time()
+            result = tracker.addUtter(utter, translations)
+            latencies.append(time.time() - start_time)
+            frames.append(copy.deepcopy(result.get('frame_label')))
+    return frames, latencies, time.time() - total_start_time
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark of the matching of the ontology entries in the baseline trackers.')
+    parser.add_argument('--dataset', dest='dataset', action='store', metavar='DATASET', required=True, help='The dataset to analyze')
+    parser.add_argument('--dataroot', dest='dataroot', action='store', required=True, metavar='PATH', help='Will look for corpus in <destroot>/<dataset>/...')
+    parser.add_argument('--ontology', dest='ontology', action='store', metavar='JSON_FILE', required=True, help='JSON Ontology file')
+    parser.add_argument('--method', dest='method', action='store', choices=['1', '2'], required=True, help='Baseline mode')
+    parser.add_argument('--nbest', dest='nbest', action='store', type=int, default=1, metavar='N', help='Number of translations to match with the candidate index')
+    parser.add_argument('--outfile', dest='outfile', action='store', metavar='JSON_FILE', help='File to write with the benchmark results')
+
+    args = parser.parse_args()
+
+    # the sessions are read once, so that the times only include the tracking
+    sessions = [[(utter, translations, None) for (utter, translations, _) in call] for call in dataset_walker.dataset_walker(args.dataset, dataroot=args.dataroot, labels=False, translations=True)]
+
+    ontology = ontology_reader.OntologyReader(args.ontology)
+    if args.method == '1':
+        tagsets = ontology.get_tagsets()
+        tracker_class = BaselineMethod1
+        create_index = lambda nbest, prefilter: CandidateIndex.from_tagsets(tagsets, DEFAULT_THRESHOLD, prefilter)
+    else:
+        tagsets = ontology.get_translated_tagsets()
+        tracker_class = BaselineMethod2
+        create_index = lambda nbest, prefilter: CandidateIndex.from_translated_tagsets(tagsets, nbest, DEFAULT_THRESHOLD, prefilter)
+
+    configs = [('fuzzy', 1, FuzzyIndex(create_index(1, 'none')))]
+    for prefilter in ['none', 'automaton']:
+        start_time = time.time()
+        index = create_index(args.nbest, prefilter)
+        configs.append((prefilter, args.nbest, index))
+        sys.stderr.write('Built the index with the %s prefilter in %.3f sec\n' % (prefilter, time.time() - start_time))
+
+    def run_config(name, nbest, index):
+        frames, latencies, total_time = run_tracker(sessions, lambda: tracker_class(tagsets, nbest, index))
+        result = {
+            'matching': name,
+            'nbest': nbest,
+            'utterances': len(frames),
+            'total_time': total_time
+        }
+        result.update(get_latency_percentiles(latencies))
+        return result, frames
+
+    results = run_benchmark(configs, run_config)
+    for result in results:
+        result['speedup'] = results[0]['total_time'] / result['total_time'] if result['total_time'] > 0.0 else 1.0
+
+    keys = ['total_time', 'latency_p50', 'latency_p95', 'latency_p99', 'speedup', 'reference_agreement']
+    print_benchmark(results, ['%s.%d' % (r['matching'], r['nbest']) for r in results], keys, args.outfile)
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""
+Latency and throughput benchmark of the retrieval backends of the SLG baseline.
+
+Every backend is trained on the same training instances, and then the test instances are generated
+one by one (latency) and in a single batch (throughput).
+The outputs are compared to the ones from the brute backend, which is the reference 1-NN retrieval.
+"""
+
+import argparse
+import sys
+import time
+
+import dataset_walker
+from baseline_slg import SimpleSLG
+from benchmark_utils import get_latency_percentiles, get_agreement, run_benchmark, print_benchmark
+
+
+def load_instances(dataset, dataroot, roletype, labels):
+    result = []
+    for call in dataset_walker.dataset_walker(dataset, dataroot=dataroot, labels=labels, translations=True, task='SLG', roletype=roletype.lower()):
+        for (log_utter, translations, label_utter) in call:
+            if log_utter['speaker'].lower() == roletype.lower():
+                instance = {'semantic_tags': log_utter['semantic_tags'], 'speech_act': log_utter['speech_act']}
+                result.append((instance, translations))
+    return result
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark of the retrieval backends for SLG baseline.')
+    parser.add_argument('--trainset', dest='trainset', action='store', metavar='TRAINSET', required=True, help='The training dataset')
+    parser.add_argument('--testset', dest='testset', action='store', metavar='TESTSET', required=True, help='The test dataset')
+    parser.add_argument('--dataroot', dest='dataroot', action='store', required=True, metavar='PATH',  help='Will look for corpus in <destroot>/...')
+    parser.add_argument('--roletype', dest='roletype', action='store', choices=['GUIDE',  'TOURIST'], required=True,  help='Target role')
+    parser.add_argument('--outfile', dest='outfile', action='store', metavar='JSON_FILE', help='File to write with the benchmark results')
+
+    args = parser.parse_args()
+
+    train_instances = load_instances(args.trainset, args.dataroot, args.roletype, True)
+    test_instances = [instance for instance, _ in load_instances(args.testset, args.dataroot, args.roletype, False)]
+
+    def run_config(backend, metric):
+        slg = SimpleSLG(backend, metric)
+        for instance, translations in train_instances:
+            slg.add_instance(instance, translations)
+
+        start_time = time.time()
+        slg.train()
+        train_time = time.time() - start_time
+
+        latencies = []
+        single = []
+        for instance in test_instances:
+            start_time = time.time()
+            single.append(slg.generate(instance))
+            latencies.append(time.time() - start_time)
+
+        start_time = time.time()
+        batch = slg.generate_many(test_instances)
+        batch_time = time.time() - start_time
+
+        result = {
+            'backend': backend,
+            'metric': metric,
+            'instances': len(test_instances),
+            'train_time': train_time,
+            'batch_time': batch_time,
+            'batch_throughput': len(test_instances) / batch_time if batch_time > 0.0 else None,
+            'single_batch_agreement': get_agreement(batch, single)
+        }
+        result.update(get_latency_percentiles(latencies))
+        return result, batch
+
+    results = run_benchmark([('brute', 'euclidean'), ('inverted', 'euclidean'), ('inverted', 'cosine')], run_config)
+
+    keys = ['train_time', 'latency_p50', 'latency_p95', 'latency_p99', 'batch_time', 'batch_throughput', 'single_batch_agreement', 'reference_agreement']
+    print_benchmark(results, ['%s.%s' % (r['backend'], r['metric']) for r in results], keys, args.outfile)
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+"""
+Common part of the benchmarks which run the same data with several configs, such as benchmark_matching.py and benchmark_slg.py:
+each config is run in turn, its outputs are compared to the ones of the first config, and the results are printed as a table.
+"""
+
+import json
+
+from profiler import percentile, PERCENTILES
+
+
+def get_latency_percentiles(latencies):
+    """
+    Returns the dict of the percentiles of the latencies, as latency_p50, ...
+    """
+    latencies = sorted(latencies)
+    return dict([('latency_p%d' % (p,), percentile(latencies, p)) for p in PERCENTILES])
+
+
+def get_agreement(reference, outputs):
+    """
+    Returns the fraction of the outputs which are the same as the reference ones.
+    """
+    return sum([int(x == y) for x, y in zip(reference, outputs)]) / float(max(len(outputs), 1))
+
+
+def run_benchmark(configs, run_config):
+    """
+    Runs each config, a tuple of arguments of run_config, which returns the dict of the results and the list of the outputs of the config.
+    The outputs are compared to the ones of the first config, which is the reference, in reference_agreement.
+    """
+    results = []
+    reference = None
+    for config in configs:
+        result, outputs = run_config(*config)
+        if reference is None:
+            reference = outputs
+        result['reference_agreement'] = get_agreement(reference, outputs)
+        results.append(result)
+    return results
+
+
+def print_benchmark(results, labels, keys, outfile=None):
+    """
+    Prints the table of the given keys of the results, with a column for each config, and writes the results to outfile.
+    """
+    print '%25s | %s' % ('', ' | '.join(['%20s' % (label,) for label in labels]))
+    for key in keys:
+        print '%25s | %s' % (key, ' | '.join(['%20s' % ('-' if r[key] is None else '%.7f' % r[key]) for r in results]))
+
+    if outfile is not None:
+        with open(outfile, 'w') as of:
+            json.dump(results, of, indent=4)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+Bootstrap confidence intervals of the main-task metrics, from the sufficient statistics written by score_main.py with --statsfile.
+
+The sessions are resampled with replacement, and the metrics of every resample are computed from the counts summed by session,
+for all the resamples at once. The interval of a metric is given by the percentiles of its values over the resamples.
+It writes a CSV file with the rows "topic, schedule, stat, N, result, lower, upper", where result is the score of score_main.py.
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from sufficient_stats import StatsFile, SCHEDULES, get_metrics, get_resample_weights
+
+STATS = ['acc', 'precision', 'recall', 'f1']
+
+
+def get_n(stat, totals):
+    """
+    Returns the N of a stat of score_main.py from the N, correct, tp, fp and fn totals.
+    """
+    n, correct, tp, fp, fn = totals
+    return {'acc': n, 'precision': tp + fp, 'recall': tp + fn, 'f1': tp + fp + fn}[stat]
+
+
+def bootstrap(stats_file, schedule, topics, num_samples, confidence, seed):
+    """
+    Returns a dict from each topic to the dict from each stat to (N, result, lower, upper).
+    The same resamples of the sessions are used for all the topics.
+    """
+    weights = get_resample_weights(stats_file.get_num_sessions(), num_samples, seed)
+    alpha = 100.0 * (1.0 - confidence) / 2.0
+
+    result = {}
+    for topic in topics:
+        session_counts = stats_file.get_session_counts(schedule, stats_file.get_mask(schedule, topic))
+        totals = session_counts.sum(axis=0)
+        point = get_metrics(totals)
+        samples = get_metrics(weights.dot(session_counts))
+
+        result[topic] = {}
+        for stat in STATS:
+            values = samples[stat][~np.isnan(samples[stat])]
+            lower, upper = (None, None)
+            if len(values) > 0:
+                lower, upper = np.percentile(values, [alpha, 100.0 - alpha])
+            value = None if np.isnan(point[stat]) else float(point[stat])
+            result[topic][stat] = (get_n(stat, totals), value, lower, upper)
+    return result
+
+
+def format_result(value):
+    if value is None:
+        return '-'
+    return '%.7f' % (value,)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Bootstrap confidence intervals of the main-task metrics.')
+    parser.add_argument('--statsfile', dest='statsfile', action='store', required=True, metavar='NPZ_FILE', help='Sufficient statistics written by score_main.py')
+    parser.add_argument('--cifile', dest='cifile', action='store', required=True, metavar='CSV_FILE', help='File to write with the confidence intervals')
+    parser.add_argument('--samples', dest='samples', action='store', type=int, default=1000, metavar='N', help='Number of resamples of the sessions')
+    parser.add_argument('--confidence', dest='confidence', action='store', type=float, default=0.95, help='Confidence level of the intervals')
+    parser.add_argument('--seed', dest='seed', action='store', type=int, default=0, help='Seed of the resampling')
+
+    args = parser.parse_args()
+
+    if not 0.0 < args.confidence < 1.0:
+        parser.error('--confidence must be between 0 and 1')
+
+    stats_file = StatsFile(args.statsfile)
+    topics = ['all'] + sorted(stats_file.topics)
+
+    start_time = time.time()
+    csvfile = open(args.cifile, 'w')
+    print >> csvfile, ("topic, schedule, stat, N, result, lower, upper")
+    for schedule in SCHEDULES:
+        result = bootstrap(stats_file, schedule, topics, args.samples, args.confidence, args.seed)
+        for topic in topics:
+            for stat in STATS:
+                n, value, lower, upper = result[topic][stat]
+                print >> csvfile, ("%s, %i, %s, %i, %s, %s, %s" % (topic, schedule, stat, n, format_result(value), format_result(lower), format_result(upper)))
+    csvfile.close()
+
+    sys.stderr.write('Computed %d resamples of %d sessions in %.3f sec\n' % (args.samples, stats_file.get_num_sessions(), time.time() - start_time))
+
+if __name__ == "__main__":
+    main(sys.argv)
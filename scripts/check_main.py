@@ -6,7 +6,9 @@ For a valid input, it outputs `Found no errors, trackfile is valid'.
 It is particularly useful for checking the tracker output on an unlabelled test set, before submitting it for evaluation in the challenge.
 """
 
-import argparse, sys, os, json, ontology_reader
+import argparse, sys, os, ontology_reader
+from track_checker import BaseTrackChecker
+from track_reader import TrackReader
 
 def main(argv):
     install_path = os.path.abspath(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -24,38 +26,32 @@ def main(argv):
                         help='File containing score JSON')
     parser.add_argument('--ontology',dest='ontology',action='store',metavar='JSON_FILE',required=True,
                         help='JSON Ontology file')
+    parser.add_argument('--jobs',dest='jobs',action='store',type=int,default=1,metavar='N',
+                        help='Number of processes checking the sessions concurrently')
+    parser.add_argument('--max-errors',dest='max_errors',action='store',type=int,metavar='N',
+                        help='Stop checking after N errors')
+    parser.add_argument('--stream',dest='stream',action='store_true',
+                        help='Print the errors as soon as they are found')
 
     args = parser.parse_args()
 
     sessions = dataset_walker(args.dataset,dataroot=args.dataroot,labels=False)
-    tracker_output = json.load(open(args.scorefile))
+    # the track file is read one session at a time, in lockstep with the dataset
+    tracker_output = TrackReader(args.scorefile)
 
     tagsets = ontology_reader.OntologyReader(args.ontology).get_tagsets()
 
-    checker = TrackChecker(sessions, tracker_output, tagsets)
-    checker.check()
+    checker = TrackChecker(sessions, tracker_output, tagsets, args.max_errors, args.stream)
+    checker.check(args.jobs)
     checker.print_errors()
 
-class TrackChecker():
-    def __init__(self, sessions, tracker_output, tagsets):
-        self.sessions = sessions
-        self.tracker_output = tracker_output
-        self.errors = []
+class TrackChecker(BaseTrackChecker):
+    def __init__(self, sessions, tracker_output, tagsets, max_errors=None, stream=False):
+        BaseTrackChecker.__init__(self, sessions, tracker_output, max_errors, stream)
         self.tagsets = tagsets
 
-    def add_error(self, context, error_str):
-        self.errors.append((context, error_str))
-
-    def print_errors(self):
-        if len(self.errors) == 0 :
-            print "Found no errors, trackfile is valid"
-        else:
-            print "Found",len(self.errors),"errors:"
-        for context, error in self.errors:
-            print " ".join(map(str, context)), "-", error
-
-    def check(self):
-    # first check the top-level stuff
+    def check_top_level(self):
+    # the top-level stuff is checked once the sessions have been read
         if len(self.sessions.datasets) != 1 :
             self.add_error(("top level",), "tracker output should be over a single dataset")
         if "dataset" not in self.tracker_output :
@@ -73,42 +69,49 @@ class TrackChecker():
             elif wall_time <= 0.0 :
                 self.add_error(("top level",),"wall_time must be positive")
 
-        for session, track_session in zip(self.sessions, self.tracker_output["sessions"]):
-            session_id = session.log["session_id"]
-            # check session id
-            if session_id != track_session["session_id"] :
-                self.add_error((session_id,),"session-id does not match")
-            # check number of utterances
-            if len(session) != len(track_session["utterances"]) :
-                self.add_error((session_id,),"number of utterances do not match")
-
-            # now iterate through turns
-            for (log_utter, translations, label_utter), track_utter in zip(session, track_session["utterances"]):
-                # check utter index
-                if log_utter['utter_index'] != track_utter['utter_index']:
-                    self.add_error((session_id, "utterance", log_utter['utter_index'], track_utter['utter_index']), "utter_index does not match")
-
-                # check frame labels for target utterances
-                if log_utter['segment_info']['target_bio'] != 'O' and 'frame_label' not in track_utter:
-                    self.add_error((session_id, "utterance", log_utter['utter_index']), "no frame_label key in utterance")
-
-                topic = log_utter['segment_info']['topic']
-                if 'frame_label' in track_utter:
-                    frame_label = track_utter['frame_label']
-                    for slot in frame_label:
-                        # check slots in frame labels
-                        if slot not in self.tagsets[topic]:
-                            self.add_error((session_id, 'utterance', log_utter['utter_index'], slot), "do not recognise slot")
-                        else:
-                            # check slot values in frame labels
-                            cnt = {}
-                            for value in frame_label[slot]:
-                                if value not in self.tagsets[topic][slot]:
-                                    self.add_error((session_id, 'utterance', log_utter['utter_index'], slot, value), "do not recognise slot value")
-                                if value not in cnt: cnt[value] = 0
-                                cnt[value] += 1
-                                if cnt[value] > 1:
-                                    self.add_error((session_id, 'utterance', log_utter['utter_index'], slot, value), "repeated value")
-        
+    def check_session(self, session, track_session):
+        session_id = session.log["session_id"]
+        # check session id
+        if session_id != track_session["session_id"] :
+            self.add_error((session_id,),"session-id does not match")
+        # check number of utterances
+        if len(session) != len(track_session["utterances"]) :
+            self.add_error((session_id,),"number of utterances do not match")
+
+        # now iterate through turns
+        for (log_utter, translations, label_utter), track_utter in zip(session, track_session["utterances"]):
+            # check utter index
+            if log_utter['utter_index'] != track_utter['utter_index']:
+                self.add_error((session_id, "utterance", log_utter['utter_index'], track_utter['utter_index']), "utter_index does not match")
+
+            # check frame labels for target utterances
+            if log_utter['segment_info']['target_bio'] != 'O' and 'frame_label' not in track_utter:
+                self.add_error((session_id, "utterance", log_utter['utter_index']), "no frame_label key in utterance")
+
+            # check the optional time taken to track the utterance
+            if 'wall_time' in track_utter:
+                if type(track_utter['wall_time']) != type(0.0):
+                    self.add_error((session_id, "utterance", log_utter['utter_index']), "wall_time must be a float")
+                elif track_utter['wall_time'] < 0.0:
+                    self.add_error((session_id, "utterance", log_utter['utter_index']), "wall_time must not be negative")
+
+            topic = log_utter['segment_info']['topic']
+            if 'frame_label' in track_utter:
+                frame_label = track_utter['frame_label']
+                for slot in frame_label:
+                    # check slots in frame labels
+                    if slot not in self.tagsets[topic]:
+                        self.add_error((session_id, 'utterance', log_utter['utter_index'], slot), "do not recognise slot")
+                    else:
+                        # check slot values in frame labels
+                        cnt = {}
+                        for value in frame_label[slot]:
+                            if value not in self.tagsets[topic][slot]:
+                                self.add_error((session_id, 'utterance', log_utter['utter_index'], slot, value), "do not recognise slot value")
+                            if value not in cnt: cnt[value] = 0
+                            cnt[value] += 1
+                            if cnt[value] > 1:
+                                self.add_error((session_id, 'utterance', log_utter['utter_index'], slot, value), "repeated value")
+
 if __name__ =="__main__":
     main(sys.argv)
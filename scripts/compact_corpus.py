@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compact in-memory representation of the sessions read by dataset_walker, which is used with dataset_walker(..., compact=True).
+
+The utterances of log.json, translations.json and label.json are kept as read-only records with __slots__ instead of nested dicts:
+- the speakers, the topics and the target_bio labels are coded as integers into tables shared by all the sessions,
+- the other strings are interned, so that each distinct string is kept only once by the walker,
+- the lists are tuples, and the word alignments of a translation are flat arrays of the aligned word indices.
+The records are accessed as the dicts and the lists they replace, e.g. log_utter['segment_info']['topic'] or translations['translated'][0]['align'],
+and compare equal to them. They can't be modified, and to_plain() converts them back into dicts and lists, e.g. to be written as JSON.
+The memory saved on a dataset is reported by corpus_memory.py.
+"""
+
+from array import array
+
+from dataset_walker import Call, normalize_speech_act
+from string_table import StringTable
+
+
+SPEAKERS = StringTable()
+TOPICS = StringTable()
+TARGET_BIOS = StringTable()
+
+
+class Interner(object):
+    """
+    Keeps a single copy of each distinct string and of each set of keys.
+    The builtin intern() can't be used, as it doesn't take unicode strings.
+    """
+    def __init__(self):
+        self.strings = {}
+        self.keys = {}
+
+    def intern(self, string):
+        return self.strings.setdefault(string, string)
+
+    def intern_keys(self, keys):
+        return self.keys.setdefault(keys, keys)
+
+
+class FrozenList(tuple):
+    """
+    Tuple which compares equal to the list it replaces.
+    """
+    __slots__ = ()
+
+    def __eq__(self, other):
+        if isinstance(other, list):
+            other = tuple(other)
+        return tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = tuple.__hash__
+
+
+class Record(object):
+    """
+    Read-only mapping over the __slots__ of a subclass, which defines keys() and get_value(key).
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        return self.get_value(key)
+
+    def get(self, key, default=None):
+        try:
+            return self.get_value(key)
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    has_key = __contains__
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def values(self):
+        return [self.get_value(key) for key in self.keys()]
+
+    def items(self):
+        return [(key, self.get_value(key)) for key in self.keys()]
+
+    def iterkeys(self):
+        return iter(self.keys())
+
+    def itervalues(self):
+        return iter(self.values())
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def __eq__(self, other):
+        if not isinstance(other, (dict, Record)):
+            return NotImplemented
+        return to_plain(self) == to_plain(other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(to_plain(self))
+
+
+class FrozenDict(Record):
+    __slots__ = ('__keys', '__values')
+
+    def __init__(self, keys, values):
+        self.__keys = keys
+        self.__values = values
+
+    def keys(self):
+        return list(self.__keys)
+
+    def get_value(self, key):
+        try:
+            return self.__values[self.__keys.index(key)]
+        except ValueError:
+            raise KeyError(key)
+
+
+class SegmentInfo(Record):
+    __slots__ = ('__topic', '__target_bio', '__extra')
+
+    def __init__(self, segment_info, interner):
+        self.__topic = TOPICS.get_code(segment_info['topic'])
+        self.__target_bio = TARGET_BIOS.get_code(segment_info['target_bio'])
+        self.__extra = freeze_dict(segment_info, interner, ['topic', 'target_bio'])
+
+    def keys(self):
+        return ['topic', 'target_bio'] + get_keys(self.__extra)
+
+    def get_value(self, key):
+        if key == 'topic':
+            return TOPICS.get_string(self.__topic)
+        elif key == 'target_bio':
+            return TARGET_BIOS.get_string(self.__target_bio)
+        return get_value(self.__extra, key)
+
+
+class LogUtterance(Record):
+    __slots__ = ('__utter_index', '__speaker', '__transcript', '__segment_info', '__extra')
+
+    def __init__(self, utter, interner):
+        self.__utter_index = utter['utter_index']
+        self.__speaker = SPEAKERS.get_code(utter['speaker'])
+        self.__transcript = None
+        if 'transcript' in utter:
+            self.__transcript = interner.intern(utter['transcript'])
+        self.__segment_info = None
+        if 'segment_info' in utter:
+            self.__segment_info = compact_segment_info(utter['segment_info'], interner)
+        self.__extra = freeze_dict(utter, interner, ['utter_index', 'speaker', 'transcript', 'segment_info'])
+
+    def keys(self):
+        keys = ['utter_index', 'speaker']
+        if self.__transcript is not None:
+            keys.append('transcript')
+        if self.__segment_info is not None:
+            keys.append('segment_info')
+        return keys + get_keys(self.__extra)
+
+    def get_value(self, key):
+        if key == 'utter_index':
+            return self.__utter_index
+        elif key == 'speaker':
+            return SPEAKERS.get_string(self.__speaker)
+        elif key == 'transcript' and self.__transcript is not None:
+            return self.__transcript
+        elif key == 'segment_info' and self.__segment_info is not None:
+            return self.__segment_info
+        return get_value(self.__extra, key)
+
+
+class Alignment(object):
+    """
+    Sequence of the [word, [indices]] pairs of a word alignment, where the indices of all the words are kept in a single array.
+    """
+    __slots__ = ('__words', '__offsets', '__indices')
+
+    def __init__(self, align, interner):
+        self.__words = FrozenList([interner.intern(word) for word, _ in align])
+        self.__offsets = array('i', [0])
+        self.__indices = array('i')
+        for _, indices in align:
+            self.__indices.extend(indices)
+            self.__offsets.append(len(self.__indices))
+
+    def __len__(self):
+        return len(self.__words)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return [self.__words[i], self.__indices[self.__offsets[i]:self.__offsets[i + 1]].tolist()]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, tuple, Alignment)):
+            return NotImplemented
+        return to_plain(self) == to_plain(other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(to_plain(self))
+
+
+class Hypothesis(Record):
+    __slots__ = ('__hyp', '__align', '__extra')
+
+    def __init__(self, hypothesis, interner):
+        self.__hyp = interner.intern(hypothesis['hyp'])
+        self.__align = compact_alignment(hypothesis['align'], interner)
+        self.__extra = freeze_dict(hypothesis, interner, ['hyp', 'align'])
+
+    def keys(self):
+        return ['hyp', 'align'] + get_keys(self.__extra)
+
+    def get_value(self, key):
+        if key == 'hyp':
+            return self.__hyp
+        elif key == 'align':
+            return self.__align
+        return get_value(self.__extra, key)
+
+
+def freeze(value, interner):
+    """
+    Returns a read-only copy of a JSON value, made of FrozenDict, FrozenList and interned strings.
+    """
+    if isinstance(value, dict):
+        return freeze_dict(value, interner, [])
+    elif isinstance(value, list):
+        return FrozenList([freeze(item, interner) for item in value])
+    elif isinstance(value, basestring):
+        return interner.intern(value)
+    return value
+
+
+def freeze_dict(value, interner, skipped_keys):
+    """
+    Returns a FrozenDict of the items of a dict except the skipped keys, or None if there are no other items.
+    """
+    keys = tuple(sorted([key for key in value if key not in skipped_keys]))
+    if len(keys) == 0 and len(skipped_keys) > 0:
+        return None
+    return FrozenDict(interner.intern_keys(keys), tuple([freeze(value[key], interner) for key in keys]))
+
+
+def get_keys(extra):
+    if extra is None:
+        return []
+    return extra.keys()
+
+
+def get_value(extra, key):
+    if extra is None:
+        raise KeyError(key)
+    return extra.get_value(key)
+
+
+def compact_segment_info(segment_info, interner):
+    if 'topic' in segment_info and 'target_bio' in segment_info:
+        return SegmentInfo(segment_info, interner)
+    return freeze(segment_info, interner)
+
+
+def compact_alignment(align, interner):
+    for item in align:
+        if not (isinstance(item, list) and len(item) == 2 and isinstance(item[0], basestring) and isinstance(item[1], list)):
+            return freeze(align, interner)
+    return Alignment(align, interner)
+
+
+def compact_log_utterance(utter, interner):
+    if 'utter_index' in utter and 'speaker' in utter:
+        return LogUtterance(utter, interner)
+    return freeze(utter, interner)
+
+
+def compact_translations_utterance(utter, interner):
+    if not isinstance(utter.get('translated'), list):
+        return freeze(utter, interner)
+
+    hypotheses = []
+    for hypothesis in utter['translated']:
+        if 'hyp' in hypothesis and 'align' in hypothesis:
+            hypotheses.append(Hypothesis(hypothesis, interner))
+        else:
+            hypotheses.append(freeze(hypothesis, interner))
+    keys = tuple(sorted(utter.keys()))
+    values = []
+    for key in keys:
+        if key == 'translated':
+            values.append(FrozenList(hypotheses))
+        else:
+            values.append(freeze(utter[key], interner))
+    return FrozenDict(interner.intern_keys(keys), tuple(values))
+
+
+def compact_labels_utterance(utter, interner):
+    if 'speech_act' in utter:
+        normalize_speech_act(utter['speech_act'])
+    return freeze(utter, interner)
+
+
+def compact_session(session, compact_utterance, interner):
+    """
+    Returns a dict of a whole file of a session, with the utterances replaced by compact records.
+    """
+    result = dict([(key, freeze(value, interner)) for key, value in session.items() if key != 'utterances'])
+    result['utterances'] = FrozenList([compact_utterance(utter, interner) for utter in session['utterances']])
+    return result
+
+
+def to_plain(value):
+    """
+    Returns a copy of a compact value made of dicts and lists, which can be modified or written as JSON.
+    """
+    if isinstance(value, (dict, Record)):
+        return dict([(key, to_plain(item)) for key, item in value.items()])
+    elif isinstance(value, (list, tuple, Alignment)):
+        return [to_plain(item) for item in value]
+    return value
+
+
+class CompactCall(Call):
+    def __init__(self, applog_filename, translations_filename, labels_filename, interner):
+        Call.__init__(self, applog_filename, translations_filename, labels_filename)
+
+        self.log = compact_session(self.log, compact_log_utterance, interner)
+        if self.translations is not None:
+            self.translations = compact_session(self.translations, compact_translations_utterance, interner)
+        if self.labels is not None:
+            self.labels = compact_session(self.labels, compact_labels_utterance, interner)
+
+    def normalize_labels(self, labels):
+        # the speech acts have been normalized before the labels were frozen
+        return labels
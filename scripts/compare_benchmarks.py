@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+"""
+Performance regression gate between two results of benchmark.py.
+
+For every metric of every stage, the medians of the baseline and the current runs are compared in the direction in which the metric gets worse.
+A change is only reported as a regression when it is larger than both the relative threshold and the noise of the runs,
+measured as a number of standard deviations of the samples.
+It prints a table of the changes, and exits with status 1 if any metric has regressed,
+or if a stage or a metric of the baseline is missing or skipped in the current results, unless --allow-missing is given.
+"""
+
+import argparse
+import sys
+import json
+
+
+def compare_metric(baseline, current, threshold, noise, min_delta):
+    """
+    Returns (change, allowed, status), where change is the relative change of the median towards worse values,
+    and allowed is the largest change accepted as noise.
+    """
+    base_value = baseline['median']
+    curr_value = current['median']
+
+    if baseline['better'] == 'lower':
+        delta = curr_value - base_value
+    else:
+        delta = base_value - curr_value
+
+    if base_value == 0.0:
+        change = 0.0 if delta == 0.0 else float('inf') * (1 if delta > 0.0 else -1)
+        allowed = threshold
+    else:
+        change = delta / abs(base_value)
+        allowed = max(threshold, noise * max(baseline['stdev'], current['stdev']) / abs(base_value))
+
+    if abs(delta) <= min_delta or abs(change) <= allowed:
+        status = 'ok'
+    elif change > 0.0:
+        status = 'REGRESSION'
+    else:
+        status = 'improved'
+    return change, allowed, status
+
+
+def compare(baseline, current, threshold, noise, min_delta, allow_missing=False):
+    """
+    Returns a list of (stage, metric, baseline_median, current_median, change, allowed, status).
+    A stage or a metric of the baseline which is missing or skipped in the current results has the status MISSING or SKIPPED,
+    which fails the gate like a regression, unless allow_missing is set. The ones which are only in the current results are new.
+    """
+    missing_status = 'missing' if allow_missing else 'MISSING'
+    skipped_status = 'skipped' if allow_missing else 'SKIPPED'
+
+    result = []
+    for stage in sorted(set(baseline['stages'].keys()) | set(current['stages'].keys())):
+        base_stage = baseline['stages'].get(stage)
+        curr_stage = current['stages'].get(stage)
+        if base_stage is None:
+            result.append((stage, '-', None, None, None, None, 'new'))
+            continue
+        if 'skipped' in base_stage:
+            result.append((stage, '-', None, None, None, None, 'skipped'))
+            continue
+        if curr_stage is None:
+            result.append((stage, '-', None, None, None, None, missing_status))
+            continue
+        if 'skipped' in curr_stage:
+            result.append((stage, '-', None, None, None, None, skipped_status))
+            continue
+
+        for metric in sorted(set(base_stage['metrics'].keys()) | set(curr_stage['metrics'].keys())):
+            if metric not in base_stage['metrics']:
+                result.append((stage, metric, None, None, None, None, 'new'))
+                continue
+            if metric not in curr_stage['metrics']:
+                result.append((stage, metric, base_stage['metrics'][metric]['median'], None, None, None, missing_status))
+                continue
+            base_metric = base_stage['metrics'][metric]
+            curr_metric = curr_stage['metrics'][metric]
+            change, allowed, status = compare_metric(base_metric, curr_metric, threshold, noise, min_delta)
+            result.append((stage, metric, base_metric['median'], curr_metric['median'], change, allowed, status))
+    return result
+
+
+def format_value(value, fmt):
+    if value is None:
+        return '-'
+    return fmt % value
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Compare two benchmark results and fail on performance regressions.')
+    parser.add_argument('--baseline', dest='baseline', action='store', required=True, metavar='JSON_FILE', help='Benchmark results of the reference version')
+    parser.add_argument('--current', dest='current', action='store', required=True, metavar='JSON_FILE', help='Benchmark results of the version to check')
+    parser.add_argument('--threshold', dest='threshold', action='store', type=float, default=0.1, help='Relative change of a median below which it is never a regression')
+    parser.add_argument('--noise', dest='noise', action='store', type=float, default=3.0, help='Number of standard deviations of the samples within which a change is considered noise')
+    parser.add_argument('--min-delta', dest='min_delta', action='store', type=float, default=0.0, help='Absolute change of a median below which it is never a regression')
+    parser.add_argument('--allow-missing', dest='allow_missing', action='store_true', help='Pass the gate when a stage or a metric of the baseline is missing or skipped in the current results')
+
+    args = parser.parse_args()
+
+    baseline = json.load(open(args.baseline))
+    current = json.load(open(args.current))
+
+    for key in ['dataset', 'sessions', 'utterances', 'seed', 'method']:
+        if baseline['config'].get(key) != current['config'].get(key):
+            sys.stderr.write('Warning: the benchmarks were run with different %s (%s, %s)\n' % (key, baseline['config'].get(key), current['config'].get(key)))
+
+    rows = compare(baseline, current, args.threshold, args.noise, args.min_delta, args.allow_missing)
+
+    print '%-35s | %14s | %14s | %9s | %9s | %s' % ('metric', 'baseline', 'current', 'worse by', 'allowed', 'status')
+    print '-' * 105
+    for stage, metric, base_value, curr_value, change, allowed, status in rows:
+        print '%-35s | %14s | %14s | %9s | %9s | %s' % (
+            '%s.%s' % (stage, metric),
+            format_value(base_value, '%.7f'),
+            format_value(curr_value, '%.7f'),
+            format_value(None if change is None else change * 100.0, '%+.1f%%'),
+            format_value(None if allowed is None else allowed * 100.0, '%.1f%%'),
+            status)
+
+    regressions = [row for row in rows if row[-1] == 'REGRESSION']
+    missing = [row for row in rows if row[-1] in ['MISSING', 'SKIPPED']]
+    if len(regressions) > 0 or len(missing) > 0:
+        print
+        print 'Found %d regressions and %d missing or skipped metrics' % (len(regressions), len(missing))
+        sys.exit(1)
+    print
+    print 'Found no regressions'
+
+if __name__ == "__main__":
+    main(sys.argv)
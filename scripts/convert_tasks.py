@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+__author__ = "Seokhwan Kim"
+
+"""
+Dataset converter for SAP and SLG pilot tasks of DSTC5.
+
+It parses the labels of each session only once and writes the input and label files of both pilot tasks for both roles from the same parse.
+The sessions are converted in a pool of processes. A manifest keeps the size, mtime and MD5 of the log and label files each session was converted from,
+and only the sessions whose inputs have changed since then are converted again.
+"""
+
+import argparse
+import sys
+import dataset_walker
+import json
+import os
+import hashlib
+from multiprocessing import Pool
+from semantic_tag_parser import SemanticTagParser
+
+TASKS = ['SAP', 'SLG']
+ROLES = [u'Guide', u'Tourist']
+MANIFEST_FILENAME = 'convert_manifest.json'
+
+
+def get_output_filenames(task, roletype):
+    prefix = '%s.%s' % (task.lower(), roletype.lower())
+    return ('%s.in.json' % (prefix,), '%s.label.json' % (prefix,))
+
+
+def get_semantic_tags(label_utter):
+    mention_words = []
+    curr_cat = None
+    curr_attrs = None
+
+    semantic_tags = []
+
+    for semantic_tagged in label_utter['semantic_tagged']:
+        parser = SemanticTagParser(False)
+        parser.feed(semantic_tagged)
+
+        for word, (bio, cat, attrs) in zip(parser.get_word_seq(), parser.get_word_tag_seq()):
+            if bio == 'I':
+                mention_words.append(word)
+            else:
+                if curr_cat is not None:
+                    semantic_tags.append({
+                        u'main': curr_cat,
+                        u'attributes': curr_attrs,
+                        u'mention': ' '.join(mention_words)
+                    })
+
+                mention_words = []
+                curr_cat = None
+                curr_attrs = None
+
+                if bio == 'B':
+                    mention_words = [word]
+                    curr_cat = cat
+                    curr_attrs = {}
+                    for key, value in attrs:
+                        curr_attrs[key] = value
+
+        if curr_cat is not None:
+            semantic_tags.append({
+                u'main': curr_cat,
+                u'attributes': curr_attrs,
+                u'mention': ' '.join(mention_words)
+            })
+
+    return semantic_tags
+
+
+def get_target_entries(task, utter_index, speaker, transcript, semantic_tags, speech_act):
+    """
+    Returns the entries of an utterance in the input and label files for the role who spoke it.
+    """
+    if task == 'SAP':
+        input_entry = {
+            u'utter_index': utter_index,
+            u'speaker': speaker,
+            u'semantic_tags': semantic_tags
+        }
+        label_entry = {
+            u'utter_index': utter_index,
+            u'speech_act': speech_act
+        }
+    elif task == 'SLG':
+        input_entry = {
+            u'utter_index': utter_index,
+            u'speaker': speaker,
+            u'semantic_tags': semantic_tags,
+            u'speech_act': speech_act
+        }
+        label_entry = {
+            u'utter_index': utter_index,
+            u'transcript': transcript
+        }
+    else:
+        raise RuntimeError('Wrong task identifier: %s' % (task,))
+    return input_entry, label_entry
+
+
+def convert_call(call, tasks):
+    """
+    Returns {(task, roletype): (input, label)} objects for a session.
+    """
+    session_id = call.log["session_id"]
+
+    result = {}
+    for task in tasks:
+        for roletype in ROLES:
+            result[(task, roletype)] = (
+                {u'session_id': session_id, u'utterances': [], u'roletype': roletype},
+                {u'session_id': session_id, u'utterances': [], u'roletype': roletype})
+
+    for (log_utter, _, label_utter) in call:
+        speaker = log_utter['speaker']
+        utter_index = log_utter['utter_index']
+        transcript = log_utter['transcript']
+
+        speech_act = label_utter['speech_act']
+        semantic_tags = get_semantic_tags(label_utter)
+
+        for task in tasks:
+            for roletype in ROLES:
+                task_input, task_label = result[(task, roletype)]
+                if speaker == roletype:
+                    input_entry, label_entry = get_target_entries(task, utter_index, speaker, transcript, semantic_tags, speech_act)
+                    task_input[u'utterances'].append(input_entry)
+                    task_label[u'utterances'].append(label_entry)
+                elif speaker in ROLES:
+                    task_input[u'utterances'].append({
+                        u'utter_index': utter_index,
+                        u'speaker': speaker,
+                        u'transcript': transcript,
+                        u'semantic_tags': semantic_tags,
+                        u'speech_act': speech_act
+                    })
+
+    return result
+
+
+def get_signature(filename, with_md5=True):
+    stat = os.stat(filename)
+    result = {'mtime': stat.st_mtime, 'size': stat.st_size}
+    if with_md5:
+        md5 = hashlib.md5()
+        with open(filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                md5.update(chunk)
+        result['md5'] = md5.hexdigest()
+    return result
+
+
+def load_manifest(manifest_filename):
+    if os.path.exists(manifest_filename):
+        with open(manifest_filename, 'r') as f:
+            return json.load(f)
+    return {'sessions': {}}
+
+
+def save_manifest(manifest, manifest_filename):
+    tmp_filename = manifest_filename + '.tmp'
+    with open(tmp_filename, 'w') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.rename(tmp_filename, manifest_filename)
+
+
+def is_newer(session_dirname, input_filenames, task):
+    input_mtime = max([os.path.getmtime(filename) for filename in input_filenames])
+    for roletype in ROLES:
+        for filename in get_output_filenames(task, roletype):
+            path = os.path.join(session_dirname, filename)
+            if os.path.getmtime(path) <= input_mtime:
+                return False
+    return True
+
+
+def is_recorded(input_filenames, task_entry):
+    if task_entry is None:
+        return False
+    for filename in input_filenames:
+        recorded = task_entry.get(os.path.basename(filename))
+        current = get_signature(filename, False)
+        if recorded is None or current['mtime'] != recorded['mtime'] or current['size'] != recorded['size']:
+            return False
+    return True
+
+
+def get_rebuild_reason(session_dirname, input_filenames, task, entry):
+    """
+    Returns why the files of a task should be regenerated for a session, or None if they are up to date.
+    The inputs are compared to the manifest entry by their mtime and size first, and by their MD5 only if those differ,
+    so that touched but unchanged files do not trigger a conversion.
+    Without a manifest entry, the outputs are up to date if they are all newer than the inputs.
+    """
+    for roletype in ROLES:
+        for filename in get_output_filenames(task, roletype):
+            if not os.path.exists(os.path.join(session_dirname, filename)):
+                return '%s is missing' % (filename,)
+
+    if entry is None or task not in entry:
+        if is_newer(session_dirname, input_filenames, task):
+            return None
+        return 'not in manifest'
+
+    for filename in input_filenames:
+        basename = os.path.basename(filename)
+        recorded = entry[task].get(basename)
+        if recorded is None:
+            return '%s is not in manifest' % (basename,)
+        current = get_signature(filename, False)
+        if current['mtime'] == recorded['mtime'] and current['size'] == recorded['size']:
+            continue
+        if current['size'] != recorded['size'] or get_signature(filename)['md5'] != recorded['md5']:
+            return '%s has changed' % (basename,)
+    return None
+
+
+def convert_session(job):
+    """
+    Converts a single session for the given tasks, which is the unit of work for the process pool.
+    Returns the session_dirname.
+    """
+    session_dirname, applog_filename, labels_filename, tasks = job
+
+    call = dataset_walker.Call(applog_filename, None, labels_filename)
+    for (task, roletype), objs in convert_call(call, tasks).items():
+        for filename, obj in zip(get_output_filenames(task, roletype), objs):
+            with open(os.path.join(session_dirname, filename), 'w') as fp:
+                json.dump(obj, fp)
+
+    return session_dirname
+
+
+def convert(dataset, dataroot, tasks=TASKS, jobs=1, force=False, dry_run=False):
+    """
+    Converts the sessions of a dataset whose task files are out of date, and records the inputs in the manifest
+    <dataroot>/convert_manifest.json.
+    Returns a list of (session_dirname, [(task, reason), ...]) for the sessions to be rebuilt.
+    """
+    walker = dataset_walker.dataset_walker(dataset, dataroot=dataroot, labels=True, translations=False)
+    manifest_filename = os.path.join(walker.dataroot, MANIFEST_FILENAME)
+    manifest = load_manifest(manifest_filename)
+
+    plan = []
+    job_list = []
+    for session_dirname, applog_filename, _, labels_filename in walker.iter_filenames():
+        input_filenames = [applog_filename, labels_filename]
+        key = os.path.relpath(session_dirname, walker.dataroot)
+        entry = manifest['sessions'].get(key)
+
+        rebuild = []
+        for task in tasks:
+            if force:
+                reason = 'forced'
+            else:
+                reason = get_rebuild_reason(session_dirname, input_filenames, task, entry)
+            if reason is not None:
+                rebuild.append((task, reason))
+
+        if len(rebuild) > 0:
+            plan.append((session_dirname, rebuild))
+            job_list.append((session_dirname, applog_filename, labels_filename, [task for task, _ in rebuild]))
+
+        if not dry_run:
+            # the outputs are recorded against the inputs read by this run, so the signatures are taken beforehand
+            rebuilt_tasks = [task for task, _ in rebuild]
+            entry = manifest['sessions'].setdefault(key, {})
+            signatures = None
+            for task in tasks:
+                if task in rebuilt_tasks or not is_recorded(input_filenames, entry.get(task)):
+                    if signatures is None:
+                        signatures = dict([(os.path.basename(filename), get_signature(filename)) for filename in input_filenames])
+                    entry[task] = signatures
+
+    if dry_run:
+        return plan
+
+    if jobs > 1 and len(job_list) > 1:
+        pool = Pool(jobs)
+        pool.map(convert_session, job_list)
+        pool.close()
+        pool.join()
+    else:
+        for job in job_list:
+            convert_session(job)
+
+    save_manifest(manifest, manifest_filename)
+
+    return plan
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Dataset Converter for SAP and SLG pilot tasks.')
+    parser.add_argument('--dataset', dest='dataset', action='store', metavar='DATASET', required=True, help='The target dataset to be converted')
+    parser.add_argument('--dataroot', dest='dataroot', action='store', required=True, metavar='PATH',  help='Will look for corpus in <destroot>/...')
+    parser.add_argument('--tasks', dest='tasks', action='store', nargs='+', choices=TASKS, default=TASKS, help='Pilot tasks to convert the dataset for')
+    parser.add_argument('--jobs', dest='jobs', action='store', type=int, default=1, metavar='N', help='Number of worker processes')
+    parser.add_argument('--force', dest='force', action='store_true', help='Convert the sessions even if their outputs are up to date')
+    parser.add_argument('--dry-run', dest='dry_run', action='store_true', help='Only report the sessions which would be rebuilt')
+
+    args = parser.parse_args()
+
+    plan = convert(args.dataset, args.dataroot, args.tasks, args.jobs, args.force, args.dry_run)
+
+    for session_dirname, rebuild in plan:
+        for task, reason in rebuild:
+            print '%s %s - %s' % (session_dirname, task, reason)
+
+    if args.dry_run:
+        sys.stderr.write('Would convert %d sessions\n' % (len(plan),))
+    else:
+        sys.stderr.write('Converted %d sessions\n' % (len(plan),))
+
+if __name__ == "__main__":
+    main(sys.argv)
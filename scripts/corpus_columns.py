@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+"""
+Columnar export of the utterances and the labels of a dataset, for the statistics of the error analysis.
+
+The dataset is walked once with dataset_walker and written as four tables, each with a row per:
+- utterances: utterance, with its session_id, utter_index, speaker, topic and target_bio
+- frames: value of a slot in the frame_label of an utterance, with the columns of the utterance and the slot and the value
+- acts: act in the speech_act label of an utterance, with the columns of the utterance and the act
+- speech_acts: attribute of an act in the speech_act label of an utterance, with the columns of the utterance and the act and the attribute
+Each column is a .npy file of integers, which is opened with mmap, so that loading the tables takes milliseconds.
+The string columns are coded as indices into the sorted list of their values in meta.json, with -1 for the missing ones,
+and the columns of the same name share their list across the tables.
+
+    python corpus_columns.py --dataset dstc5_dev --dataroot ../data --outdir dstc5_dev.columns
+    python query_columns.py --indir dstc5_dev.columns --query values_by_slot
+"""
+
+import argparse
+import sys
+import os
+import json
+
+import numpy as np
+
+import dataset_walker
+
+META_FILENAME = 'meta.json'
+
+UTTERANCE_COLUMNS = ['session_id', 'utter_index', 'speaker', 'topic', 'target_bio']
+TABLE_COLUMNS = {
+    'utterances': UTTERANCE_COLUMNS,
+    'frames': UTTERANCE_COLUMNS + ['slot', 'value'],
+    'acts': UTTERANCE_COLUMNS + ['act'],
+    'speech_acts': UTTERANCE_COLUMNS + ['act', 'attribute']
+}
+STRING_COLUMNS = ['speaker', 'topic', 'target_bio', 'slot', 'value', 'act', 'attribute']
+
+
+def walk_rows(dataset, dataroot):
+    """
+    Walks a dataset and returns a dict from each table name to the dict of its columns, as lists of ints and strings.
+    """
+    tables = dict([(name, dict([(column, []) for column in columns])) for name, columns in TABLE_COLUMNS.items()])
+
+    def add_row(name, values):
+        for column in TABLE_COLUMNS[name]:
+            tables[name][column].append(values.get(column))
+
+    for call in dataset_walker.dataset_walker(dataset, dataroot=dataroot, labels=True, translations=False):
+        session_id = call.log['session_id']
+        for (log_utter, translations, label_utter) in call:
+            segment_info = log_utter.get('segment_info', {})
+            utterance = {
+                'session_id': session_id,
+                'utter_index': log_utter['utter_index'],
+                'speaker': log_utter['speaker'],
+                'topic': segment_info.get('topic'),
+                'target_bio': segment_info.get('target_bio')
+            }
+            add_row('utterances', utterance)
+
+            if label_utter is None:
+                continue
+            for slot, values in label_utter.get('frame_label', {}).items():
+                for value in values:
+                    row = dict(utterance)
+                    row.update({'slot': slot, 'value': value})
+                    add_row('frames', row)
+            for act in label_utter.get('speech_act', []):
+                row = dict(utterance)
+                row.update({'act': act['act']})
+                add_row('acts', row)
+                # an act without attributes still has a row, with a missing attribute
+                for attribute in act['attributes'] or [None]:
+                    row = dict(utterance)
+                    row.update({'act': act['act'], 'attribute': attribute})
+                    add_row('speech_acts', row)
+    return tables
+
+
+def export(dataset, dataroot, outdir):
+    tables = walk_rows(dataset, dataroot)
+
+    codes = {}
+    for column in STRING_COLUMNS:
+        strings = set()
+        for name, columns in TABLE_COLUMNS.items():
+            if column in columns:
+                strings.update([value for value in tables[name][column] if value is not None])
+        codes[column] = sorted(strings)
+
+    if not os.path.exists(outdir):
+        os.makedirs(outdir)
+
+    meta = {'dataset': dataset, 'tables': {}, 'codes': codes}
+    for name, columns in TABLE_COLUMNS.items():
+        for column in columns:
+            values = tables[name][column]
+            if column in codes:
+                index = dict([(string, code) for code, string in enumerate(codes[column])])
+                values = [-1 if value is None else index[value] for value in values]
+            np.save(os.path.join(outdir, '%s.%s.npy' % (name, column)), np.array(values, dtype=np.int32))
+        meta['tables'][name] = {'columns': columns, 'rows': len(tables[name][columns[0]])}
+
+    # meta.json is written last, so that the tables are not loaded before all of their columns are written
+    with open(os.path.join(outdir, META_FILENAME), 'w') as f:
+        json.dump(meta, f, indent=4, sort_keys=True)
+    return meta
+
+
+class CorpusColumns(object):
+    def __init__(self, indir):
+        with open(os.path.join(indir, META_FILENAME)) as f:
+            self.meta = json.load(f)
+        self.tables = {}
+        for name, table in self.meta['tables'].items():
+            self.tables[name] = dict([(column, np.load(os.path.join(indir, '%s.%s.npy' % (name, column)), mmap_mode='r')) for column in table['columns']])
+
+    def get_num_rows(self, table):
+        return self.meta['tables'][table]['rows']
+
+    def get_code(self, column, string):
+        """
+        Returns the code of a string in a column, or None if the column never has the string.
+        """
+        try:
+            return self.meta['codes'][column].index(string)
+        except ValueError:
+            return None
+
+    def decode(self, column, code):
+        if column not in self.meta['codes']:
+            return int(code)
+        if code < 0:
+            return None
+        return self.meta['codes'][column][code]
+
+    def select(self, table, where=None):
+        """
+        Returns the boolean mask of the rows of a table whose columns have the values of a dict of strings or ints.
+        """
+        mask = np.ones(self.get_num_rows(table), dtype=bool)
+        for column, value in (where or {}).items():
+            if column in self.meta['codes']:
+                value = self.get_code(column, value)
+                if value is None:
+                    return np.zeros(self.get_num_rows(table), dtype=bool)
+            mask &= self.tables[table][column] == value
+        return mask
+
+    def count_by(self, table, columns, where=None):
+        """
+        Returns the list of (values, count) of the distinct values of the columns among the rows of a table, by decreasing count.
+        """
+        return self.__count(table, columns, self.select(table, where), None)
+
+    def count_distinct_by(self, table, columns, distinct_column, where=None):
+        """
+        Returns the list of (values, count) where count is the number of distinct values of another column for the values of the columns.
+        """
+        return self.__count(table, columns, self.select(table, where), distinct_column)
+
+    def __count(self, table, columns, mask, distinct_column):
+        key_columns = list(columns)
+        if distinct_column is not None:
+            key_columns.append(distinct_column)
+        keys = np.stack([np.asarray(self.tables[table][column])[mask] for column in key_columns], axis=1)
+        if len(keys) == 0:
+            return []
+        if distinct_column is not None:
+            # each distinct value is only counted once for its group
+            keys = np.unique(keys, axis=0)
+        groups, counts = np.unique(keys[:, :len(columns)], axis=0, return_counts=True)
+
+        result = [(tuple([self.decode(column, code) for column, code in zip(columns, group)]), int(count)) for group, count in zip(groups, counts)]
+        result.sort(key=lambda item: (-item[1], item[0]))
+        return result
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Export the utterances and the labels of a dataset as columnar tables.')
+    parser.add_argument('--dataset', dest='dataset', action='store', metavar='DATASET', required=True, help='The dataset to export')
+    parser.add_argument('--dataroot', dest='dataroot', action='store', required=True, metavar='PATH', help='Will look for corpus in <destroot>/<dataset>/...')
+    parser.add_argument('--outdir', dest='outdir', action='store', required=True, metavar='PATH', help='Directory to write with the tables')
+
+    args = parser.parse_args()
+
+    sys.stderr.write('Exporting %s ... ' % (args.dataset,))
+    meta = export(args.dataset, args.dataroot, args.outdir)
+    sys.stderr.write('Done\n')
+
+    for name in sorted(meta['tables']):
+        sys.stderr.write('%s: %d rows\n' % (name, meta['tables'][name]['rows']))
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+"""
+Reports the memory taken by all the sessions of a dataset when they are read as dicts and as the compact records of compact_corpus.py.
+
+    python corpus_memory.py --dataset dstc5_train --dataroot ../data --verify
+"""
+
+import argparse
+import sys
+import json
+
+import dataset_walker
+from compact_corpus import Record, Alignment, to_plain
+
+
+def get_deep_size(obj):
+    """
+    Returns the number of bytes taken by an object and all the objects it refers to, counting the shared objects once.
+    """
+    seen = set()
+    size = 0
+    stack = [obj]
+    while len(stack) > 0:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set)):
+            stack.extend(obj)
+        elif isinstance(obj, (Record, Alignment)):
+            for cls in type(obj).__mro__:
+                for name in getattr(cls, '__slots__', ()):
+                    if name.startswith('__'):
+                        name = '_%s%s' % (cls.__name__, name)
+                    stack.append(getattr(obj, name))
+    return size
+
+
+def load_sessions(dataset, dataroot, compact):
+    """
+    Returns the list of the (log, translations, labels) lists of all the sessions of a dataset, and the walker which read them.
+    """
+    walker = dataset_walker.dataset_walker(dataset, dataroot=dataroot, labels=True, translations=True, compact=compact)
+    sessions = [list(call) for call in walker]
+    return sessions, walker
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Compare the memory taken by the sessions of a dataset as dicts and as compact records.')
+    parser.add_argument('--dataset', dest='dataset', action='store', metavar='DATASET', required=True, help='The dataset to load')
+    parser.add_argument('--dataroot', dest='dataroot', action='store', required=True, metavar='PATH', help='Will look for corpus in <destroot>/<dataset>/...')
+    parser.add_argument('--verify', dest='verify', action='store_true', help='Check that the compact records are equal to the dicts')
+
+    args = parser.parse_args()
+
+    sys.stderr.write('Loading the sessions as dicts ... ')
+    plain_sessions, _ = load_sessions(args.dataset, args.dataroot, False)
+    plain_size = get_deep_size(plain_sessions)
+    sys.stderr.write('Done\n')
+
+    sys.stderr.write('Loading the sessions as compact records ... ')
+    compact_sessions, walker = load_sessions(args.dataset, args.dataroot, True)
+    # the interner of the walker is counted, as it is kept as long as the walker
+    compact_size = get_deep_size([compact_sessions, walker.interner.strings, walker.interner.keys])
+    sys.stderr.write('Done\n')
+
+    if args.verify:
+        for plain_session, compact_session in zip(plain_sessions, compact_sessions):
+            for plain_utter, compact_utter in zip(plain_session, compact_session):
+                if json.dumps(to_plain(compact_utter), sort_keys=True) != json.dumps(plain_utter, sort_keys=True):
+                    raise RuntimeError('The compact records differ from the dicts: %s' % (json.dumps(plain_utter),))
+        sys.stderr.write('The compact records are equal to the dicts\n')
+
+    num_utterances = sum([len(session) for session in plain_sessions])
+    print '%25s : %d' % ('sessions', len(plain_sessions))
+    print '%25s : %d' % ('utterances', num_utterances)
+    print '%25s : %d' % ('dict_bytes', plain_size)
+    print '%25s : %d' % ('compact_bytes', compact_size)
+    print '%25s : %.1f' % ('dict_per_utterance', float(plain_size) / num_utterances)
+    print '%25s : %.1f' % ('compact_per_utterance', float(compact_size) / num_utterances)
+    print '%25s : %.1f%%' % ('saved', 100.0 * (plain_size - compact_size) / plain_size)
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -1,15 +1,20 @@
 # -*- coding: utf-8 -*-
 
 """
-This module makes it easy to iterate through a dataset specified by file list (.flist) in scripts/config.
+This module makes it easy to iterate through a dataset specified by file list (.flist) in scripts/config,
+or in the dataroot for the datasets which are not distributed, such as the synthetic ones of generate_corpus.py.
 """
 
 import os
 import json
 
 
+def get_flist_filename(dataset, dataroot):
+    return os.path.join(dataroot, dataset + '.flist')
+
+
 class dataset_walker(object):
-    def __init__(self, dataset, labels=False, translations=True, dataroot=None, task='MAIN', roletype=None):
+    def __init__(self, dataset, labels=False, translations=True, dataroot=None, task='MAIN', roletype=None, compact=False):
         if "[" in dataset:
             self.datasets = json.loads(dataset)
         elif type(dataset) == type([]):
@@ -18,17 +23,30 @@ class dataset_walker(object):
             self.datasets = [dataset]
             self.dataset = dataset
         self.install_root = os.path.abspath(os.path.dirname(os.path.abspath(__file__)))
-        self.dataset_session_lists = [os.path.join(self.install_root, 'config', dataset_id + '.flist') for dataset_id in self.datasets]
 
         self.labels = labels
         self.translations = translations
 
+        # the compact records share the strings of all the sessions read by the walker
+        self.interner = None
+        if compact:
+            import compact_corpus
+            self.interner = compact_corpus.Interner()
+
         if (dataroot == None):
             install_parent = os.path.dirname(self.install_root)
             self.dataroot = os.path.join(install_parent,'data')
         else:
             self.dataroot = os.path.join(os.path.abspath(dataroot))
 
+        # the file list of a dataset which isn't in config/, such as a synthetic one, is looked for in the dataroot
+        self.dataset_session_lists = []
+        for dataset_id in self.datasets:
+            dataset_session_list = os.path.join(self.install_root, 'config', dataset_id + '.flist')
+            if not os.path.exists(dataset_session_list):
+                dataset_session_list = get_flist_filename(dataset_id, self.dataroot)
+            self.dataset_session_lists.append(dataset_session_list)
+
         # load dataset (list of calls)
         self.session_list = []
         for dataset_session_list in self.dataset_session_lists:
@@ -65,6 +83,19 @@ class dataset_walker(object):
             raise RuntimeError, 'Wrong task identifier: %s' % (task)
 
     def __iter__(self):
+        for session_dirname, applog_filename, translations_filename, labels_filename in self.iter_filenames():
+            if self.interner is not None:
+                import compact_corpus
+                call = compact_corpus.CompactCall(applog_filename, translations_filename, labels_filename, self.interner)
+            else:
+                call = Call(applog_filename, translations_filename, labels_filename)
+            call.dirname = session_dirname
+            yield call
+
+    def iter_filenames(self):
+        """
+        Yields (session_dirname, log, translations, labels) file names of each session without loading them.
+        """
         for session_id in self.session_list:
             session_id_list = session_id.split('/')
             session_dirname = os.path.join(self.dataroot, *session_id_list)
@@ -84,9 +115,7 @@ class dataset_walker(object):
             else:
                 labels_filename = None
 
-            call = Call(applog_filename, translations_filename, labels_filename)
-            call.dirname = session_dirname
-            yield call
+            yield session_dirname, applog_filename, translations_filename, labels_filename
 
     def __len__(self, ):
         return len(self.session_list)
@@ -140,20 +169,30 @@ class Call(object):
 
             labels = None
             if utter_index in labels_dict:
-                labels = labels_dict[utter_index]
-                if 'speech_act' in labels:
-                    for i in range(len(labels['speech_act'])):
-                        act = labels['speech_act'][i]['act'].strip().upper()
-                        if act == '':
-                            act = 'NONE'
-                        labels['speech_act'][i]['act'] = act
-                        for j in range(len(labels['speech_act'][i]['attributes'])):
-                            attr = labels['speech_act'][i]['attributes'][j].strip()
-                            if attr is None or attr == '':
-                                attr = 'NONE'
-                            labels['speech_act'][i]['attributes'][j] = attr
-            
+                labels = self.normalize_labels(labels_dict[utter_index])
+
             yield (log, trans, labels)
 
+    def normalize_labels(self, labels):
+        if 'speech_act' in labels:
+            normalize_speech_act(labels['speech_act'])
+        return labels
+
     def __len__(self, ):
         return len(self.log['utterances'])
+
+
+def normalize_speech_act(speech_act):
+    """
+    Upper-cases the acts and strips the acts and the attributes of a speech_act label in place, with NONE for the empty ones.
+    """
+    for i in range(len(speech_act)):
+        act = speech_act[i]['act'].strip().upper()
+        if act == '':
+            act = 'NONE'
+        speech_act[i]['act'] = act
+        for j in range(len(speech_act[i]['attributes'])):
+            attr = speech_act[i]['attributes'][j].strip()
+            if attr is None or attr == '':
+                attr = 'NONE'
+            speech_act[i]['attributes'][j] = attr
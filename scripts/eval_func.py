@@ -35,29 +35,37 @@ def eval_acts(ref_act_objs, pred_act_objs, stat_acts):
             pred_act_attr_list, ref_act_attr_list, list_mode=True)
 
 
-def eval_semantics(ref_tagged, pred_tagged, stat_semantics):
-    parser_ref = SemanticTagParser()
-    parser_pred = SemanticTagParser()
-    try:
-        parser_ref.feed(ref_tagged)
-        ref_chr_seq = parser_ref.get_chr_seq()
-        ref_space_seq = parser_ref.get_chr_space_seq()
+def get_word_tag_seqs(parser_ref, parser_pred, ref_tagged, pred_tagged):
+    """
+    Feeds the reference and the predicted tagged utterances to their parsers, tokenizes both of them with the word boundaries of either,
+    and returns the (bio, tag, attrs) sequences of their words, which are aligned one to one.
+    """
+    parser_ref.feed(ref_tagged)
+    ref_chr_seq = parser_ref.get_chr_seq()
+    ref_space_seq = parser_ref.get_chr_space_seq()
 
-        parser_pred.feed(pred_tagged)
-        pred_chr_seq = parser_pred.get_chr_seq()
-        pred_space_seq = parser_pred.get_chr_space_seq()
+    parser_pred.feed(pred_tagged)
+    pred_chr_seq = parser_pred.get_chr_seq()
+    pred_space_seq = parser_pred.get_chr_space_seq()
 
-        if ref_chr_seq != pred_chr_seq:
-            raise
+    if ref_chr_seq != pred_chr_seq:
+        raise ValueError('The predicted tagged utterance does not have the characters of the reference one: %s' % (pred_tagged,))
 
-        merged_space_seq = [
-            x or y for x, y in zip(ref_space_seq, pred_space_seq)]
+    merged_space_seq = [
+        x or y for x, y in zip(ref_space_seq, pred_space_seq)]
 
-        parser_ref.tokenize(merged_space_seq)
-        parser_pred.tokenize(merged_space_seq)
+    parser_ref.tokenize(merged_space_seq)
+    parser_pred.tokenize(merged_space_seq)
 
-        ref_word_tag_seq = parser_ref.get_word_tag_seq()
-        pred_word_tag_seq = parser_pred.get_word_tag_seq()
+    return parser_ref.get_word_tag_seq(), parser_pred.get_word_tag_seq()
+
+
+def eval_semantics(ref_tagged, pred_tagged, stat_semantics):
+    parser_ref = SemanticTagParser()
+    parser_pred = SemanticTagParser()
+    try:
+        ref_word_tag_seq, pred_word_tag_seq = get_word_tag_seqs(
+            parser_ref, parser_pred, ref_tagged, pred_tagged)
 
         for ref_tuple, pred_tuple in zip(ref_word_tag_seq, pred_word_tag_seq):
             ref_bio, ref_tag, ref_attrs = ref_tuple
@@ -101,5 +109,54 @@ def eval_semantics(ref_tagged, pred_tagged, stat_semantics):
         print "HTMLParseError: %s" % err
 
 
+def eval_semantics_columnar(ref_tagged, pred_tagged, stat_semantics):
+    """
+    Same evaluation as eval_semantics, but every word object is turned into a hashable key
+    and handed over to Stat_Columnar_Precision_Recall instances for the whole utterance at once.
+    """
+    parser_ref = SemanticTagParser()
+    parser_pred = SemanticTagParser()
+    try:
+        ref_word_tag_seq, pred_word_tag_seq = get_word_tag_seqs(
+            parser_ref, parser_pred, ref_tagged, pred_tagged)
+
+        ref_keys = []
+        pred_keys = []
+        for ref_tuple, pred_tuple in zip(ref_word_tag_seq, pred_word_tag_seq):
+            ref_keys.append(_get_word_keys(ref_tuple))
+            pred_keys.append(_get_word_keys(pred_tuple))
+
+        for i, level in enumerate(['detection', 'class', 'all']):
+            if level in stat_semantics:
+                stat_semantics[level].extend(
+                    [x[i] for x in pred_keys], [x[i] for x in ref_keys])
+
+        parser_ref.close()
+        parser_pred.close()
+    except HTMLParseError, err:
+        print "HTMLParseError: %s" % err
+
+
+def _get_word_keys(word_tag):
+    bio, tag, attrs = word_tag
+    if bio is None:
+        return (None, None, None)
+
+    obj = {'bio': bio}
+    detection_key = tuple(sorted(obj.items()))
+
+    if tag is not None:
+        obj['tag'] = tag
+    class_key = tuple(sorted(obj.items()))
+
+    if attrs is not None:
+        for (s, v) in attrs:
+            if v != 'NONE':
+                obj[s] = v
+    all_key = tuple(sorted(obj.items()))
+
+    return (detection_key, class_key, all_key)
+
+
 def eval_utt(ref, pred, stat_text):
     stat_text['all'].add(ref, pred)
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+"""
+Generator of synthetic sessions in the format of the DSTC5 corpus.
+
+It writes log.json, translations.json and label.json for each session under <dataroot>/<dataset>/ and the file list <dataroot>/<dataset>.flist,
+so that the synthetic dataset can be read by dataset_walker like the real ones without adding files to config/.
+The topics, slot values, speech acts and semantic tags are drawn from the ontology, and the slot values of each segment are mentioned
+in the Chinese transcripts by their translations and in the English translations by their entries, so that the baselines find some of them.
+The same seed always generates the same sessions, which makes the dataset suitable for benchmarks at a configurable scale.
+"""
+
+import argparse
+import sys
+import os
+import json
+import random
+from ontology_reader import OntologyReader
+from dataset_walker import get_flist_filename
+
+SPEAKERS = [u'Guide', u'Tourist']
+CN_CHARS = u'我们你他去看吃饭酒店好的可以想要多少钱在哪里这个那边还有一下地方时间坐车走路'
+EN_WORDS = u'the a to go visit place eat food hotel nice you can i want see how much there where is it and we take bus walk'.split()
+
+
+class SyntheticCorpusGenerator(object):
+    def __init__(self, ontology, seed=0, min_utterances=20, max_utterances=60):
+        self.tagsets = ontology.get_tagsets()
+        self.topics = sorted(self.tagsets.keys())
+        self.pilot_tagsets = ontology.get_pilot_tagsets()
+        self.ontology = ontology
+        self.rand = random.Random(seed)
+        self.min_utterances = min_utterances
+        self.max_utterances = max_utterances
+
+    def __get_cn_word(self):
+        return u''.join([self.rand.choice(CN_CHARS) for _ in range(self.rand.randint(1, 3))])
+
+    def __get_frame(self, topic):
+        frame = {}
+        for _ in range(self.rand.randint(1, 3)):
+            slot = self.rand.choice(sorted(self.tagsets[topic].keys()))
+            value = self.rand.choice(self.tagsets[topic][slot])
+            if slot not in frame:
+                frame[slot] = []
+            if value not in frame[slot]:
+                frame[slot].append(value)
+        return frame
+
+    def __get_speech_act(self):
+        categories = self.pilot_tagsets['speech_act']['category'][1:]
+        attributes = self.pilot_tagsets['speech_act']['attribute'][1:]
+        result = []
+        for _ in range(self.rand.randint(1, 2)):
+            result.append({u'act': self.rand.choice(categories), u'attributes': self.rand.sample(attributes, self.rand.randint(1, 2))})
+        return result
+
+    def __get_semantic_tagged(self, cn_words):
+        semantic = self.pilot_tagsets['semantic']
+        result = u''
+        for word in cn_words:
+            if self.rand.random() < 0.2:
+                main = self.rand.choice(sorted(semantic.keys()))
+                attrs = u' '.join([u'%s="%s"' % (name.lower(), self.rand.choice(semantic[main][name])) for name in sorted(semantic[main].keys())])
+                result += u'<%s %s>%s</%s>' % (main, attrs, word, main)
+            else:
+                result += word
+        return result
+
+    def __get_mention(self, frame):
+        slot = self.rand.choice(sorted(frame.keys()))
+        value = self.rand.choice(frame[slot])
+        translations = self.ontology.get_translations(value)
+        if translations:
+            return value, translations[0]
+        return value, self.__get_cn_word()
+
+    def generate_session(self, session_id):
+        """
+        Returns the (log, translations, label) objects of a session.
+        """
+        log_utterances = []
+        translated_utterances = []
+        label_utterances = []
+
+        topic = None
+        bio = 'O'
+        frame = None
+        for utter_index in range(self.rand.randint(self.min_utterances, self.max_utterances)):
+            if topic is None or self.rand.random() < 0.15:
+                topic = self.rand.choice(self.topics)
+                bio = 'B'
+                frame = self.__get_frame(topic)
+            elif bio == 'O' or self.rand.random() < 0.05:
+                bio = 'O'
+            else:
+                bio = 'I'
+
+            cn_words = [self.__get_cn_word() for _ in range(self.rand.randint(1, 8))]
+            en_words = [self.rand.choice(EN_WORDS) for _ in range(self.rand.randint(1, 10))]
+            if bio != 'O' and self.rand.random() < 0.5:
+                en_mention, cn_mention = self.__get_mention(frame)
+                position = self.rand.randint(0, len(cn_words))
+                cn_words.insert(position, cn_mention)
+                en_words[self.rand.randint(0, len(en_words) - 1)] = en_mention
+
+            speaker = self.rand.choice(SPEAKERS)
+            log_utterances.append({
+                u'utter_index': utter_index,
+                u'speaker': speaker,
+                u'transcript': u''.join(cn_words),
+                u'segment_info': {
+                    u'topic': topic if bio != 'O' else u'OTHER',
+                    u'target_bio': bio,
+                    u'initiativity': speaker.lower()
+                }
+            })
+
+            hyps = []
+            for _ in range(self.rand.randint(1, 3)):
+                hyp = u' '.join(en_words)
+                num_en_words = len(hyp.split())
+                align = [[word, sorted(self.rand.sample(range(num_en_words), min(num_en_words, self.rand.randint(0, 2))))] for word in cn_words]
+                hyps.append({u'hyp': hyp, u'align': align})
+                self.rand.shuffle(en_words)
+            translated_utterances.append({u'utter_index': utter_index, u'translated': hyps})
+
+            label_utter = {
+                u'utter_index': utter_index,
+                u'speech_act': self.__get_speech_act(),
+                u'semantic_tagged': [self.__get_semantic_tagged(cn_words)]
+            }
+            if bio != 'O':
+                label_utter[u'frame_label'] = frame
+            label_utterances.append(label_utter)
+
+        return ({u'session_id': session_id, u'utterances': log_utterances},
+                {u'session_id': session_id, u'utterances': translated_utterances},
+                {u'session_id': session_id, u'utterances': label_utterances})
+
+
+def generate(dataset, dataroot, num_sessions, ontology_filename, seed=0, min_utterances=20, max_utterances=60):
+    """
+    Writes the sessions of a synthetic dataset and its file list. Returns the number of utterances.
+    """
+    generator = SyntheticCorpusGenerator(OntologyReader(ontology_filename), seed, min_utterances, max_utterances)
+
+    session_list = []
+    num_utterances = 0
+    for session_id in range(1, num_sessions + 1):
+        session_name = '%s/%05d' % (dataset, session_id)
+        session_dirname = os.path.join(dataroot, session_name)
+        if not os.path.exists(session_dirname):
+            os.makedirs(session_dirname)
+
+        objs = generator.generate_session(session_id)
+        for filename, obj in zip(['log.json', 'translations.json', 'label.json'], objs):
+            with open(os.path.join(session_dirname, filename), 'w') as fp:
+                json.dump(obj, fp)
+
+        session_list.append(session_name)
+        num_utterances += len(objs[0][u'utterances'])
+
+    with open(get_flist_filename(dataset, dataroot), 'w') as fp:
+        for session_name in session_list:
+            print >> fp, session_name
+
+    return num_utterances
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Generator of synthetic DSTC5 sessions.')
+    parser.add_argument('--dataset', dest='dataset', action='store', metavar='DATASET', required=True, help='Name of the dataset to generate, whose file list is written in the dataroot')
+    parser.add_argument('--dataroot', dest='dataroot', action='store', required=True, metavar='PATH', help='Will write the sessions in <destroot>/<dataset>/...')
+    parser.add_argument('--ontology', dest='ontology', action='store', metavar='JSON_FILE', required=True, help='JSON Ontology file')
+    parser.add_argument('--sessions', dest='sessions', action='store', type=int, default=10, metavar='N', help='Number of sessions')
+    parser.add_argument('--min-utterances', dest='min_utterances', action='store', type=int, default=20, metavar='N', help='Minimum number of utterances in a session')
+    parser.add_argument('--max-utterances', dest='max_utterances', action='store', type=int, default=60, metavar='N', help='Maximum number of utterances in a session')
+    parser.add_argument('--seed', dest='seed', action='store', type=int, default=0, help='Seed of the random generator')
+
+    args = parser.parse_args()
+
+    num_utterances = generate(args.dataset, args.dataroot, args.sessions, args.ontology, args.seed, args.min_utterances, args.max_utterances)
+    sys.stderr.write('Generated %d sessions with %d utterances\n' % (args.sessions, num_utterances))
+
+if __name__ == "__main__":
+    main(sys.argv)
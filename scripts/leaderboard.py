@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+
+"""
+Leaderboard of the entries of a task in a results directory, such as results/main, results/slu, results/sap or results/slg.
+
+The score files teamN/entryM.score.csv, or teamN/entryM.<role>.score.csv for the tasks of each speaker, are indexed into a single table,
+where every cell is coded into a table of strings shared by all the entries, along with the N and the result of every row as numbers.
+The index is saved as leaderboard.index.npz in the results directory, which git ignores, with the size and the modification time of every score file,
+so that only the score files added or changed since the last run are read again.
+From the index, it regenerates all.csv, the rows of all the entries, and featured.csv, the all/all rows of the entries of the main task,
+and it ranks the entries by a stat, on the rows of a topic, a slot, a schedule or any other column of the score files.
+
+    python leaderboard.py --resultdir ../results/main --update
+    python leaderboard.py --resultdir ../results/main --stat f1 --where topic=FOOD --where slot=all --where schedule=2
+"""
+
+import argparse
+import sys
+import os
+import re
+
+import numpy as np
+
+from string_table import StringTable
+
+INDEX_FILENAME = 'leaderboard.index.npz'
+ALL_FILENAME = 'all.csv'
+FEATURED_FILENAME = 'featured.csv'
+
+TEAM_PATTERN = re.compile(r'^team(\d+)$')
+SCORE_PATTERN = re.compile(r'^entry(\d+)(?:\.(guide|tourist))?\.score\.csv$')
+
+# the rows of featured.csv, which is only written for the score files with these columns
+FEATURED = {'topic': 'all', 'slot': 'all'}
+
+
+def find_score_files(resultdir):
+    """
+    Returns the sorted list of (team, entry, role, path) of the score files in a results directory, with role None for the main task,
+    and path relative to the results directory.
+    """
+    score_files = []
+    for team_dirname in os.listdir(resultdir):
+        team_match = TEAM_PATTERN.match(team_dirname)
+        if team_match is None or not os.path.isdir(os.path.join(resultdir, team_dirname)):
+            continue
+        for filename in os.listdir(os.path.join(resultdir, team_dirname)):
+            score_match = SCORE_PATTERN.match(filename)
+            if score_match is None:
+                continue
+            role = score_match.group(2)
+            if role is not None:
+                role = role.upper()
+            score_files.append((int(team_match.group(1)), int(score_match.group(1)), role, os.path.join(team_dirname, filename)))
+    score_files.sort(key=lambda item: (item[0], item[1], item[2] or ''))
+    return score_files
+
+
+def parse_number(string, number_type):
+    try:
+        return number_type(string)
+    except ValueError:
+        return None
+
+
+class Leaderboard(object):
+    def __init__(self, resultdir, indexfile=None):
+        self.resultdir = resultdir
+        self.indexfile = indexfile or os.path.join(resultdir, INDEX_FILENAME)
+        self.strings = StringTable()
+        self.columns = None
+        # path of each score file to the dict of its team, entry, role, size, mtime and coded rows
+        self.entries = {}
+        self.table = None
+
+        if os.path.exists(self.indexfile):
+            self.__load()
+
+    def __load(self):
+        # each lookup of the NpzFile reads the array from the zip again, so every array is read once before the entries are sliced
+        with np.load(self.indexfile) as data:
+            arrays = dict((name, data[name]) for name in data.files)
+
+        self.strings = StringTable()
+        for string in arrays['strings']:
+            self.strings.get_code(string)
+        self.columns = [self.strings.get_string(code) for code in arrays['columns']]
+
+        offsets = arrays['offsets'].tolist()
+        roles = arrays['roles'].tolist()
+        teams = arrays['teams'].tolist()
+        entry_ids = arrays['entry_ids'].tolist()
+        sizes = arrays['sizes'].tolist()
+        mtimes = arrays['mtimes'].tolist()
+        for i, path in enumerate(arrays['paths'].tolist()):
+            self.entries[path] = {
+                'team': teams[i],
+                'entry': entry_ids[i],
+                'role': None if roles[i] == '' else roles[i],
+                'size': sizes[i],
+                'mtime': mtimes[i],
+                'cells': arrays['cells'][offsets[i]:offsets[i + 1]],
+                'counts': arrays['counts'][offsets[i]:offsets[i + 1]],
+                'values': arrays['values'][offsets[i]:offsets[i + 1]]
+            }
+
+    def save(self):
+        """
+        Writes the index, with only the strings still used by the entries.
+        """
+        paths = sorted(self.entries)
+        entries = [self.entries[path] for path in paths]
+        cells = np.concatenate([entry['cells'] for entry in entries] + [np.zeros((0, len(self.columns)), dtype=np.int32)])
+        used_codes, cells = np.unique(np.concatenate([cells.ravel(), self.__get_codes(self.columns)]), return_inverse=True)
+        column_codes = cells[-len(self.columns):]
+        cells = cells[:-len(self.columns)].reshape((-1, len(self.columns)))
+
+        with open(self.indexfile, 'wb') as f:
+            np.savez(f,
+                     strings=np.array([self.strings.get_string(code) for code in used_codes], dtype=np.unicode_),
+                     columns=column_codes.astype(np.int32),
+                     paths=np.array(paths, dtype=np.unicode_),
+                     teams=np.array([entry['team'] for entry in entries], dtype=np.int32),
+                     entry_ids=np.array([entry['entry'] for entry in entries], dtype=np.int32),
+                     roles=np.array([entry['role'] or '' for entry in entries], dtype=np.unicode_),
+                     sizes=np.array([entry['size'] for entry in entries], dtype=np.int64),
+                     mtimes=np.array([entry['mtime'] for entry in entries], dtype=np.float64),
+                     offsets=np.cumsum([0] + [len(entry['cells']) for entry in entries]).astype(np.int64),
+                     cells=cells.astype(np.int32),
+                     counts=np.concatenate([entry['counts'] for entry in entries] + [np.zeros(0, dtype=np.int64)]),
+                     values=np.concatenate([entry['values'] for entry in entries] + [np.zeros(0, dtype=np.float64)]))
+
+    def __get_codes(self, strings):
+        return np.array([self.strings.get_code(string) for string in strings], dtype=np.int32)
+
+    def update(self):
+        """
+        Reads the score files added or changed since the index was built, and drops the removed ones.
+        Returns whether the index has changed.
+        """
+        changed = False
+        paths = set()
+        for team, entry, role, path in find_score_files(self.resultdir):
+            paths.add(path)
+            filename = os.path.join(self.resultdir, path)
+            size = os.path.getsize(filename)
+            mtime = os.path.getmtime(filename)
+            indexed = self.entries.get(path)
+            if indexed is not None and indexed['size'] == size and indexed['mtime'] == mtime:
+                continue
+
+            cells, counts, values = self.__read_score_file(filename)
+            self.entries[path] = {'team': team, 'entry': entry, 'role': role, 'size': size, 'mtime': mtime, 'cells': cells, 'counts': counts, 'values': values}
+            changed = True
+
+        for path in set(self.entries) - paths:
+            del self.entries[path]
+            changed = True
+
+        if changed:
+            self.table = None
+        return changed
+
+    def __read_score_file(self, filename):
+        """
+        Returns the coded cells of the rows of a score file, and the arrays of their N and their result, with -1 and NaN where they are not numbers.
+        """
+        with open(filename) as f:
+            lines = f.read().decode('utf-8').splitlines()
+        if len(lines) == 0:
+            raise RuntimeError('Empty score file %s' % (filename,))
+
+        columns = [item.strip() for item in lines[0].split(',')]
+        if self.columns is None:
+            self.columns = columns
+        elif columns != self.columns:
+            raise RuntimeError('The columns of %s are not those of the other score files: %s' % (filename, ', '.join(columns)))
+
+        rows = []
+        counts = []
+        values = []
+        for line in lines[1:]:
+            items = [item.strip() for item in line.split(',')]
+            if len(items) != len(columns):
+                raise RuntimeError('Wrong number of columns in %s: %s' % (filename, line))
+            rows.append([self.strings.get_code(item) for item in items])
+            count = parse_number(items[-2], int)
+            counts.append(-1 if count is None else count)
+            value = parse_number(items[-1], float)
+            values.append(np.nan if value is None else value)
+        return (np.array(rows, dtype=np.int32).reshape((-1, len(columns))), np.array(counts, dtype=np.int64), np.array(values, dtype=np.float64))
+
+    def has_roles(self):
+        return any([entry['role'] is not None for entry in self.entries.values()])
+
+    def get_table(self):
+        """
+        Returns the dict of the columns of the rows of all the entries, in the order of all.csv.
+        """
+        if self.table is None:
+            entries = [self.entries[path] for path in sorted(self.entries, key=lambda path: (self.entries[path]['team'], self.entries[path]['entry'], self.entries[path]['role'] or ''))]
+            sizes = [len(entry['cells']) for entry in entries]
+            self.table = {
+                'team': np.repeat([entry['team'] for entry in entries], sizes).astype(np.int32),
+                'entry': np.repeat([entry['entry'] for entry in entries], sizes).astype(np.int32),
+                'role': np.repeat(self.__get_codes([entry['role'] or '' for entry in entries]), sizes),
+                'cells': np.concatenate([entry['cells'] for entry in entries] + [np.zeros((0, len(self.columns or [])), dtype=np.int32)]),
+                'counts': np.concatenate([entry['counts'] for entry in entries] + [np.zeros(0, dtype=np.int64)]),
+                'values': np.concatenate([entry['values'] for entry in entries] + [np.zeros(0, dtype=np.float64)])
+            }
+        return self.table
+
+    def select(self, where=None):
+        """
+        Returns the boolean mask of the rows whose columns have the values of a dict of strings, where role is also a column.
+        """
+        table = self.get_table()
+        mask = np.ones(len(table['values']), dtype=bool)
+        for column, value in (where or {}).items():
+            if column != 'role' and column not in self.columns:
+                raise RuntimeError('Unknown column %s, not one of: %s' % (column, ', '.join(['role'] + self.columns)))
+            code = self.strings.codes.get(value)
+            if code is None:
+                return np.zeros(len(table['values']), dtype=bool)
+            if column == 'role':
+                mask &= table['role'] == code
+            else:
+                mask &= table['cells'][:, self.columns.index(column)] == code
+        return mask
+
+    def rank(self, stat, where=None):
+        """
+        Returns the rows of a stat which match the conditions, by decreasing result and with the results which are not numbers last,
+        as a list of (team, entry, role, cells) where cells is the list of the strings of the columns of the score files.
+        """
+        mask = self.select(dict(where or {}, stat=stat))
+        table = self.get_table()
+        indices = np.nonzero(mask)[0]
+        values = table['values'][indices]
+        # lexsort sorts by its last key first: NaN last, then by decreasing value, then by team, entry and role
+        order = np.lexsort((table['role'][indices], table['entry'][indices], table['team'][indices], -np.nan_to_num(values), np.isnan(values)))
+
+        result = []
+        for i in indices[order]:
+            role = self.strings.get_string(table['role'][i])
+            result.append((int(table['team'][i]), int(table['entry'][i]), role or None, [self.strings.get_string(code) for code in table['cells'][i]]))
+        return result
+
+    def write_all(self, filename):
+        self.__write_rows(filename, np.ones(len(self.get_table()['values']), dtype=bool))
+
+    def has_featured(self):
+        return all([column in self.columns for column in FEATURED])
+
+    def write_featured(self, filename):
+        self.__write_rows(filename, self.select(FEATURED))
+
+    def __write_rows(self, filename, mask):
+        table = self.get_table()
+        has_roles = self.has_roles()
+        with open(filename, 'wb') as f:
+            f.write(','.join(['team', 'entry'] + (['role'] if has_roles else []) + self.columns).encode('utf-8') + '\r\n')
+            for i in np.nonzero(mask)[0]:
+                items = ['%d' % table['team'][i], '%d' % table['entry'][i]]
+                if has_roles:
+                    items.append(self.strings.get_string(table['role'][i]))
+                items += [self.strings.get_string(code) for code in table['cells'][i]]
+                f.write(','.join(items).encode('utf-8') + '\r\n')
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Index the score files of a results directory, and regenerate its CSV files or rank its entries.')
+    parser.add_argument('--resultdir', dest='resultdir', action='store', required=True, metavar='PATH', help='Directory of the teamN/entryM*.score.csv files')
+    parser.add_argument('--indexfile', dest='indexfile', action='store', metavar='NPZ_FILE', help='Index of the score files, by default %s in the results directory' % (INDEX_FILENAME,))
+    parser.add_argument('--update', dest='update', action='store_true', help='Regenerate %s, and %s for the main task, if the score files have changed' % (ALL_FILENAME, FEATURED_FILENAME))
+    parser.add_argument('--stat', dest='stat', action='store', help='Stat to rank the entries by')
+    parser.add_argument('--where', dest='where', action='append', default=[], metavar='COL=VAL', help='Condition on a column of the score files or role, can be repeated')
+    parser.add_argument('--limit', dest='limit', action='store', type=int, metavar='N', help='Number of rows to show')
+
+    args = parser.parse_args()
+
+    if not args.update and args.stat is None:
+        parser.error('one of --update and --stat is required')
+
+    where = {}
+    for condition in args.where:
+        if '=' not in condition:
+            parser.error('--where expects COL=VAL: %s' % (condition,))
+        column, value = condition.split('=', 1)
+        where[column] = value.decode('utf-8')
+
+    leaderboard = Leaderboard(args.resultdir, args.indexfile)
+    changed = leaderboard.update()
+    if len(leaderboard.entries) == 0:
+        raise RuntimeError('No score files in %s' % (args.resultdir,))
+    if changed:
+        leaderboard.save()
+
+    if args.update:
+        filenames = [(ALL_FILENAME, leaderboard.write_all)]
+        if leaderboard.has_featured():
+            filenames.append((FEATURED_FILENAME, leaderboard.write_featured))
+        for filename, write in filenames:
+            path = os.path.join(args.resultdir, filename)
+            if changed or not os.path.exists(path):
+                write(path)
+                sys.stderr.write('Wrote %s\n' % (path,))
+
+    if args.stat is not None:
+        rows = leaderboard.rank(args.stat, where)
+        if args.limit is not None:
+            rows = rows[:args.limit]
+        columns = [column for column in leaderboard.columns if column not in where and column != 'stat']
+        print '\t'.join(['rank', 'team', 'entry'] + (['role'] if leaderboard.has_roles() and 'role' not in where else []) + columns)
+        for i, (team, entry, role, cells) in enumerate(rows):
+            items = ['%d' % (i + 1), '%d' % team, '%d' % entry]
+            if leaderboard.has_roles() and 'role' not in where:
+                items.append(role)
+            items += [cell for column, cell in zip(leaderboard.columns, cells) if column in columns]
+            print '\t'.join(items).encode('utf-8')
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module provides the transport of the online services, which exchange JSON objects one per line.
+A service has a handle_line(line) method which returns the response line to a request line.
+The lines are read from a pair of files, e.g. stdin and stdout, or from the connections to a local TCP server, each in its own thread.
+"""
+
+import SocketServer
+
+
+def serve_lines(service, infile, outfile):
+    for line in iter(infile.readline, ''):
+        if line.strip() == '':
+            continue
+        outfile.write(service.handle_line(line) + '\n')
+        outfile.flush()
+
+
+class JSONLineRequestHandler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        serve_lines(self.server.service, self.rfile, self.wfile)
+
+
+class JSONLineServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, service):
+        SocketServer.TCPServer.__init__(self, address, JSONLineRequestHandler)
+        self.service = service
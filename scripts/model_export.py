@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+
+"""
+Export of the trained SLU and SAP models to flat arrays, and lightweight predictors which use them directly.
+
+The model files of baseline_slu.py and baseline_sap.py are pickles of scikit-learn objects, which every process has to unpickle into its own memory.
+An exported model is a directory with a meta.json and an .npy file for each array: the coefficients of the one-vs-rest SVMs with a row for each label,
+their intercepts, and the vocabularies as sorted arrays of UTF-8 strings with the column of each string.
+The arrays are opened with mmap, so that a process starts without reading the whole model, and the processes serving the same model share its pages.
+
+The predictors give the same results as SimpleSLU and SimpleSAP without importing scikit-learn.
+The CRF of the SLU semantic tagger is a file of crfsuite, which is loaded without unpickling, so it is copied as it is.
+"""
+
+import argparse
+import sys
+import os
+import json
+import re
+import shutil
+import pickle
+from collections import defaultdict
+
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
+
+from sap_features import SAPFeatureIndexer, SAPFeatureHasher, get_feats
+
+FORMAT_VERSION = 1
+META_FILENAME = 'meta.json'
+
+
+def save_array(exportdir, name, array):
+    np.save(os.path.join(exportdir, '%s.npy' % (name,)), array)
+
+
+def load_array(exportdir, name):
+    return np.load(os.path.join(exportdir, '%s.npy' % (name,)), mmap_mode='r')
+
+
+def save_vocabulary(exportdir, name, vocabulary):
+    """
+    Saves a dict from strings to columns as the sorted array of the UTF-8 encoded strings and the array of their columns.
+    """
+    items = sorted([(term.encode('utf-8'), column) for term, column in vocabulary.items()])
+    save_array(exportdir, '%s.terms' % (name,), np.array([term for term, _ in items], dtype=np.string_))
+    save_array(exportdir, '%s.columns' % (name,), np.array([column for _, column in items], dtype=np.int32))
+
+
+class ArrayVocabulary(object):
+    def __init__(self, exportdir, name):
+        self.terms = load_array(exportdir, '%s.terms' % (name,))
+        self.columns = load_array(exportdir, '%s.columns' % (name,))
+
+    def lookup(self, terms):
+        """
+        Returns the array of the columns of the strings, with -1 for the strings which are not in the vocabulary.
+        """
+        if len(terms) == 0 or len(self.terms) == 0:
+            return np.zeros(len(terms), dtype=np.int32) - 1
+        queries = np.array([term.encode('utf-8') for term in terms], dtype=np.string_)
+        positions = np.minimum(np.searchsorted(self.terms, queries), len(self.terms) - 1)
+        return np.where(self.terms[positions] == queries, self.columns[positions], -1)
+
+
+def save_linear_model(exportdir, classifier, binarizer):
+    """
+    Saves a OneVsRestClassifier of linear models trained on the labels of a MultiLabelBinarizer,
+    and returns the fields of meta.json describing it.
+    """
+    from sklearn.base import is_classifier
+
+    if classifier.label_binarizer_.y_type_ != 'multilabel-indicator':
+        raise RuntimeError('Only multi-label classifiers can be exported: %s' % (classifier.label_binarizer_.y_type_,))
+
+    num_features = None
+    rows = []
+    intercepts = []
+    sparse_coef = False
+    for estimator in classifier.estimators_:
+        if hasattr(estimator, 'coef_'):
+            num_features = estimator.coef_.shape[1]
+            sparse_coef = sparse_coef or not isinstance(estimator.coef_, np.ndarray)
+            rows.append(csr_matrix(estimator.coef_))
+            intercepts.append(float(np.ravel(estimator.intercept_)[0]) if estimator.fit_intercept else 0.0)
+        else:
+            # a label which was always or never given in the training set is predicted as constant
+            rows.append(None)
+            intercepts.append(float(np.ravel(estimator.y_)[0]))
+    if num_features is None:
+        raise RuntimeError('No linear model is found in the classifier')
+    rows = [csr_matrix((1, num_features)) if row is None else row for row in rows]
+    coef = vstack(rows, format='csr')
+
+    if sparse_coef:
+        save_array(exportdir, 'coef.data', coef.data.astype(np.float64))
+        save_array(exportdir, 'coef.indices', coef.indices.astype(np.int32))
+        save_array(exportdir, 'coef.indptr', coef.indptr.astype(np.int32))
+    else:
+        save_array(exportdir, 'coef', coef.toarray())
+    save_array(exportdir, 'intercept', np.array(intercepts, dtype=np.float64))
+
+    # OneVsRestClassifier compares the decision values of classifiers with 0, and the outputs of other estimators with 0.5
+    first_estimator = classifier.estimators_[0]
+    threshold = 0.0 if hasattr(first_estimator, 'decision_function') and is_classifier(first_estimator) else 0.5
+
+    return {
+        'labels': [unicode(label) for label in binarizer.classes_],
+        'num_features': num_features,
+        'sparse_coef': sparse_coef,
+        'threshold': threshold
+    }
+
+
+class LinearMultiLabelModel(object):
+    def __init__(self, exportdir, meta):
+        self.labels = meta['labels']
+        self.threshold = meta['threshold']
+        self.intercept = load_array(exportdir, 'intercept')
+        if meta['sparse_coef']:
+            data = load_array(exportdir, 'coef.data')
+            indices = load_array(exportdir, 'coef.indices')
+            indptr = load_array(exportdir, 'coef.indptr')
+            self.coef = csr_matrix((data, indices, indptr), shape=(len(self.labels), meta['num_features']))
+        else:
+            self.coef = load_array(exportdir, 'coef')
+
+    def predict(self, feats):
+        """
+        Returns a tuple of the predicted labels for each row of a sparse feature matrix, as MultiLabelBinarizer.inverse_transform.
+        """
+        scores = feats.dot(self.coef.T)
+        if not isinstance(scores, np.ndarray):
+            scores = scores.toarray()
+        scores = scores + self.intercept
+        return [tuple([self.labels[k] for k in np.flatnonzero(row > self.threshold)]) for row in scores]
+
+
+def write_meta(exportdir, meta):
+    meta['format_version'] = FORMAT_VERSION
+    # meta.json is written last, so that a directory is not taken for a model before all of its arrays are written
+    with open(os.path.join(exportdir, META_FILENAME), 'w') as f:
+        json.dump(meta, f, indent=4, sort_keys=True)
+
+
+def export_sap_model(modelfile, exportdir):
+    with open(modelfile, 'rb') as f:
+        indexer, speech_act_model, speech_act_lb = pickle.load(f)
+
+    meta = {'task': 'SAP'}
+    meta.update(save_linear_model(exportdir, speech_act_model, speech_act_lb))
+
+    vocabulary = indexer.get_vocabulary()
+    meta['hashed'] = vocabulary is None
+    if vocabulary is not None:
+        num_features = meta['num_features']
+        save_vocabulary(exportdir, 'features', dict([(key, column) for key, column in vocabulary.items() if not isinstance(key, tuple)]))
+        # a conjunction is keyed by the pair of the columns of its features, which is stored as a single integer
+        pairs = sorted([(key[0] * num_features + key[1], column) for key, column in vocabulary.items() if isinstance(key, tuple)])
+        save_array(exportdir, 'pairs.keys', np.array([key for key, _ in pairs], dtype=np.int64))
+        save_array(exportdir, 'pairs.columns', np.array([column for _, column in pairs], dtype=np.int32))
+
+    write_meta(exportdir, meta)
+    return meta
+
+
+def export_slu_model(modelfile, exportdir):
+    with open('%s.act.model' % modelfile, 'r') as f:
+        speech_act_model, speech_act_lb = pickle.load(f)
+
+    vectorizer = speech_act_model.named_steps['vectorizer']
+    tfidf = speech_act_model.named_steps['tfidf']
+    if vectorizer.analyzer != 'word' or tuple(vectorizer.ngram_range) != (1, 1) or vectorizer.tokenizer is not None \
+            or vectorizer.preprocessor is not None or vectorizer.strip_accents is not None:
+        raise RuntimeError('Only the word unigrams of CountVectorizer can be exported')
+
+    meta = {'task': 'SLU'}
+    meta.update(save_linear_model(exportdir, speech_act_model.named_steps['clf'], speech_act_lb))
+    meta.update({
+        'token_pattern': vectorizer.token_pattern,
+        'lowercase': vectorizer.lowercase,
+        'binary': vectorizer.binary,
+        'use_idf': tfidf.use_idf,
+        'sublinear_tf': tfidf.sublinear_tf,
+        'norm': tfidf.norm
+    })
+    save_vocabulary(exportdir, 'vocabulary', vectorizer.vocabulary_)
+    if tfidf.use_idf:
+        save_array(exportdir, 'idf', tfidf.idf_.astype(np.float64))
+    shutil.copyfile('%s.semantic.model' % modelfile, os.path.join(exportdir, 'semantic.model'))
+
+    write_meta(exportdir, meta)
+    return meta
+
+
+class SAPArrayIndexer(SAPFeatureIndexer):
+    """
+    Frozen SAPFeatureIndexer which looks the features and the conjunctions up in the arrays of an exported model.
+    """
+    def __init__(self, exportdir, num_features):
+        SAPFeatureIndexer.__init__(self)
+        self.__num_features = num_features
+        self.__features = ArrayVocabulary(exportdir, 'features')
+        self.__pair_keys = load_array(exportdir, 'pairs.keys')
+        self.__pair_columns = load_array(exportdir, 'pairs.columns')
+
+    def get_num_features(self):
+        return self.__num_features
+
+    def get_indices(self, context):
+        feat_indices = self.__features.lookup(get_feats(context))
+        feat_indices = feat_indices[feat_indices >= 0].astype(np.int64)
+
+        result = list(feat_indices)
+        if len(feat_indices) > 1 and len(self.__pair_keys) > 0:
+            first, second = np.triu_indices(len(feat_indices), 1)
+            keys = feat_indices[first] * self.__num_features + feat_indices[second]
+            positions = np.minimum(np.searchsorted(self.__pair_keys, keys), len(self.__pair_keys) - 1)
+            found = self.__pair_keys[positions] == keys
+            result.extend(self.__pair_columns[positions[found]])
+        return result
+
+
+class ExportedSAP(object):
+    def __init__(self, exportdir, meta):
+        if meta['hashed']:
+            self.__indexer = SAPFeatureHasher(int(meta['num_features']).bit_length() - 1)
+            self.__indexer.freeze()
+        else:
+            self.__indexer = SAPArrayIndexer(exportdir, meta['num_features'])
+        self.__model = LinearMultiLabelModel(exportdir, meta)
+
+    def pred(self, context):
+        return self.__model.predict(self.__indexer.transform([context]))
+
+    def pred_many(self, contexts):
+        if len(contexts) == 0:
+            return []
+        return self.__model.predict(self.__indexer.transform(contexts))
+
+
+class ExportedSLU(object):
+    def __init__(self, exportdir, meta):
+        # the utterances are tokenized and tagged with nltk as in baseline_slu.py
+        import nltk
+        from nltk.tag import CRFTagger
+        self.__word_tokenize = nltk.word_tokenize
+        self.__semantic_model = CRFTagger(verbose=True)
+        self.__semantic_model.set_model_file(os.path.join(exportdir, 'semantic.model'))
+
+        self.__meta = meta
+        self.__token_pattern = re.compile(meta['token_pattern'])
+        self.__vocabulary = ArrayVocabulary(exportdir, 'vocabulary')
+        self.__idf = load_array(exportdir, 'idf') if meta['use_idf'] else None
+        self.__model = LinearMultiLabelModel(exportdir, meta)
+
+    def __transform(self, docs):
+        """
+        Returns the tf-idf matrix of the documents, as the CountVectorizer and the TfidfTransformer of the pipeline of SimpleSLU.
+        """
+        indptr = [0]
+        indices = []
+        data = []
+        for doc in docs:
+            if self.__meta['lowercase']:
+                doc = doc.lower()
+            counts = defaultdict(int)
+            for column in self.__vocabulary.lookup(self.__token_pattern.findall(doc)):
+                if column >= 0:
+                    counts[int(column)] += 1
+            for column in sorted(counts):
+                indices.append(column)
+                data.append(1.0 if self.__meta['binary'] else float(counts[column]))
+            indptr.append(len(indices))
+
+        data = np.array(data, dtype=np.float64)
+        indices = np.array(indices, dtype=np.int32)
+        if self.__meta['sublinear_tf']:
+            data = np.log(data) + 1.0
+        if self.__idf is not None:
+            data = data * self.__idf[indices]
+        feats = csr_matrix((data, indices, indptr), shape=(len(docs), self.__meta['num_features']))
+
+        if self.__meta['norm'] is not None:
+            if self.__meta['norm'] == 'l2':
+                norms = np.sqrt(np.asarray(feats.multiply(feats).sum(axis=1)).ravel())
+            else:
+                norms = np.asarray(abs(feats).sum(axis=1)).ravel()
+            norms[norms == 0.0] = 1.0
+            feats.data /= np.repeat(norms, np.diff(feats.indptr))
+        return feats
+
+    def pred(self, utter):
+        return self.pred_many([utter])[0]
+
+    def pred_many(self, utters):
+        if len(utters) == 0:
+            return []
+        word_seqs = [[word.lower() for word in self.__word_tokenize(utter)] for utter in utters]
+
+        pred_acts = self.__model.predict(self.__transform([' '.join(word_seq) for word_seq in word_seqs]))
+        pred_semantics = self.__semantic_model.tag_sents(word_seqs)
+
+        return [([pred_act], pred_semantic) for pred_act, pred_semantic in zip(pred_acts, pred_semantics)]
+
+
+def is_exported_model(path):
+    return os.path.isfile(os.path.join(path, META_FILENAME))
+
+
+def load_model(exportdir):
+    """
+    Returns the predictor of an exported model, which has the pred() and pred_many() methods of SimpleSLU or SimpleSAP.
+    """
+    with open(os.path.join(exportdir, META_FILENAME)) as f:
+        meta = json.load(f)
+    if meta.get('format_version') != FORMAT_VERSION:
+        raise RuntimeError('Unsupported format version of the exported model: %s' % (meta.get('format_version'),))
+
+    if meta['task'] == 'SAP':
+        return ExportedSAP(exportdir, meta)
+    elif meta['task'] == 'SLU':
+        return ExportedSLU(exportdir, meta)
+    raise RuntimeError('Wrong task of the exported model: %s' % (meta['task'],))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Export the SLU or SAP model to arrays which can be loaded with mmap.')
+    parser.add_argument('--task', dest='task', action='store', choices=['SLU', 'SAP'], required=True, help='Task of the model')
+    parser.add_argument('--modelfile', dest='modelfile', action='store', required=True, metavar='MODEL_FILE', help='Model file written by baseline_slu.py or baseline_sap.py')
+    parser.add_argument('--exportdir', dest='exportdir', action='store', required=True, metavar='PATH', help='Directory to write with the exported model')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.exportdir):
+        os.makedirs(args.exportdir)
+
+    sys.stderr.write('Exporting the model ... ')
+    if args.task == 'SAP':
+        meta = export_sap_model(args.modelfile, args.exportdir)
+    else:
+        meta = export_slu_model(args.modelfile, args.exportdir)
+    sys.stderr.write('Done\n')
+
+    sys.stderr.write('Exported %d labels and %d features to %s\n' % (len(meta['labels']), meta['num_features'], args.exportdir))
+
+if __name__ == "__main__":
+    main(sys.argv)
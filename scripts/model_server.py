@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+
+"""
+Local server for the trained models of the SLU, SAP and SLG baselines.
+
+The models are loaded once and serve the requests of many dialogs over concurrent connections.
+The requests for a model which arrive within a short window are gathered into a micro-batch and predicted with a single call,
+e.g. one predict() of the SAP classifier or one nearest neighbour query of the SLG index.
+A batch is predicted as soon as it has --max-batch-size requests, or --max-delay milliseconds after its first request.
+The SLU and SAP models can also be given as the directories written by model_export.py, which are opened with mmap,
+so that the servers started on the same model share its memory.
+
+The requests and responses are JSON objects, one per line. A request gives the task, the session_id, and the utterance as in the input file of the task:
+    {"task": "SAP", "session_id": 1, "utterance": {"utter_index": 3, "speaker": "Guide", "semantic_tags": [...], ...}}
+The SLU requests also give the translations of the utterance as in translations.json.
+The SAP model predicts the speech acts from the previous turns of the session, so every utterance of a session has to be sent in order,
+and the ones of the other role are only answered with their utter_index. A request {"task": "SAP", "session_id": 1, "end": true}
+discards the turns kept for a finished session, and {"stats": true} returns the number of requests and batches of each model.
+"""
+
+import argparse
+import sys
+import json
+import time
+import threading
+import Queue
+from collections import OrderedDict
+
+from line_server import JSONLineServer
+import model_export
+from sap_features import SAPContextBuilder, combine_acts
+from slu_projection import DirectLabelProjection, get_slu_result
+
+
+class _PendingRequest(object):
+    def __init__(self, item):
+        self.item = item
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher(object):
+    """
+    Gathers the items submitted by concurrent threads into batches for a function which predicts a list of items at once.
+    """
+    def __init__(self, predict_many, max_batch_size=32, max_delay=0.005):
+        self.predict_many = predict_many
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.queue = Queue.Queue()
+        self.num_items = 0
+        self.num_batches = 0
+
+        self.thread = threading.Thread(target=self.__run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, item):
+        """
+        Blocks until the batch of the item has been predicted, and returns the result for the item.
+        """
+        request = _PendingRequest(item)
+        self.queue.put(request)
+        # waiting without a timeout can't be interrupted in Python 2
+        while not request.done.wait(60.0):
+            pass
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def __get_batch(self):
+        batch = [self.queue.get()]
+        deadline = time.time() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.time()
+            if timeout <= 0.0:
+                break
+            try:
+                batch.append(self.queue.get(True, timeout))
+            except Queue.Empty:
+                break
+        return batch
+
+    def __run(self):
+        while True:
+            batch = self.__get_batch()
+            try:
+                results = self.predict_many([request.item for request in batch])
+                # zip would leave the last requests without a result, so a wrong number of results fails the whole batch
+                if len(results) != len(batch):
+                    raise RuntimeError('Predicted %d results for a batch of %d requests' % (len(results), len(batch)))
+                for request, result in zip(batch, results):
+                    request.result = result
+            except Exception, e:
+                for request in batch:
+                    request.error = e
+            self.num_items += len(batch)
+            self.num_batches += 1
+            for request in batch:
+                request.done.set()
+
+    def get_stats(self):
+        return {'requests': self.num_items, 'batches': self.num_batches}
+
+
+class SLUModel(object):
+    def __init__(self, modelfile, max_batch_size, max_delay):
+        if model_export.is_exported_model(modelfile):
+            self.slu = model_export.load_model(modelfile)
+        else:
+            # scikit-learn is only needed to unpickle a model file which has not been exported
+            from baseline_slu import SimpleSLU
+            self.slu = SimpleSLU()
+            self.slu.load_model(modelfile)
+        self.projection = DirectLabelProjection()
+        self.batcher = MicroBatcher(self.slu.pred_many, max_batch_size, max_delay)
+
+    def handle(self, request):
+        utter = request['utterance']
+        translations = request.get('translations', {'translated': []})
+
+        prediction = None
+        if len(translations['translated']) > 0:
+            prediction = self.batcher.submit(translations['translated'][0]['hyp'])
+        return get_slu_result(utter, translations, prediction, self.projection)
+
+
+class SAPModel(object):
+    def __init__(self, modelfile, roletype, max_batch_size, max_delay, max_sessions):
+        self.roletype = roletype
+        if model_export.is_exported_model(modelfile):
+            self.sap = model_export.load_model(modelfile)
+        else:
+            # scikit-learn is only needed to unpickle a model file which has not been exported
+            from baseline_sap import SimpleSAP
+            self.sap = SimpleSAP()
+            self.sap.load_model(modelfile)
+        self.batcher = MicroBatcher(self.sap.pred_many, max_batch_size, max_delay)
+
+        # the least recently used session is dropped first when there are too many
+        self.max_sessions = max_sessions
+        self.builders = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __get_builder(self, session_id):
+        builder = self.builders.pop(session_id, None)
+        if builder is None:
+            builder = SAPContextBuilder(self.roletype)
+            while len(self.builders) >= self.max_sessions:
+                self.builders.popitem(last=False)
+        self.builders[session_id] = builder
+        return builder
+
+    def handle(self, request):
+        session_id = request['session_id']
+        if request.get('end', False):
+            with self.lock:
+                self.builders.pop(session_id, None)
+            return {'end': True}
+
+        utter = request['utterance']
+        with self.lock:
+            context = self.__get_builder(session_id).add(utter)
+
+        result = {'utter_index': utter['utter_index']}
+        if context is not None:
+            result['speech_act'] = combine_acts(self.batcher.submit(context))
+        return result
+
+
+class SLGModel(object):
+    def __init__(self, modelfile, backend, metric, max_batch_size, max_delay):
+        from baseline_slg import SimpleSLG
+        self.slg = SimpleSLG(backend, metric)
+        self.slg.load_model(modelfile)
+        self.batcher = MicroBatcher(self.slg.generate_many, max_batch_size, max_delay)
+
+    def handle(self, request):
+        utter = request['utterance']
+        instance = {'semantic_tags': utter['semantic_tags'], 'speech_act': utter['speech_act']}
+        return {'utter_index': utter['utter_index'], 'generated': self.batcher.submit(instance)}
+
+
+class ModelService(object):
+    def __init__(self, models):
+        self.models = models
+
+    def handle(self, request):
+        if request.get('stats', False):
+            return dict([(task, model.batcher.get_stats()) for task, model in self.models.items()])
+
+        task = request['task']
+        if task not in self.models:
+            raise KeyError('No model is served for %s' % (task,))
+        response = self.models[task].handle(request)
+        response['task'] = task
+        response['session_id'] = request['session_id']
+        return response
+
+    def handle_line(self, line):
+        try:
+            response = self.handle(json.loads(line))
+        except Exception, e:
+            response = {'error': '%s: %s' % (e.__class__.__name__, e)}
+        return json.dumps(response)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Local server for the SLU, SAP and SLG baseline models.')
+    parser.add_argument('--port', dest='port', action='store', type=int, required=True, metavar='PORT', help='TCP port to serve on')
+    parser.add_argument('--host', dest='host', action='store', default='127.0.0.1', metavar='HOST', help='Address to listen on')
+    parser.add_argument('--slu-model', dest='slu_model', action='store', metavar='MODEL_FILE', help='Model file written by baseline_slu.py, or the directory of the model exported by model_export.py')
+    parser.add_argument('--sap-model', dest='sap_model', action='store', metavar='MODEL_FILE', help='Model file written by baseline_sap.py, or the directory of the model exported by model_export.py')
+    parser.add_argument('--sap-roletype', dest='sap_roletype', action='store', choices=['GUIDE', 'TOURIST'], help='Target role of the SAP model')
+    parser.add_argument('--slg-model', dest='slg_model', action='store', metavar='MODEL_FILE', help='Prefix of the index files written by baseline_slg.py')
+    parser.add_argument('--slg-backend', dest='slg_backend', action='store', choices=['brute', 'inverted'], default='brute', help='Nearest neighbour retrieval backend of the SLG model')
+    parser.add_argument('--slg-metric', dest='slg_metric', action='store', choices=['euclidean', 'cosine'], default='euclidean', help='Similarity used to pick the nearest neighbour')
+    parser.add_argument('--max-batch-size', dest='max_batch_size', action='store', type=int, default=32, metavar='N', help='Largest number of requests predicted together')
+    parser.add_argument('--max-delay', dest='max_delay', action='store', type=float, default=5.0, metavar='MSEC', help='Longest time a request waits for others to join its batch')
+    parser.add_argument('--max-sessions', dest='max_sessions', action='store', type=int, default=1000, metavar='N', help='Number of sessions to keep the previous turns of for SAP')
+
+    args = parser.parse_args()
+
+    if args.slu_model is None and args.sap_model is None and args.slg_model is None:
+        parser.error('at least one of --slu-model, --sap-model and --slg-model is required')
+    if args.sap_model is not None and args.sap_roletype is None:
+        parser.error('--sap-roletype is required with --sap-model')
+
+    max_delay = args.max_delay / 1000.0
+    models = {}
+    sys.stderr.write('Loading models ... ')
+    if args.slu_model is not None:
+        models['SLU'] = SLUModel(args.slu_model, args.max_batch_size, max_delay)
+    if args.sap_model is not None:
+        models['SAP'] = SAPModel(args.sap_model, args.sap_roletype, args.max_batch_size, max_delay, args.max_sessions)
+    if args.slg_model is not None:
+        models['SLG'] = SLGModel(args.slg_model, args.slg_backend, args.slg_metric, args.max_batch_size, max_delay)
+    sys.stderr.write('Done\n')
+
+    server = JSONLineServer((args.host, args.port), ModelService(models))
+    sys.stderr.write('Listening on %s:%d\n' % server.server_address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+"""
+Matching of the entries of the ontology against the texts of an utterance, for the baseline trackers of the main task.
+
+The candidates of each topic are the (slot, value) pairs of the frames, each with the strings which are matched for it:
+the value itself for method 1, and the N-best translations of the entry into Chinese for method 2.
+A candidate is matched if any of its strings has a fuzz.partial_ratio above the threshold with any of the texts,
+which are the N-best translations of the utterance for method 1, and the transcript for method 2.
+The index is built once from the ontology and can be shared by all the trackers, and the cost of matching an utterance is bounded by:
+- trying the strings and the texts in the order of the N-best lists, and stopping at the first match of a candidate,
+- computing the match of a string only once per utterance, when it is shared by the candidates of several slots,
+- skipping the candidates which are already in the frame.
+With the automaton prefilter, each text is also scanned once with an Aho-Corasick automaton of the distinct strings of the topic,
+and with an index from each character to the strings which have it:
+- a string which occurs exactly in the text is matched without fuzz.partial_ratio, when fuzzywuzzy uses difflib,
+- a string which doesn't share enough characters with the text to be above the threshold is not matched without fuzz.partial_ratio,
+so that fuzz.partial_ratio is only computed for the few strings which share many characters with the text without occurring in it,
+which is most useful for the short Chinese strings of method 2.
+With the 1-best strings and texts, the frames are the same as those of fuzz.partial_ratio on all the candidates, with or without the prefilter.
+"""
+
+import difflib
+from collections import Counter, deque
+
+from fuzzywuzzy import fuzz, utils
+
+DEFAULT_THRESHOLD = 80
+PREFILTERS = ['automaton', 'none']
+
+# difflib.SequenceMatcher ignores the popular characters of the strings of at least this length,
+# so that fuzz.partial_ratio of a string occurring in such a text may not be 100
+AUTOJUNK_LENGTH = 200
+
+# the matching blocks of python-Levenshtein may not align a string with its exact occurrence in a text,
+# so that the occurrences are only matched without fuzz.partial_ratio when it is computed with difflib
+EXACT_OCCURRENCES = getattr(fuzz, 'SequenceMatcher', None) is difflib.SequenceMatcher
+
+
+def get_partial_ratio_bound(length1, length2, common):
+    """
+    Returns an upper bound of fuzz.partial_ratio of two different strings from their lengths and the number of characters they have in common.
+    The ratio of the shorter string with a substring of w characters of the longer one is 2M/(l+w),
+    where l is the length of the shorter string and M <= min(w, common) is the number of matching characters. It is at most 2common/(l+common).
+    """
+    if common == 0:
+        return 0
+    return utils.intr(100.0 * 2 * common / (min(length1, length2) + common))
+
+
+class AhoCorasick(object):
+    """
+    Automaton of a list of strings, which finds all the strings occurring in a text in a single scan of the text.
+    """
+    def __init__(self, strings):
+        # the transitions, the failure link and the indices of the strings ending at each state
+        self.transitions = [{}]
+        self.failures = [0]
+        self.outputs = [[]]
+
+        for i, string in enumerate(strings):
+            if len(string) == 0:
+                continue
+            state = 0
+            for char in string:
+                next_state = self.transitions[state].get(char)
+                if next_state is None:
+                    next_state = len(self.transitions)
+                    self.transitions[state][char] = next_state
+                    self.transitions.append({})
+                    self.failures.append(0)
+                    self.outputs.append([])
+                state = next_state
+            self.outputs[state].append(i)
+
+        # the failure links are set in breadth-first order, from the states closer to the root
+        queue = deque(self.transitions[0].values())
+        while len(queue) > 0:
+            state = queue.popleft()
+            for char, next_state in self.transitions[state].items():
+                queue.append(next_state)
+                failure = self.failures[state]
+                while failure != 0 and char not in self.transitions[failure]:
+                    failure = self.failures[failure]
+                self.failures[next_state] = self.transitions[failure].get(char, 0)
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.failures[next_state]]
+
+    def find(self, text):
+        """
+        Returns the set of the indices of the strings occurring in a text.
+        """
+        found = set()
+        state = 0
+        for char in text:
+            while state != 0 and char not in self.transitions[state]:
+                state = self.failures[state]
+            state = self.transitions[state].get(char, 0)
+            if len(self.outputs[state]) > 0:
+                found.update(self.outputs[state])
+        return found
+
+
+class TopicIndex(object):
+    """
+    The candidates of a topic, with their distinct strings coded as integers, and the automaton and the character index of the strings.
+    """
+    def __init__(self, candidates):
+        self.strings = []
+        codes = {}
+        self.candidates = []
+        for slot, value, strings in candidates:
+            string_ids = []
+            for string in strings:
+                if string not in codes:
+                    codes[string] = len(self.strings)
+                    self.strings.append(string)
+                string_ids.append(codes[string])
+            self.candidates.append((slot, value, string_ids))
+
+        self.automaton = AhoCorasick(self.strings)
+        self.char_index = {}
+        for i, string in enumerate(self.strings):
+            for char, count in Counter(string).iteritems():
+                self.char_index.setdefault(char, []).append((i, count))
+
+    def scan(self, text):
+        """
+        Returns the set of the strings occurring in a text, and the dict of the number of characters each string has in common with it.
+        """
+        common = {}
+        for char, text_count in Counter(text).iteritems():
+            for i, count in self.char_index.get(char, []):
+                common[i] = common.get(i, 0) + min(count, text_count)
+        return self.automaton.find(text), common
+
+
+class CandidateIndex(object):
+    def __init__(self, candidates, threshold=DEFAULT_THRESHOLD, prefilter='automaton'):
+        """
+        Takes a dict from each topic to its list of (slot, value, strings), in the order in which the values are added to the frames.
+        """
+        if prefilter not in PREFILTERS:
+            raise RuntimeError('Wrong prefilter: %s' % (prefilter,))
+        self.topics = dict([(topic, TopicIndex(topic_candidates)) for topic, topic_candidates in candidates.items()])
+        self.threshold = threshold
+        self.prefilter = prefilter
+
+    @classmethod
+    def from_tagsets(cls, tagsets, threshold=DEFAULT_THRESHOLD, prefilter='automaton'):
+        """
+        Returns the index of method 1, where each value of the ontology is matched itself.
+        """
+        candidates = {}
+        for topic in tagsets:
+            candidates[topic] = []
+            for slot in tagsets[topic]:
+                for value in tagsets[topic][slot]:
+                    candidates[topic].append((slot, value, [value]))
+        return cls(candidates, threshold, prefilter)
+
+    @classmethod
+    def from_translated_tagsets(cls, translated_tagsets, nbest=1, threshold=DEFAULT_THRESHOLD, prefilter='automaton'):
+        """
+        Returns the index of method 2, where each entry of the ontology is matched by its N-best translations into Chinese.
+        """
+        candidates = {}
+        for topic in translated_tagsets:
+            candidates[topic] = []
+            for slot in translated_tagsets[topic]:
+                for value_obj in translated_tagsets[topic][slot]:
+                    if len(value_obj['translated_cn']) > 0:
+                        candidates[topic].append((slot, value_obj['entry_en'], value_obj['translated_cn'][:nbest]))
+        return cls(candidates, threshold, prefilter)
+
+    def has_topic(self, topic):
+        return topic in self.topics
+
+    def match(self, topic, texts, frame):
+        """
+        Adds the values of the candidates of a topic which match any of the texts to a frame, and returns the frame.
+        """
+        topic_index = self.topics.get(topic)
+        if topic_index is None:
+            return frame
+
+        # the distinct texts, with the strings occurring in them and the characters they have in common with the strings
+        scanned_texts = []
+        for text in texts:
+            if text in [other for other, _, _ in scanned_texts]:
+                continue
+            found, common = (None, None)
+            if self.prefilter == 'automaton':
+                found, common = topic_index.scan(text)
+            scanned_texts.append((text, found, common))
+
+        # whether each string matches any of the texts, for the strings shared by several candidates
+        matched_strings = {}
+        for slot, value, string_ids in topic_index.candidates:
+            if value in frame.get(slot, []):
+                continue
+            for i in string_ids:
+                if i not in matched_strings:
+                    matched_strings[i] = any(self.__is_match(topic_index.strings[i], i, text, found, common) for text, found, common in scanned_texts)
+                if matched_strings[i]:
+                    frame.setdefault(slot, []).append(value)
+                    break
+        return frame
+
+    def __is_match(self, string, i, text, found, common):
+        if string == text:
+            return 100 > self.threshold
+        if found is not None:
+            if EXACT_OCCURRENCES and i in found and len(text) < AUTOJUNK_LENGTH:
+                return 100 > self.threshold
+            if get_partial_ratio_bound(len(string), len(text), common.get(i, 0)) <= self.threshold:
+                return False
+        return fuzz.partial_ratio(string, text) > self.threshold
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+"""
+Paired significance tests between all the entries of the main task in a results directory, such as results/main.
+
+The per-utterance sufficient statistics of each entry are cached next to its track file, as teamN/entryM.stats.npz,
+and are only computed again with score_main.py when the track file is newer than them.
+Since all the entries are scored on the same utterances, their statistics are stacked, and every pair of entries is tested at once
+on the same resamples of the sessions:
+- bootstrap: paired bootstrap, where the sessions are drawn with replacement for all the entries
+- randomization: approximate randomization, where the two entries of a pair swap the counts of a random half of the sessions
+The sessions are resampled rather than the utterances, because the utterances of a session depend on each other.
+It writes the significance matrix as a CSV file, with the entries ordered by their score, where the cell of a row and a column
+is the p-value of the difference of their scores.
+
+    python paired_significance.py --resultdir ../results/main --dataset dstc5_test --dataroot ../data --ontology config/ontology_dstc5.json --matrixfile main.significance.csv
+"""
+
+import argparse
+import sys
+import os
+import re
+import time
+import tempfile
+import subprocess
+
+import numpy as np
+
+from sufficient_stats import StatsFile, SCHEDULES, get_metrics, get_resample_weights
+
+SCRIPTS_PATH = os.path.abspath(os.path.dirname(os.path.abspath(__file__)))
+
+STATS = ['acc', 'precision', 'recall', 'f1']
+TESTS = ['bootstrap', 'randomization']
+EPSILON = 1e-12
+
+ENTRY_PATTERN = re.compile(r'^entry(\d+)\.json$')
+TEAM_PATTERN = re.compile(r'^team(\d+)$')
+
+
+def find_entries(resultdir):
+    """
+    Returns the sorted list of (team, entry, trackfile) of the track files in a results directory.
+    """
+    entries = []
+    for team_dirname in os.listdir(resultdir):
+        team_match = TEAM_PATTERN.match(team_dirname)
+        if team_match is None or not os.path.isdir(os.path.join(resultdir, team_dirname)):
+            continue
+        for filename in os.listdir(os.path.join(resultdir, team_dirname)):
+            entry_match = ENTRY_PATTERN.match(filename)
+            if entry_match is not None:
+                entries.append((int(team_match.group(1)), int(entry_match.group(1)), os.path.join(resultdir, team_dirname, filename)))
+    entries.sort()
+    return entries
+
+
+def get_statsfile(trackfile):
+    return os.path.splitext(trackfile)[0] + '.stats.npz'
+
+
+def is_stale(trackfile, statsfile):
+    return not os.path.exists(statsfile) or os.path.getmtime(statsfile) < os.path.getmtime(trackfile)
+
+
+def cache_stats(trackfile, dataset, dataroot, ontology):
+    """
+    Scores a track file with score_main.py to write its sufficient statistics, and returns the name of the stats file.
+    The score file is only written to a temporary file, so that the score file of the entry is left as it is.
+    """
+    statsfile = get_statsfile(trackfile)
+    fd, scorefile = tempfile.mkstemp(suffix='.score.csv')
+    os.close(fd)
+    command = [sys.executable, os.path.join(SCRIPTS_PATH, 'score_main.py'), '--dataset', dataset, '--dataroot', dataroot,
+               '--trackfile', trackfile, '--ontology', ontology, '--scorefile', scorefile, '--statsfile', statsfile]
+    try:
+        returncode = subprocess.call(command)
+    finally:
+        os.remove(scorefile)
+    if returncode != 0:
+        raise RuntimeError('score_main.py failed with exit status %d: %s' % (returncode, ' '.join(command)))
+    return statsfile
+
+
+def stack_session_counts(stats_files, schedule, topic):
+    """
+    Returns the (entries x sessions x 5) array of the counts of the entries summed by session.
+    The stats files must have the same rows, i.e. come from the same dataset, and the topic must be all or one of their topics.
+    """
+    reference = stats_files[0]
+    for stats_file in stats_files[1:]:
+        if not np.array_equal(stats_file.session_ids, reference.session_ids):
+            raise RuntimeError('The entries are not scored on the same sessions')
+        for name in ['session', 'topic']:
+            if not np.array_equal(stats_file.rows[schedule][name], reference.rows[schedule][name]):
+                raise RuntimeError('The entries are not scored on the same utterances')
+        if stats_file.topics != reference.topics:
+            raise RuntimeError('The entries are not scored on the same topics')
+
+    # StatsFile.get_mask() selects no rows for an unknown topic, whose scores would all be undefined
+    if topic != 'all' and topic not in reference.topics:
+        raise RuntimeError('Unknown topic %s, which is none of all, %s' % (topic, ', '.join(sorted(reference.topics))))
+
+    mask = reference.get_mask(schedule, topic)
+    return np.stack([stats_file.get_session_counts(schedule, mask) for stats_file in stats_files])
+
+
+def get_p_values(deltas, observed, num_samples):
+    """
+    Returns the matrix of the p-values of the observed differences, from the (samples x entries x entries) differences under the null hypothesis.
+    A difference which is undefined in a sample counts as being as large as the observed one,
+    and so does a difference which only differs from it by rounding errors.
+    """
+    with np.errstate(invalid='ignore'):
+        extreme = ~(np.abs(deltas) < np.abs(observed)[np.newaxis] - EPSILON)
+    p_values = (extreme.sum(axis=0) + 1.0) / (num_samples + 1.0)
+    p_values[np.isnan(observed)] = np.nan
+    return p_values
+
+
+def paired_bootstrap(session_counts, stat, num_samples, seed):
+    """
+    Returns the scores of the entries and the matrix of the p-values of the paired bootstrap test between every pair of entries.
+    The differences of the resamples are centered on the observed ones, to be distributed as under the null hypothesis.
+    """
+    num_entries, num_sessions, _ = session_counts.shape
+    scores = get_metrics(session_counts.sum(axis=1))[stat]
+    observed = scores[:, np.newaxis] - scores[np.newaxis, :]
+
+    weights = get_resample_weights(num_sessions, num_samples, seed)
+    # (samples x entries x 5) totals of every resample, for all the entries at once
+    totals = np.einsum('bs,esk->bek', weights, session_counts)
+    samples = get_metrics(totals)[stat]
+    deltas = samples[:, :, np.newaxis] - samples[:, np.newaxis, :] - observed[np.newaxis]
+    return scores, get_p_values(deltas, observed, num_samples)
+
+
+def approximate_randomization(session_counts, stat, num_samples, seed):
+    """
+    Returns the scores of the entries and the matrix of the p-values of the approximate randomization test between every pair of entries.
+    In each sample, the same random sessions are swapped between the two entries of every pair:
+    the totals of an entry i swapped with an entry j are the totals of i minus its counts of the swapped sessions plus those of j.
+    """
+    num_entries, num_sessions, _ = session_counts.shape
+    totals = session_counts.sum(axis=1)
+    scores = get_metrics(totals)[stat]
+    observed = scores[:, np.newaxis] - scores[np.newaxis, :]
+
+    random_state = np.random.RandomState(seed)
+    swaps = random_state.randint(0, 2, size=(num_samples, num_sessions)).astype(np.float64)
+    # (samples x entries x 5) counts of the swapped sessions
+    swapped = np.einsum('bs,esk->bek', swaps, session_counts)
+    # (samples x entries x entries) scores of the entry of the row, swapped with the entry of the column
+    samples = get_metrics(totals[np.newaxis, :, np.newaxis, :] - swapped[:, :, np.newaxis, :] + swapped[:, np.newaxis, :, :])[stat]
+    deltas = samples - samples.transpose((0, 2, 1))
+    return scores, get_p_values(deltas, observed, num_samples)
+
+
+def format_value(value):
+    if np.isnan(value):
+        return '-'
+    return '%.7f' % (value,)
+
+
+def write_matrix(filename, entries, scores, p_values):
+    """
+    Writes the significance matrix, with the entries by decreasing score and the entries with an undefined score last.
+    """
+    order = sorted(range(len(entries)), key=lambda i: (np.isnan(scores[i]), -scores[i] if not np.isnan(scores[i]) else 0.0, entries[i][:2]))
+    labels = ['team%d/entry%d' % entries[i][:2] for i in order]
+
+    csvfile = open(filename, 'w')
+    print >> csvfile, ','.join(['team', 'entry', 'result'] + labels)
+    for i in order:
+        cells = ['-' if i == j else format_value(p_values[i, j]) for j in order]
+        print >> csvfile, ','.join(['%d' % entries[i][0], '%d' % entries[i][1], format_value(scores[i])] + cells)
+    csvfile.close()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Paired significance tests between all the entries of the main task.')
+    parser.add_argument('--resultdir', dest='resultdir', action='store', required=True, metavar='PATH', help='Directory of the teamN/entryM.json track files')
+    parser.add_argument('--matrixfile', dest='matrixfile', action='store', required=True, metavar='CSV_FILE', help='File to write with the significance matrix')
+    parser.add_argument('--dataset', dest='dataset', action='store', metavar='DATASET', help='The dataset of the track files, to score the entries without cached statistics')
+    parser.add_argument('--dataroot', dest='dataroot', action='store', metavar='PATH', help='Will look for corpus in <destroot>/<dataset>/...')
+    parser.add_argument('--ontology', dest='ontology', action='store', metavar='JSON_FILE', help='JSON Ontology file')
+    parser.add_argument('--test', dest='test', action='store', choices=TESTS, default='bootstrap', help='Significance test')
+    parser.add_argument('--schedule', dest='schedule', action='store', type=int, choices=SCHEDULES, default=1, help='Schedule of the scores')
+    parser.add_argument('--topic', dest='topic', action='store', default='all', help='Topic of the scores, or all')
+    parser.add_argument('--stat', dest='stat', action='store', choices=STATS, default='f1', help='Score to compare')
+    parser.add_argument('--samples', dest='samples', action='store', type=int, default=1000, metavar='N', help='Number of samples of the test')
+    parser.add_argument('--seed', dest='seed', action='store', type=int, default=0, help='Seed of the samples')
+
+    args = parser.parse_args()
+
+    entries = find_entries(args.resultdir)
+    if len(entries) < 2:
+        raise RuntimeError('Less than two entries in %s' % (args.resultdir,))
+
+    statsfiles = []
+    for team, entry, trackfile in entries:
+        statsfile = get_statsfile(trackfile)
+        if is_stale(trackfile, statsfile):
+            if args.dataset is None or args.dataroot is None or args.ontology is None:
+                raise RuntimeError('No statistics for %s, which needs --dataset, --dataroot and --ontology to be scored' % (trackfile,))
+            sys.stderr.write('Scoring team%d/entry%d ...\n' % (team, entry))
+            cache_stats(trackfile, args.dataset, args.dataroot, args.ontology)
+        statsfiles.append(statsfile)
+
+    start_time = time.time()
+    session_counts = stack_session_counts([StatsFile(statsfile) for statsfile in statsfiles], args.schedule, args.topic)
+    if args.test == 'bootstrap':
+        scores, p_values = paired_bootstrap(session_counts, args.stat, args.samples, args.seed)
+    else:
+        scores, p_values = approximate_randomization(session_counts, args.stat, args.samples, args.seed)
+    write_matrix(args.matrixfile, [entry[:2] for entry in entries], scores, p_values)
+
+    num_pairs = len(entries) * (len(entries) - 1) // 2
+    sys.stderr.write('Tested %d pairs of entries with %d samples in %.3f sec\n' % (num_pairs, args.samples, time.time() - start_time))
+
+if __name__ == "__main__":
+    main(sys.argv)
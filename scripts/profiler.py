@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module records where a tracker spends its time: the total time of each stage (loading the data, matching, serialisation, ...),
+the latency of each utterance and the peak resident set size of the process.
+The baselines write these next to their output in <outfile>.profile.json, which report_main.py can show with the scores.
+"""
+
+import sys
+import time
+import json
+from array import array
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PERCENTILES = [50, 95, 99]
+
+
+def get_profile_filename(outfile):
+    return '%s.profile.json' % (outfile,)
+
+
+def percentile(sorted_values, p):
+    if len(sorted_values) == 0:
+        return None
+    idx = int(round(p / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[idx]
+
+
+def get_peak_rss():
+    """
+    Returns the peak resident set size of the process in bytes, or None where it can't be measured.
+    """
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # the size is given in kilobytes on Linux and in bytes on macOS
+    if sys.platform != 'darwin':
+        peak_rss *= 1024
+    return peak_rss
+
+
+class Profiler(object):
+    def __init__(self):
+        self.stages = []
+        self.stage_times = {}
+        self.latencies = array('d')
+        self.start_time = time.time()
+
+    def add_stage_time(self, name, seconds):
+        if name not in self.stage_times:
+            self.stages.append(name)
+            self.stage_times[name] = 0.0
+        self.stage_times[name] += seconds
+
+    @contextmanager
+    def stage(self, name):
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self.add_stage_time(name, time.time() - start_time)
+
+    def iter_stage(self, name, iterable):
+        """
+        Iterates over iterable and counts the time taken by each step in the given stage, e.g. reading the sessions of a dataset_walker.
+        """
+        it = iter(iterable)
+        while True:
+            start_time = time.time()
+            try:
+                item = next(it)
+            except StopIteration:
+                self.add_stage_time(name, time.time() - start_time)
+                return
+            self.add_stage_time(name, time.time() - start_time)
+            yield item
+
+    def add_latency(self, seconds, count=1):
+        """
+        Records the latency of count utterances, which are all answered after the given time when they are processed in a batch.
+        """
+        for _ in range(count):
+            self.latencies.append(seconds)
+
+    @contextmanager
+    def batch(self, stage_name, count):
+        """
+        Counts the time taken in the given stage as the latency of the count utterances processed together.
+        """
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            elapsed_time = time.time() - start_time
+            self.add_stage_time(stage_name, elapsed_time)
+            self.add_latency(elapsed_time, count)
+
+    def utterance(self, stage_name):
+        return self.batch(stage_name, 1)
+
+    def get_last_latency(self):
+        return self.latencies[-1]
+
+    def results(self):
+        latencies = sorted(self.latencies)
+        result = {
+            'wall_time': time.time() - self.start_time,
+            'stages': [{'stage': name, 'time': self.stage_times[name]} for name in self.stages],
+            'utterances': len(latencies),
+            'latency': {
+                'mean': sum(latencies) / len(latencies) if len(latencies) > 0 else None,
+                'max': latencies[-1] if len(latencies) > 0 else None
+            },
+            'peak_rss': get_peak_rss()
+        }
+        for p in PERCENTILES:
+            result['latency']['p%d' % (p,)] = percentile(latencies, p)
+        return result
+
+    def save(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.results(), f, indent=4)
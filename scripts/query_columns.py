@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+"""
+Ready-made aggregate queries on the tables written by corpus_columns.py.
+
+    python query_columns.py --indir dstc5_dev.columns --query values_by_slot --where topic=ACCOMMODATION
+"""
+
+import argparse
+import sys
+
+from corpus_columns import CorpusColumns
+
+# name: (description, table, columns, distinct column)
+QUERIES = {
+    'utterances_by_speaker': ('Number of utterances of each speaker', 'utterances', ['speaker'], None),
+    'utterances_by_topic': ('Number of utterances of each topic', 'utterances', ['topic'], None),
+    'utterances_by_topic_speaker': ('Number of utterances of each topic and speaker', 'utterances', ['topic', 'speaker'], None),
+    'segments_by_topic': ('Number of sub-dialog segments of each topic', 'utterances', ['topic'], None),
+    'sessions_by_topic': ('Number of sessions where each topic is discussed', 'utterances', ['topic'], 'session_id'),
+    'values_by_slot': ('Number of slot values in the frame labels of each slot', 'frames', ['slot'], None),
+    'values_by_topic_slot': ('Number of slot values in the frame labels of each topic and slot', 'frames', ['topic', 'slot'], None),
+    'distinct_values_by_slot': ('Number of distinct values of each slot', 'frames', ['slot'], 'value'),
+    'top_values': ('Number of occurrences of each slot value', 'frames', ['slot', 'value'], None),
+    'acts_by_speaker': ('Number of speech acts of each speaker and act', 'acts', ['speaker', 'act'], None),
+    'act_attributes': ('Number of occurrences of each speech act and attribute', 'speech_acts', ['act', 'attribute'], None)
+}
+
+# the segments are counted by their first utterance
+QUERY_CONDITIONS = {
+    'segments_by_topic': {'target_bio': 'B'}
+}
+
+
+def run_query(columns, query, where=None):
+    """
+    Returns the list of (values, count) of a query of QUERIES, among the rows with the values of a dict of columns.
+    """
+    _, table, group_columns, distinct_column = QUERIES[query]
+    conditions = dict(QUERY_CONDITIONS.get(query, {}))
+    conditions.update(where or {})
+    if distinct_column is None:
+        return columns.count_by(table, group_columns, conditions)
+    return columns.count_distinct_by(table, group_columns, distinct_column, conditions)
+
+
+def parse_condition(condition):
+    if '=' not in condition:
+        raise argparse.ArgumentTypeError('Wrong condition, expected COLUMN=VALUE: %s' % (condition,))
+    column, value = condition.split('=', 1)
+    if column in ['session_id', 'utter_index']:
+        value = int(value)
+    else:
+        value = value.decode('utf-8')
+    return column, value
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Aggregate queries on the columnar tables of a dataset.')
+    parser.add_argument('--indir', dest='indir', action='store', required=True, metavar='PATH', help='Directory of the tables written by corpus_columns.py')
+    parser.add_argument('--query', dest='query', action='store', choices=sorted(QUERIES.keys()), required=True, help='Query to run')
+    parser.add_argument('--where', dest='where', action='store', nargs='+', type=parse_condition, default=[], metavar='COLUMN=VALUE', help='Only count the rows with these values')
+    parser.add_argument('--limit', dest='limit', action='store', type=int, metavar='N', help='Only print the N largest counts')
+
+    args = parser.parse_args()
+
+    columns = CorpusColumns(args.indir)
+    table = QUERIES[args.query][1]
+    for column, _ in args.where:
+        if column not in columns.tables[table]:
+            parser.error('the %s table has no column %s' % (table, column))
+
+    result = run_query(columns, args.query, dict(args.where))
+    if args.limit is not None:
+        result = result[:args.limit]
+
+    print '# %s' % (QUERIES[args.query][0],)
+    for values, count in result:
+        print '%s\t%d' % ('\t'.join([u'-' if value is None else unicode(value) for value in values]).encode('utf-8'), count)
+
+if __name__ == "__main__":
+    main(sys.argv)
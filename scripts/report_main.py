@@ -4,7 +4,7 @@
 This script shows the summarized results based the CSV file generated by score_main.py
 """
 
-import sys, argparse
+import sys, argparse, json
 
 SCHEDULES = [1,2]
 
@@ -15,6 +15,8 @@ def main(argv):
     parser = argparse.ArgumentParser(description='Formats a scorefile into a report and prints to stdout.')
     parser.add_argument('--scorefile',dest='csv',action='store',required=True,metavar='CSV_FILE',
                         help='File to read with CSV scoring data')
+    parser.add_argument('--profilefile',dest='profile',action='store',metavar='JSON_FILE',
+                        help='Profile written by the tracker with --profile, to show along with the scores')
     args = parser.parse_args()
 
     #  "topic, slot, schedule, stat, N, result"
@@ -26,6 +28,8 @@ def main(argv):
         tables['all'][schedule] = {}
         
     basic_stats = {}
+    latency_stats = {}
+    latency_topics = []
     
     for line in open(args.csv):
         if header:
@@ -36,6 +40,12 @@ def main(argv):
         stat = stat.strip()
         if topic == "basic" :
             basic_stats[slot] = result.strip()
+        elif topic == "latency" :
+            # the slot column holds the topic of the utterances
+            if slot not in latency_stats:
+                latency_topics.append(slot)
+                latency_stats[slot] = {'N': N}
+            latency_stats[slot][stat] = "%.7f" % float(result)
         else :
             N = int(N)
             schedule = int(schedule)
@@ -62,6 +72,37 @@ def main(argv):
         v = basic_stats[k]
         print '%25s : %s' % (k,v)
 
+    if len(latency_topics) > 0:
+        print "\n\n"
+        print '                                  utterance latency'
+        columns = ['N', 'mean', 'p50', 'p95', 'p99', 'max']
+        print_row([""] + columns, header=True)
+        for topic in latency_topics:
+            print_row([topic] + [latency_stats[topic].get(column, '-') for column in columns])
+
+    if args.profile is not None:
+        print_profile(json.load(open(args.profile)))
+
+def print_profile(profile):
+    print "\n\n"
+    print '                                      profile'
+    print '-----------------------------------------------------------------------------------'
+    print '%25s : %s' % ('wall_time', format_value(profile['wall_time']))
+    for stage in profile['stages']:
+        print '%25s : %s' % ('stage.%s' % stage['stage'], format_value(stage['time']))
+    print '%25s : %s' % ('utterances', profile['utterances'])
+    for k in sorted(profile['latency'].keys()):
+        print '%25s : %s' % ('latency.%s' % k, format_value(profile['latency'][k]))
+    if profile['peak_rss'] is None:
+        print '%25s : -' % ('peak_rss_mb',)
+    else:
+        print '%25s : %.1f' % ('peak_rss_mb', profile['peak_rss'] / 1048576.0)
+
+def format_value(value):
+    if value is None:
+        return "-"
+    return "%.7f" % value
+
 def print_row(row, header=False):
     out = [str(x) for x in row]
     for i in range(len(out)):
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+"""
+Features of the SAP baseline, shared by baseline_sap.py and the predictors which don't need scikit-learn.
+
+The context of a target-role turn is built from the previous turns of its session, turned into a list of features by get_feats(),
+and the features and their pairwise conjunctions are mapped to the columns of a sparse matrix by an indexer or a hasher.
+"""
+
+from scipy.sparse import csr_matrix
+
+from collections import namedtuple
+
+import zlib
+
+import re
+
+
+# Immutable context of a target-role turn. The fields refer to the objects loaded by dataset_walker,
+# which are never modified, so the records can be kept without copying them.
+SAPContext = namedtuple('SAPContext', ['prev_turn_act', 'curr_semantic_tags', 'prev_semantic_tags', 'dist_from_prev_turn'])
+
+
+class SAPContextBuilder:
+    """
+    Keeps what the context of a target-role turn needs from the previous turns of a session, which are added one at a time.
+    """
+    def __init__(self, roletype):
+        self.roletype = roletype.lower()
+        self.prev_turn_act = None
+        self.prev_semantic_tags = None
+        self.dist_from_prev_turn = 0
+
+    def add(self, log_utter):
+        """
+        Returns the context of the utterance if it is spoken by the target role, or None otherwise.
+        """
+        context = None
+        if log_utter['speaker'].lower() == self.roletype:
+            self.dist_from_prev_turn += 1
+            context = SAPContext(self.prev_turn_act, log_utter['semantic_tags'], self.prev_semantic_tags, self.dist_from_prev_turn)
+        else:
+            self.prev_turn_act = log_utter['speech_act']
+            self.dist_from_prev_turn = 0
+        self.prev_semantic_tags = log_utter['semantic_tags']
+        return context
+
+
+
+def get_feats(context):
+    result = []
+    # current semantic tag features
+    if len(context.curr_semantic_tags) == 0:
+        result.append('curr_semantic_tag:null')
+    else:
+        for tag in context.curr_semantic_tags:
+            main_cat = tag['main']
+            sub_cat = tag['attributes']['cat']
+            result.append('curr_semantic_tag:%s' % (main_cat,))
+            result.append('curr_semantic_tag:%s_%s' % (main_cat, sub_cat))
+
+    # previous semantic tag features
+    if context.prev_semantic_tags is None or len(context.prev_semantic_tags) == 0:
+        result.append('prev_semantic_tag:null')
+    else:
+        for tag in context.prev_semantic_tags:
+            main_cat = tag['main']
+            sub_cat = tag['attributes']['cat']
+            result.append('prev_semantic_tag:%s' % (main_cat,))
+            result.append('prev_semantic_tag:%s_%s' % (main_cat, sub_cat))
+
+    # previous turn speech act features
+    if context.prev_turn_act is None:
+        result.append('prev_turn_act:null')
+    else:
+        for act in context.prev_turn_act:
+            main_act = act['act']
+            result.append('prev_turn_act:%s' % (main_act,))
+
+            for attr in act['attributes']:
+                result.append('prev_turn_act:%s_%s' % (main_act, attr))
+
+    # distance from the previuos turn features
+    dist = context.dist_from_prev_turn
+    if dist == 1:
+        result.append('dist_from_prev_turn:1')
+    elif dist == 2:
+        result.append('dist_from_prev_turn:2')
+    else:
+        result.append('dist_from_prev_turn>2')
+
+    return result
+
+
+class SAPFeatureIndexer:
+    """
+    Maps the features of a SAPContext and all their pairwise conjunctions to column indices of a sparse matrix.
+    A conjunction is keyed by the pair of indices of its two features, so no conjunction strings are built.
+    """
+    def __init__(self):
+        self.__index = {}
+        self.__frozen = False
+
+    def freeze(self):
+        self.__frozen = True
+
+    def get_num_features(self):
+        return len(self.__index)
+
+    def __lookup(self, key):
+        idx = self.__index.get(key)
+        if idx is None and not self.__frozen:
+            idx = len(self.__index)
+            self.__index[key] = idx
+        return idx
+
+    def get_collision_report(self):
+        return None
+
+    def get_vocabulary(self):
+        """
+        Returns the dict from the features and the pairs of feature indices of the conjunctions to their column indices.
+        """
+        return self.__index
+
+    def get_indices(self, context):
+        feat_indices = [self.__lookup(feat) for feat in get_feats(context)]
+
+        result = [idx for idx in feat_indices if idx is not None]
+        for i in range(len(feat_indices)):
+            if feat_indices[i] is None:
+                continue
+            for j in range(i + 1, len(feat_indices)):
+                if feat_indices[j] is None:
+                    continue
+                idx = self.__lookup((feat_indices[i], feat_indices[j]))
+                if idx is not None:
+                    result.append(idx)
+        return result
+
+    def transform(self, contexts):
+        indptr = [0]
+        indices = []
+        for context in contexts:
+            indices.extend(self.get_indices(context))
+            indptr.append(len(indices))
+
+        mat = csr_matrix(([1.0] * len(indices), indices, indptr), shape=(len(contexts), self.get_num_features()))
+        mat.sum_duplicates()
+        return mat
+
+
+class SAPFeatureHasher(SAPFeatureIndexer):
+    """
+    Hashes the features and their pairwise conjunctions into a fixed number of columns,
+    so that neither a vocabulary nor the conjunction strings have to be kept in the model.
+    While training, the distinct features falling into each column are counted for the collision report.
+    """
+    def __init__(self, hashbits):
+        SAPFeatureIndexer.__init__(self)
+        self.__num_features = 2 ** hashbits
+        self.__mask = self.__num_features - 1
+        self.__buckets = {}
+
+    def freeze(self):
+        self.__buckets = None
+
+    def get_num_features(self):
+        return self.__num_features
+
+    def get_vocabulary(self):
+        return None
+
+    def get_collision_report(self):
+        num_feats = 0
+        num_colliding_feats = 0
+        for keys in self.__buckets.values():
+            num_feats += len(keys)
+            if len(keys) > 1:
+                num_colliding_feats += len(keys)
+        return {'features': num_feats, 'columns': self.__num_features, 'used_columns': len(self.__buckets), 'colliding_features': num_colliding_feats}
+
+    def __track(self, key, idx):
+        if self.__buckets is not None:
+            self.__buckets.setdefault(idx, set()).add(key)
+
+    def get_indices(self, context):
+        feats = get_feats(context)
+        feat_hashes = [zlib.crc32(feat.encode('utf-8')) & 0xffffffff for feat in feats]
+
+        result = []
+        for i in range(len(feats)):
+            idx = feat_hashes[i] & self.__mask
+            self.__track(feats[i], idx)
+            result.append(idx)
+
+        for i in range(len(feats)):
+            for j in range(i + 1, len(feats)):
+                idx = (((feat_hashes[i] * 0x01000193) ^ feat_hashes[j]) & 0xffffffff) & self.__mask
+                self.__track((feats[i], feats[j]), idx)
+                result.append(idx)
+        return result
+
+
+def combine_acts(act_labels):
+    combined_act = {}
+    for act_label in act_labels:
+        m = re.match('^([^_]+)_(.+)$', act_label)
+        act = m.group(1)
+        attr = m.group(2)
+        if act not in combined_act:
+            combined_act[act] = []
+        if attr not in combined_act[act]:
+            combined_act[act].append(attr)
+
+    result = []
+    for act in combined_act:
+        attr = combined_act[act]
+        result.append({'act': act, 'attributes': attr})
+    return result
@@ -8,11 +8,61 @@ It creates a CSV file including the scores.
 import sys
 import os
 import argparse
-import json
+from itertools import izip
 from ontology_reader import OntologyReader
+from track_reader import TrackReader
+from profiler import percentile, PERCENTILES
+from sufficient_stats import SufficientStats
 
 SCHEDULES = [1,2]
 
+
+class ScheduleStats(object):
+    """
+    The stats of a schedule for all the utterances and for each topic and slot of the ontology.
+    They are indexed by topic and slot, so that an utterance only updates the stats of its topic and of the slots in its frames.
+    """
+    def __init__(self, ontology, schedule, stat_classes):
+        # ((topic, slot), schedule, stat) in the order of the score file
+        self.stats = []
+        self.all_stats = []
+        self.topic_stats = {}
+        self.slot_stats = {}
+
+        for stat_class in stat_classes:
+            self.stats.append((('all', 'all'), schedule, stat_class()))
+            self.all_stats.append(self.stats[-1][2])
+
+        for topic in ontology.get_topics():
+            self.topic_stats[topic] = []
+            self.slot_stats[topic] = {}
+            for slot in ontology.get_slots(topic) + ['all']:
+                for stat_class in stat_classes:
+                    self.stats.append(((topic, slot), schedule, stat_class()))
+                    if slot == 'all':
+                        self.topic_stats[topic].append(self.stats[-1][2])
+                    else:
+                        self.slot_stats[topic].setdefault(slot, []).append(self.stats[-1][2])
+
+    def add(self, topic, track_frame, ref_frame):
+        for stat in self.all_stats:
+            stat.add(track_frame, ref_frame)
+
+        # the utterances out of the segments have no frames, and are not counted
+        if topic not in self.topic_stats or track_frame is None or ref_frame is None:
+            return
+        for stat in self.topic_stats[topic]:
+            stat.add(track_frame, ref_frame)
+
+        slot_stats = self.slot_stats[topic]
+        for slot in set(track_frame.keys()) | set(ref_frame.keys()):
+            if slot in slot_stats:
+                track_slot_frame = {slot: track_frame.get(slot, [])}
+                ref_slot_frame = {slot: ref_frame.get(slot, [])}
+                for stat in slot_stats[slot]:
+                    stat.add(track_slot_frame, ref_slot_frame)
+
+
 def main(argv):
     install_path = os.path.abspath(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     utils_dirname = os.path.join(install_path,'lib')
@@ -27,96 +77,69 @@ def main(argv):
     parser.add_argument('--trackfile',dest='trackfile',action='store',metavar='JSON_FILE',required=True,help='File containing tracker JSON output')
     parser.add_argument('--scorefile',dest='scorefile',action='store',metavar='JSON_FILE',required=True,help='File to write with JSON scoring data')
     parser.add_argument('--ontology',dest='ontology',action='store',metavar='JSON_FILE',required=True,help='JSON Ontology file')
+    parser.add_argument('--statsfile',dest='statsfile',action='store',metavar='NPZ_FILE',help='File to write with the per-utterance sufficient statistics, for bootstrap_ci.py')
 
     args = parser.parse_args()
 
     sessions = dataset_walker(args.dataset, dataroot=args.dataroot, labels=True)
-    tracker_output = json.load(open(args.trackfile))
+    # the track file is read one session at a time, in lockstep with the dataset
+    tracker_output = TrackReader(args.trackfile)
 
     ontology = OntologyReader(args.ontology)
 
     stats = []
     stat_classes = [Stat_Accuracy, Stat_Frame_Precision_Recall]
-
+    schedule_stats = {}
     for schedule in SCHEDULES:
-        for stat_class in stat_classes:
-            stats.append((('all', 'all'), schedule, stat_class()))
+        schedule_stats[schedule] = ScheduleStats(ontology, schedule, stat_classes)
+        stats += schedule_stats[schedule].stats
 
-        for topic in ontology.get_topics():
-            for slot in ontology.get_slots(topic) + ['all']:
-                for stat_class in stat_classes:
-                    stats.append(((topic, slot), schedule, stat_class()))
+    sufficient_stats = None
+    if args.statsfile is not None:
+        sufficient_stats = SufficientStats()
 
     utter_counter = 0.0
 
-    for session, track_session in zip(sessions, tracker_output["sessions"]):
-        prev_ref_frame = None
-        prev_track_frame = None
-        prev_topic = None
+    # the times taken by the tracker for the utterances which report it, for all the utterances and by topic
+    latencies = {'all': []}
+    for topic in ontology.get_topics():
+        latencies[topic] = []
+
+    # the track sessions come first, so that izip runs them to their end, where the values after them are recorded
+    for track_session, session in izip(tracker_output["sessions"], sessions):
+        segments = []
+        if sufficient_stats is not None:
+            session_index = sufficient_stats.add_session(session.log['session_id'])
 
         for (log_utter, translations, label_utter), track_utter in zip(session, track_session["utterances"]):
             utter_counter += 1.0
 
-            if log_utter['segment_info']['target_bio'] == 'B':
+            if 'wall_time' in track_utter:
+                latencies['all'].append(track_utter['wall_time'])
+                if log_utter['segment_info']['topic'] in latencies:
+                    latencies[log_utter['segment_info']['topic']].append(track_utter['wall_time'])
+
+            target_bio = log_utter['segment_info']['target_bio']
+            if target_bio == 'B' or len(segments) == 0:
                 # Beginning of a new segment
-                ref_frame = label_utter['frame_label']
-                track_frame = track_utter['frame_label']
+                segments.append([])
 
-                for (topic, slot), schedule, stat_class in stats:
-                    if schedule == 2:
-                        if topic == 'all':
-                            stat_class.add(prev_track_frame, prev_ref_frame)
-                        elif prev_topic == topic:
-                            if slot == 'all':
-                                stat_class.add(prev_track_frame, prev_ref_frame)
-                            else:
-                                if slot in prev_track_frame and slot in prev_ref_frame:
-                                    stat_class.add({slot: prev_track_frame[slot]}, {slot: prev_ref_frame[slot]})
-                                elif slot in prev_track_frame and slot not in prev_ref_frame:
-                                    stat_class.add({slot: prev_track_frame[slot]}, {slot: []})
-                                elif slot not in prev_track_frame and slot in prev_ref_frame:
-                                    stat_class.add({slot: []}, {slot: prev_ref_frame[slot]})
-
-            elif log_utter['segment_info']['target_bio'] == 'I':
+            if target_bio == 'B' or target_bio == 'I':
                 ref_frame = label_utter['frame_label']
                 track_frame = track_utter['frame_label']
-            elif log_utter['segment_info']['target_bio'] == 'O':
+            elif target_bio == 'O':
                 ref_frame = None
                 track_frame = None
 
-            for (topic, slot), schedule, stat_class in stats:
-                if schedule == 1:
-                    if topic == 'all':
-                        stat_class.add(track_frame, ref_frame)
-                    elif log_utter['segment_info']['topic'] == topic:
-                        if slot == 'all':
-                            stat_class.add(track_frame, ref_frame)
-                        else:
-                            if slot in track_frame and slot in ref_frame:
-                                stat_class.add({slot: track_frame[slot]}, {slot: ref_frame[slot]})
-                            elif slot in track_frame and slot not in ref_frame:
-                                stat_class.add({slot: track_frame[slot]}, {slot: []})
-                            elif slot not in track_frame and slot in ref_frame:
-                                stat_class.add({slot: []}, {slot: ref_frame[slot]})
-
-            prev_ref_frame = ref_frame
-            prev_track_frame = track_frame
-            prev_topic = log_utter['segment_info']['topic']
-
-        for (topic, slot), schedule, stat_class in stats:
-            if schedule == 2:
-                if topic == 'all':
-                    stat_class.add(prev_track_frame, prev_ref_frame)
-                elif prev_topic == topic:
-                    if slot == 'all':
-                        stat_class.add(prev_track_frame, prev_ref_frame)
-                    else:
-                        if slot in prev_track_frame and slot in prev_ref_frame:
-                            stat_class.add({slot: prev_track_frame[slot]}, {slot: prev_ref_frame[slot]})
-                        elif slot in track_frame and slot not in ref_frame:
-                            stat_class.add({slot: prev_track_frame[slot]}, {slot: []})
-                        elif slot not in track_frame and slot in ref_frame:
-                            stat_class.add({slot: []}, {slot: prev_ref_frame[slot]})
+            segments[-1].append((log_utter['segment_info']['topic'], track_frame, ref_frame))
+
+        for segment in segments:
+            # schedule 1 evaluates every utterance, and schedule 2 only the last one of each segment
+            for schedule, utterances in [(1, segment), (2, segment[-1:])]:
+                for topic, track_frame, ref_frame in utterances:
+                    schedule_stats[schedule].add(topic, track_frame, ref_frame)
+                    if sufficient_stats is not None:
+                        sufficient_stats.add(schedule, session_index, topic, track_frame, ref_frame)
 
     csvfile = open(args.scorefile, 'w')
     print >> csvfile, ("topic, slot, schedule, stat, N, result")
@@ -132,13 +155,24 @@ def main(argv):
                 result = "%.7f"%result
             print >>csvfile,("%s, %s, %i, %s, %i, %s"%(topic, slot, schedule, stat_subname, N, result))
 
+    for topic in ['all'] + ontology.get_topics():
+        values = sorted(latencies[topic])
+        if len(values) == 0:
+            continue
+        for stat_subname, result in [('mean', sum(values) / len(values))] + [('p%d' % p, percentile(values, p)) for p in PERCENTILES] + [('max', values[-1])]:
+            print >>csvfile,("latency, %s, , %s, %i, %.7f"%(topic, stat_subname, len(values), result))
+
     print >>csvfile,'basic,total_wall_time,,,,%s' % (tracker_output['wall_time'])
     print >>csvfile,'basic,sessions,,,,%s' % (len(sessions))
     print >>csvfile,'basic,utterances,,,,%i' % (int(utter_counter))
     print >>csvfile,'basic,wall_time_per_utterance,,,,%s' % (tracker_output['wall_time'] / utter_counter)
+    print >>csvfile,'basic,utterances_per_second,,,,%s' % (utter_counter / tracker_output['wall_time'])
     print >>csvfile,'basic,dataset,,,,%s' % (tracker_output['dataset'] )
 
     csvfile.close()
 
+    if sufficient_stats is not None:
+        sufficient_stats.save(args.statsfile)
+
 if (__name__ == '__main__'):
     main(sys.argv)
@@ -11,8 +11,8 @@ def main(argv):
 
     sys.path.append(utils_dirname)
     from dataset_walker import dataset_walker
-    from stat_classes import Stat_Precision_Recall
-    from eval_func import eval_acts, eval_semantics
+    from stat_classes import Stat_Precision_Recall, Stat_Columnar_Precision_Recall
+    from eval_func import eval_acts, eval_semantics, eval_semantics_columnar
 
     parser = argparse.ArgumentParser(
         description='Evaluate output from an SLU system.')
@@ -34,6 +34,8 @@ def main(argv):
     parser.add_argument('--scorefile', dest='scorefile',
                         action='store', metavar='JSON_FILE', required=True,
                         help='File to write with CSV scoring data')
+    parser.add_argument('--columnar', dest='columnar', action='store_true',
+                        help='Evaluate semantic tags with integer-coded columns')
 
     args = parser.parse_args()
 
@@ -42,11 +44,18 @@ def main(argv):
 
     system_output = json.load(open(args.jsonfile))
 
+    if args.columnar:
+        semantic_stat_class = Stat_Columnar_Precision_Recall
+        semantic_eval_func = eval_semantics_columnar
+    else:
+        semantic_stat_class = Stat_Precision_Recall
+        semantic_eval_func = eval_semantics
+
     stats = {}
     stats['semantic_tagged'] = {}
-    stats['semantic_tagged']['detection'] = Stat_Precision_Recall()
-    stats['semantic_tagged']['class'] = Stat_Precision_Recall()
-    stats['semantic_tagged']['all'] = Stat_Precision_Recall()
+    stats['semantic_tagged']['detection'] = semantic_stat_class()
+    stats['semantic_tagged']['class'] = semantic_stat_class()
+    stats['semantic_tagged']['all'] = semantic_stat_class()
 
     stats['speech_act'] = {}
     stats['speech_act']['act'] = Stat_Precision_Recall()
@@ -72,7 +81,7 @@ def main(argv):
                 elif subtask == 'semantic_tagged':
                     ref_tagged = ' '.join(label_utter['semantic_tagged'])
                     pred_tagged = track_utter['semantic_tagged']
-                    eval_semantics(ref_tagged, pred_tagged, stats[subtask])
+                    semantic_eval_func(ref_tagged, pred_tagged, stats[subtask])
 
     csvfile = open(args.scorefile, 'w')
     print >> csvfile, ("task, subtask, schedule, stat, N, result")
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""
+Projection of the SLU predictions on the English translation to the Chinese utterance, shared by baseline_slu.py and model_server.py,
+which doesn't need scikit-learn to serve an exported model.
+
+The semantic tags of the translation are projected to the characters of the utterance through the word alignments,
+and the speech acts and the projected tags make up the output of the utterance.
+"""
+
+import operator
+import re
+
+
+class DirectLabelProjection:
+    def __init__(self):
+        pass
+
+    def project(self, cn_utter, en_translated, align, en_tagged):
+        cn_word_id_map = self.__get_char_word_map(cn_utter, [word for word, _ in align])
+        en_word_id_map = self.__get_char_word_map(en_translated, en_translated.split())
+
+        en_tagged_unit_id_map = self.__get_char_word_map(en_translated.lower(), [word for word, _ in en_tagged])
+
+        result = {}
+
+        for cn_idx in range(len(cn_word_id_map)):
+            cn_chr = cn_utter[cn_idx]
+            cn_word_id = cn_word_id_map[cn_idx]
+
+            aligned_en_word_id_list = []
+            if cn_word_id is not None:
+                _, aligned_en_word_id_list = align[cn_word_id]
+
+            projected_tag_count = {'O': 0}
+
+            for en_word_id in aligned_en_word_id_list:
+                for en_chr_id in self.__get_char_index_list(en_word_id_map, en_word_id):
+                    en_tagged_unit_id = en_tagged_unit_id_map[en_chr_id]
+                    if en_tagged_unit_id is not None:
+                        _, tag = en_tagged[en_tagged_unit_id]
+                        tag = tag.replace('B-', '').replace('I-', '')
+                        if tag not in projected_tag_count:
+                            projected_tag_count[tag] = 0
+                        projected_tag_count[tag] += 1
+
+            tags_w_max_freq = [key for key, val in projected_tag_count.iteritems() if key != 'O' and val == max(projected_tag_count.values())]
+
+            if len(tags_w_max_freq) > 0:
+                result[cn_idx] = {'char': cn_chr, 'tag': tags_w_max_freq[0]}
+            else:
+                result[cn_idx] = {'char': cn_chr, 'tag': None}
+
+        return result
+
+    def convert_to_tagged_utter(self, projection_result):
+        result = ''
+        prev_tag = None
+        for idx in sorted(projection_result.keys()):
+            char = projection_result[idx]['char']
+            tag = projection_result[idx]['tag']
+
+            if tag != prev_tag:
+                if prev_tag is not None:
+                    result += '</%s>' % (prev_tag.split('_')[0],)
+                if tag is not None:
+                    result += '<%s cat="%s">' % (tag.split('_')[0], tag.split('_')[1])
+
+            result += char
+            prev_tag = tag
+
+        if prev_tag is not None:
+            result += '</%s>' % (prev_tag.split('_')[0])
+
+        return result
+
+    def __get_char_index_list(self, word_id_map, word_id):
+        result = []
+        for idx in word_id_map:
+            if word_id_map[idx] == word_id:
+                result.append(idx)
+        return sorted(set(result))
+
+    def __get_char_word_map(self, utter, tokenized):
+        chr_word_id_map = {}
+        for idx in range(len(utter)):
+            chr_word_id_map[idx] = None
+
+        cur = 0
+        for word_id in range(len(tokenized)):
+            word = tokenized[word_id]
+            pos = utter.find(word, cur)
+
+            if pos >= 0:
+                for idx in range(pos, pos+len(word)):
+                    chr_word_id_map[idx] = word_id
+                cur = pos + len(word)
+        return chr_word_id_map
+
+
+def get_slu_result(log_utter, translations, prediction, projection):
+    """
+    Returns the output for an utterance from the (pred_act, pred_semantic) predicted for its top translation,
+    or from None if it has no translation.
+    """
+    slu_result = {'utter_index': log_utter['utter_index']}
+    if prediction is not None:
+        pred_act, pred_semantic = prediction
+        top_hyp = translations['translated'][0]['hyp']
+
+        combined_act = {}
+        for act_label in reduce(operator.add, pred_act):
+            m = re.match('^([^_]+)_(.+)$', act_label)
+            act = m.group(1)
+            attr = m.group(2)
+            if act not in combined_act:
+                combined_act[act] = []
+            if attr not in combined_act[act]:
+                combined_act[act].append(attr)
+
+        slu_result['speech_act'] = []
+        for act in combined_act:
+            attr = combined_act[act]
+            slu_result['speech_act'].append({'act': act, 'attributes': attr})
+
+        align = translations['translated'][0]['align']
+
+        projected = projection.project(log_utter['transcript'], top_hyp, align, pred_semantic)
+        slu_result['semantic_tagged'] = projection.convert_to_tagged_utter(projected)
+    else:
+        slu_result['semantic_tagged'] = log_utter['transcript']
+        slu_result['speech_act'] = []
+    return slu_result
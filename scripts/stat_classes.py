@@ -1,4 +1,8 @@
 # -*- coding: utf-8 -*-
+from array import array
+
+import numpy as np
+
 from calc_amfm_bleu import calcScoresBleuAMFM
 
 
@@ -68,6 +72,48 @@ class Stat_Precision_Recall(Stat):
         return [("precision", self.tp+self.fp, precision),("recall", self.tp+self.fn, recall), ("f1", self.tp+self.fp+self.fn, fscore)]
 
 
+class Stat_Columnar_Precision_Recall(Stat_Precision_Recall):
+    """
+    Precision/recall over hashable objects which are interned as integer codes and
+    compared column-wise for the whole evaluation set when the results are requested.
+    The code 0 is reserved for None, so the counts are the same as the ones from
+    Stat_Precision_Recall.add() without list_mode.
+    """
+    def __init__(self,):
+        Stat_Precision_Recall.__init__(self)
+        self.codes = {None: 0}
+        self.pred_codes = array('i')
+        self.ref_codes = array('i')
+
+    def encode(self, obj):
+        code = self.codes.get(obj)
+        if code is None:
+            code = len(self.codes)
+            self.codes[obj] = code
+        return code
+
+    def add(self, pred, ref, list_mode=False):
+        if list_mode:
+            raise RuntimeError('The lists of objects are not supported by the columnar statistics')
+        self.pred_codes.append(self.encode(pred))
+        self.ref_codes.append(self.encode(ref))
+
+    def extend(self, pred_list, ref_list):
+        self.pred_codes.extend([self.encode(x) for x in pred_list])
+        self.ref_codes.extend([self.encode(x) for x in ref_list])
+
+    def results(self,):
+        pred = np.frombuffer(self.pred_codes, dtype=np.int32)
+        ref = np.frombuffer(self.ref_codes, dtype=np.int32)
+
+        mismatch = pred != ref
+        self.tp = float(np.count_nonzero((pred != 0) & ~mismatch))
+        self.fp = float(np.count_nonzero((pred != 0) & mismatch))
+        self.fn = float(np.count_nonzero((ref != 0) & mismatch))
+
+        return Stat_Precision_Recall.results(self)
+
+
 class Stat_Frame_Precision_Recall(Stat_Precision_Recall):
     def add(self, pred, ref):
         if pred is not None and ref is not None:
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+
+"""
+Coding of the strings of a small set, such as the speakers of the corpus or the cells of the score files, as consecutive integers.
+"""
+
+
+class StringTable(object):
+    """
+    Codes a small set of strings as consecutive integers.
+    """
+    def __init__(self):
+        self.strings = []
+        self.codes = {}
+
+    def get_code(self, string):
+        code = self.codes.get(string)
+        if code is None:
+            code = len(self.strings)
+            self.codes[string] = code
+            self.strings.append(string)
+        return code
+
+    def get_string(self, code):
+        return self.strings[code]
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+"""
+Per-utterance sufficient statistics of the main-task metrics, which score_main.py writes with --statsfile.
+
+For each schedule, an utterance evaluated by the stats of score_main.py has a row with its session, its topic,
+whether the tracked frame is correct, and the true positive, false positive and false negative slot-value pairs.
+The accuracy and the slot-value precision, recall and F1 of any set of utterances are computed from the sums of these counts,
+so that the scores of many resamples of the sessions are computed at once with a matrix product instead of scoring the track file again.
+The rows are in the order of the dataset, which only depends on the labels, so the files of two trackers on a dataset have the same rows.
+"""
+
+import numpy as np
+
+from stat_classes import Stat_Frame_Precision_Recall
+
+SCHEDULES = [1, 2]
+COUNTS = ['correct', 'tp', 'fp', 'fn']
+
+
+class SufficientStats(object):
+    def __init__(self):
+        self.session_ids = []
+        self.topics = []
+        self.topic_codes = {}
+        self.rows = dict([(schedule, []) for schedule in SCHEDULES])
+
+    def add_session(self, session_id):
+        """
+        Returns the index of a new session, for the rows of its utterances.
+        """
+        self.session_ids.append(session_id)
+        return len(self.session_ids) - 1
+
+    def add(self, schedule, session_index, topic, track_frame, ref_frame):
+        # the stats of score_main.py don't count the utterances out of the segments either
+        if track_frame is None or ref_frame is None:
+            return
+        if topic not in self.topic_codes:
+            self.topic_codes[topic] = len(self.topics)
+            self.topics.append(topic)
+
+        stat = Stat_Frame_Precision_Recall()
+        stat.add(track_frame, ref_frame)
+        self.rows[schedule].append((session_index, self.topic_codes[topic], int(track_frame == ref_frame), stat.tp, stat.fp, stat.fn))
+
+    def save(self, filename):
+        arrays = {
+            'session_ids': np.array(self.session_ids, dtype=np.int64),
+            'topics': np.array([topic.encode('utf-8') for topic in self.topics], dtype=np.string_)
+        }
+        for schedule in SCHEDULES:
+            rows = np.array(self.rows[schedule], dtype=np.int32).reshape((-1, 2 + len(COUNTS)))
+            arrays['%d.session' % (schedule,)] = rows[:, 0]
+            arrays['%d.topic' % (schedule,)] = rows[:, 1]
+            for i, count in enumerate(COUNTS):
+                arrays['%d.%s' % (schedule, count)] = rows[:, 2 + i]
+        with open(filename, 'wb') as f:
+            np.savez(f, **arrays)
+
+
+class StatsFile(object):
+    """
+    Sufficient statistics loaded from a file written by SufficientStats.
+    """
+    def __init__(self, filename):
+        with np.load(filename) as data:
+            self.session_ids = data['session_ids']
+            self.topics = [topic.decode('utf-8') for topic in data['topics']]
+            self.rows = {}
+            for schedule in SCHEDULES:
+                self.rows[schedule] = dict([(name, data['%d.%s' % (schedule, name)]) for name in ['session', 'topic'] + COUNTS])
+
+    def get_num_sessions(self):
+        return len(self.session_ids)
+
+    def get_mask(self, schedule, topic='all'):
+        """
+        Returns the boolean mask of the rows of a topic, or of all the rows.
+        """
+        if topic == 'all':
+            return np.ones(len(self.rows[schedule]['session']), dtype=bool)
+        if topic not in self.topics:
+            return np.zeros(len(self.rows[schedule]['session']), dtype=bool)
+        return self.rows[schedule]['topic'] == self.topics.index(topic)
+
+    def get_counts(self, schedule, mask=None):
+        """
+        Returns the (rows x 5) matrix of the N, correct, tp, fp and fn counts of the rows of a schedule.
+        """
+        rows = self.rows[schedule]
+        counts = np.stack([np.ones(len(rows['session']), dtype=np.float64)] + [rows[name].astype(np.float64) for name in COUNTS], axis=1)
+        if mask is not None:
+            counts = counts[mask]
+        return counts
+
+    def get_session_counts(self, schedule, mask=None):
+        """
+        Returns the (sessions x 5) matrix of the counts summed by session.
+        """
+        sessions = self.rows[schedule]['session']
+        if mask is not None:
+            sessions = sessions[mask]
+        counts = self.get_counts(schedule, mask)
+        return np.stack([np.bincount(sessions, weights=counts[:, i], minlength=self.get_num_sessions()) for i in range(counts.shape[1])], axis=1)
+
+
+def get_metrics(totals):
+    """
+    Returns a dict of the arrays of acc, precision, recall and f1 for an array of the N, correct, tp, fp and fn totals along its last axis,
+    with NaN where a metric is undefined, as the results of the stat classes.
+    """
+    totals = np.asarray(totals, dtype=np.float64)
+    n, correct, tp, fp, fn = [totals[..., i] for i in range(5)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        acc = np.where(n > 0, correct / n, np.nan)
+        precision = np.where(tp + fp > 0, tp / (tp + fp), np.nan)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), np.nan)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), np.nan)
+    return {'acc': acc, 'precision': precision, 'recall': recall, 'f1': f1}
+
+
+def get_resample_weights(num_sessions, num_samples, seed):
+    """
+    Returns the (samples x sessions) matrix of the number of times each session is drawn in each resample of the sessions with replacement.
+    """
+    random_state = np.random.RandomState(seed)
+    return random_state.multinomial(num_sessions, [1.0 / num_sessions] * num_sessions, size=num_samples).astype(np.float64)
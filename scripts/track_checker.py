@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module provides the common part of the checkers for the main and pilot tasks.
+A checker validates each session of a system output, either sequentially or concurrently in a pool of processes,
+and then its top-level fields, which are all known once the sessions have been read, without another pass over the output.
+The errors can be printed as soon as they are found, and the check can stop after a given number of errors.
+"""
+
+from multiprocessing import Pool
+from itertools import izip, islice
+from dataset_walker import Call
+
+
+class TooManyErrors(Exception):
+    pass
+
+
+class BaseTrackChecker(object):
+    def __init__(self, sessions, tracker_output, max_errors=None, stream=False):
+        self.sessions = sessions
+        self.tracker_output = tracker_output
+        self.errors = []
+        self.max_errors = max_errors
+        self.stream = stream
+        self.stopped = False
+
+    def __getstate__(self):
+        # the workers only need what is required to check a single session
+        state = dict(self.__dict__)
+        state['tracker_output'] = None
+        state['errors'] = []
+        return state
+
+    def add_error(self, context, error_str):
+        self.errors.append((context, error_str))
+        if self.stream:
+            self.print_error(context, error_str)
+        if self.max_errors is not None and len(self.errors) >= self.max_errors:
+            raise TooManyErrors()
+
+    def format_context(self, context):
+        return " ".join(map(str, context))
+
+    def print_error(self, context, error):
+        print self.format_context(context), "-", error
+
+    def print_errors(self):
+        if len(self.errors) == 0:
+            print "Found no errors, trackfile is valid"
+        elif self.stopped:
+            print "Found %d errors, stopped checking" % len(self.errors)
+        else:
+            print "Found %d errors:" % len(self.errors)
+        if not self.stream:
+            for context, error in self.errors:
+                self.print_error(context, error)
+
+    def check_top_level(self):
+        pass
+
+    def check_session(self, session, track_session):
+        pass
+
+    def check(self, jobs=1):
+        try:
+            if jobs > 1:
+                self.__check_sessions_parallel(jobs)
+            else:
+                # the track sessions come first, so that izip runs them to their end, where the values after them are recorded
+                for track_session, session in izip(self.tracker_output["sessions"], self.sessions):
+                    self.check_session(session, track_session)
+            self.check_top_level()
+        except TooManyErrors:
+            self.stopped = True
+
+    def __check_sessions_parallel(self, jobs):
+        job_iter = ((filenames, track_session) for track_session, filenames in izip(self.tracker_output["sessions"], self.sessions.iter_filenames()))
+
+        pool = Pool(jobs, initializer=_init_worker, initargs=(self,))
+        try:
+            while True:
+                # the pool would queue all the sessions at once, so they are handed over a few at a time to bound the memory
+                job_list = list(islice(job_iter, jobs * 4))
+                if len(job_list) == 0:
+                    break
+                # imap keeps the order of the sessions, while the errors are reported as soon as each session is done
+                for errors in pool.imap(_check_session_job, job_list):
+                    for context, error in errors:
+                        self.add_error(context, error)
+        except:
+            pool.terminate()
+            raise
+        else:
+            pool.close()
+        finally:
+            pool.join()
+
+
+_worker_checker = None
+
+
+def _init_worker(checker):
+    global _worker_checker
+    _worker_checker = checker
+    _worker_checker.max_errors = None
+    _worker_checker.stream = False
+
+
+def _check_session_job(job):
+    (session_dirname, applog_filename, _, labels_filename), track_session = job
+
+    session = Call(applog_filename, None, labels_filename)
+    session.dirname = session_dirname
+
+    _worker_checker.errors = []
+    _worker_checker.check_session(session, track_session)
+    return _worker_checker.errors
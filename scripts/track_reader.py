@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module reads a tracker output incrementally, one session at a time, instead of loading the whole file with json.load.
+The top-level values other than the sessions (dataset, wall_time, ...) can appear before or after the list of sessions.
+The ones after it are recorded while the sessions are iterated, so that they only need another pass over the file
+when they are read before the iteration is over.
+Only a single session is kept in memory at once.
+"""
+
+import json
+import codecs
+
+_WHITESPACE = u' \t\n\r'
+_DELIMITERS = _WHITESPACE + u',:]}'
+
+
+class _Scanner(object):
+    def __init__(self, fp, chunk_size):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json_decoder = json.JSONDecoder()
+        self.buf = u''
+        self.pos = 0
+        self.eof = False
+
+    def __fill(self, size):
+        if self.eof:
+            return False
+        data = self.fp.read(size)
+        if len(data) == 0:
+            self.eof = True
+        self.buf = self.buf[self.pos:] + self.decoder.decode(data, self.eof)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.__fill(self.chunk_size):
+                raise ValueError('Unexpected end of the track file')
+
+    def expect(self, ch):
+        if self.peek() != ch:
+            raise ValueError('Expected %s at the top level of the track file, found %s' % (ch, self.peek()))
+        self.pos += 1
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buf, self.pos)
+                # a number may continue in the next chunk, so the value must be followed by a delimiter
+                if self.eof or (end < len(self.buf) and self.buf[end] in _DELIMITERS):
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            # the value is not complete yet, read as much as is buffered so that each value is decoded only a few times
+            self.__fill(max(self.chunk_size, len(self.buf) - self.pos))
+
+
+class TrackSessions(object):
+    def __init__(self, reader):
+        self.reader = reader
+
+    def __len__(self):
+        return self.reader.get_num_sessions()
+
+    def __iter__(self):
+        return self.reader.iter_sessions()
+
+
+class TrackReader(object):
+    """
+    Dict-like access to a tracker output, where reader["sessions"] can be iterated and measured but is never held in memory.
+    The values before the list of sessions are read without decoding the sessions, and the values after it
+    and the number of sessions are recorded by the iteration over the sessions.
+    A value after the sessions, or the number of sessions, which is needed before the sessions have all been iterated
+    is found with one more pass over the file, which is only done once.
+    """
+    def __init__(self, filename, chunk_size=1 << 20):
+        self.filename = filename
+        self.chunk_size = chunk_size
+        # the values before the sessions, and whether the file has a list of sessions
+        self.prefix = None
+        self.has_sessions = False
+        # all the values and the number of sessions, once the whole file has been read
+        self.header = None
+        self.num_sessions = None
+
+    def __iter_items(self):
+        # yields (key, value, False) for the top-level values, and (u'sessions', iterator, True) for the list of sessions
+        with open(self.filename, 'rb') as fp:
+            scanner = _Scanner(fp, self.chunk_size)
+            scanner.expect(u'{')
+            if scanner.peek() == u'}':
+                return
+            while True:
+                key = scanner.decode()
+                scanner.expect(u':')
+                if key == u'sessions' and scanner.peek() == u'[':
+                    yield key, self.__iter_list(scanner), True
+                else:
+                    yield key, scanner.decode(), False
+                if scanner.peek() == u'}':
+                    return
+                scanner.expect(u',')
+
+    def __iter_list(self, scanner):
+        scanner.expect(u'[')
+        if scanner.peek() == u']':
+            scanner.expect(u']')
+            return
+        while True:
+            yield scanner.decode()
+            if scanner.peek() == u']':
+                scanner.expect(u']')
+                return
+            scanner.expect(u',')
+
+    def iter_sessions(self):
+        header = {}
+        num_sessions = None
+        for key, value, is_sessions in self.__iter_items():
+            if is_sessions:
+                if self.prefix is None:
+                    self.prefix = dict(header)
+                    self.has_sessions = True
+                num_sessions = 0
+                for session in value:
+                    num_sessions += 1
+                    yield session
+            else:
+                header[key] = value
+        # the whole file has been read, so the header is known without another pass
+        self.header = header
+        self.num_sessions = num_sessions
+        if self.prefix is None:
+            self.prefix = dict(header)
+
+    def __load_prefix(self):
+        # reads the values up to the list of sessions, which is not decoded
+        if self.prefix is not None:
+            return
+        prefix = {}
+        for key, value, is_sessions in self.__iter_items():
+            if is_sessions:
+                self.has_sessions = True
+                break
+            prefix[key] = value
+        else:
+            self.header = dict(prefix)
+        self.prefix = prefix
+
+    def __load_header(self):
+        if self.header is None:
+            for _ in self.iter_sessions():
+                pass
+
+    def get_num_sessions(self):
+        self.__load_header()
+        if self.num_sessions is None:
+            raise KeyError('sessions')
+        return self.num_sessions
+
+    def __contains__(self, key):
+        self.__load_prefix()
+        if key == 'sessions' and self.has_sessions:
+            return True
+        if key in self.prefix:
+            return True
+        self.__load_header()
+        return key in self.header
+
+    def __getitem__(self, key):
+        self.__load_prefix()
+        if key == 'sessions' and self.has_sessions:
+            return TrackSessions(self)
+        if key in self.prefix:
+            return self.prefix[key]
+        self.__load_header()
+        return self.header[key]
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""
+Load generator for tracker_service.py.
+
+It replays the sessions of a dataset against a running service over several concurrent connections, one utterance at a time as in a live dialog,
+and reports the throughput and the percentiles of the latency observed by the clients.
+The responses can be written as a tracker output, to be checked and scored against the offline baseline.
+"""
+
+import argparse
+import sys
+import json
+import time
+import socket
+import threading
+
+import dataset_walker
+from profiler import percentile, PERCENTILES
+
+
+class SessionReplayer(threading.Thread):
+    def __init__(self, host, port, calls):
+        threading.Thread.__init__(self)
+        self.host = host
+        self.port = port
+        self.calls = calls
+        self.latencies = []
+        self.sessions = []
+        self.error = None
+
+    def run(self):
+        try:
+            conn = socket.create_connection((self.host, self.port))
+            rfile = conn.makefile('rb')
+            wfile = conn.makefile('wb')
+            try:
+                for call in self.calls:
+                    self.sessions.append(self.__replay(call, rfile, wfile))
+            finally:
+                rfile.close()
+                wfile.close()
+                conn.close()
+        except Exception, e:
+            self.error = e
+
+    def __request(self, request, rfile, wfile):
+        wfile.write(json.dumps(request) + '\n')
+        wfile.flush()
+        response = json.loads(rfile.readline())
+        if 'error' in response:
+            raise RuntimeError('Tracker service error: %s' % (response['error'],))
+        return response
+
+    def __replay(self, call, rfile, wfile):
+        session_id = call.log['session_id']
+        this_session = {'session_id': session_id, 'utterances': []}
+        for (utter, translations, _) in call:
+            start_time = time.time()
+            response = self.__request({'session_id': session_id, 'utterance': utter, 'translations': translations}, rfile, wfile)
+            self.latencies.append(time.time() - start_time)
+
+            del response['session_id']
+            this_session['utterances'].append(response)
+        self.__request({'session_id': session_id, 'end': True}, rfile, wfile)
+        return this_session
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Load generator for the online tracker service.')
+    parser.add_argument('--dataset', dest='dataset', action='store', metavar='DATASET', required=True, help='The dataset to replay')
+    parser.add_argument('--dataroot', dest='dataroot', action='store', required=True, metavar='PATH', help='Will look for corpus in <destroot>/<dataset>/...')
+    parser.add_argument('--port', dest='port', action='store', type=int, required=True, metavar='PORT', help='Port of the tracker service')
+    parser.add_argument('--host', dest='host', action='store', default='127.0.0.1', metavar='HOST', help='Address of the tracker service')
+    parser.add_argument('--concurrency', dest='concurrency', action='store', type=int, default=4, metavar='N', help='Number of sessions replayed at the same time')
+    parser.add_argument('--trackfile', dest='trackfile', action='store', metavar='JSON_FILE', help='File to write with the responses as a tracker output')
+
+    args = parser.parse_args()
+
+    calls = list(dataset_walker.dataset_walker(args.dataset, dataroot=args.dataroot, labels=False, translations=True))
+    replayers = [SessionReplayer(args.host, args.port, calls[i::args.concurrency]) for i in range(args.concurrency)]
+
+    start_time = time.time()
+    for replayer in replayers:
+        replayer.start()
+    for replayer in replayers:
+        replayer.join()
+    elapsed_time = time.time() - start_time
+
+    for replayer in replayers:
+        if replayer.error is not None:
+            raise RuntimeError('Replaying failed: %s' % (replayer.error,))
+
+    latencies = sorted(sum([replayer.latencies for replayer in replayers], []))
+    print '%25s : %d' % ('sessions', len(calls))
+    print '%25s : %d' % ('utterances', len(latencies))
+    print '%25s : %d' % ('concurrency', args.concurrency)
+    print '%25s : %.7f' % ('wall_time', elapsed_time)
+    print '%25s : %.7f' % ('utterances_per_second', len(latencies) / elapsed_time)
+    for p in PERCENTILES:
+        print '%25s : %.7f' % ('latency.p%d' % (p,), percentile(latencies, p))
+
+    if args.trackfile is not None:
+        sessions = dict([(session['session_id'], session) for replayer in replayers for session in replayer.sessions])
+        track = {'dataset': args.dataset, 'wall_time': elapsed_time, 'sessions': [sessions[call.log['session_id']] for call in calls]}
+        with open(args.trackfile, 'wb') as track_file:
+            json.dump(track, track_file, indent=4)
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""
+Online service for the baseline tracker of the main task.
+
+The ontology is loaded once, and the service keeps a tracker for each dialog session it is fed, so that each utterance is answered
+with the current frame as soon as it arrives instead of running over a whole dataset.
+The requests and responses are JSON objects, one per line, read from stdin and written to stdout, or exchanged over a local TCP socket with --port.
+
+A request gives the session_id, the utterance as in log.json and optionally its translations as in translations.json:
+    {"session_id": 1, "utterance": {"utter_index": 0, "transcript": ..., "segment_info": {...}}, "translations": {"translated": [...]}}
+and is answered with the output of the tracker for the utterance and the time taken to track it:
+    {"session_id": 1, "utter_index": 0, "frame_label": {...}, "wall_time": 0.0012}
+A request {"session_id": 1, "end": true} discards the state of a finished session.
+"""
+
+import argparse
+import sys
+import json
+import time
+import threading
+from collections import OrderedDict
+
+import ontology_reader
+from baseline import BaselineMethod1, BaselineMethod2
+from ontology_matcher import CandidateIndex
+from line_server import serve_lines, JSONLineServer
+
+
+class TrackerService(object):
+    def __init__(self, method, ontology_filename, max_sessions=1000, nbest=1):
+        self.method = method
+        self.nbest = nbest
+        ontology = ontology_reader.OntologyReader(ontology_filename)
+        # the candidate index is built once and shared by the trackers of all the sessions
+        if method == '1':
+            self.tagsets = ontology.get_tagsets()
+            self.index = CandidateIndex.from_tagsets(self.tagsets)
+        elif method == '2':
+            self.tagsets = ontology.get_translated_tagsets()
+            self.index = CandidateIndex.from_translated_tagsets(self.tagsets, nbest)
+        else:
+            raise RuntimeError('Wrong method: %s' % (method,))
+        self.max_sessions = max_sessions
+        # the tracker and the lock of each session, where the least recently used session is dropped first when there are too many
+        self.sessions = OrderedDict()
+        # the lock of the sessions only guards the dict, so that the utterances of different sessions are tracked concurrently
+        self.lock = threading.Lock()
+
+    def __get_session(self, session_id):
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            if self.method == '1':
+                tracker = BaselineMethod1(self.tagsets, self.nbest, self.index)
+            else:
+                tracker = BaselineMethod2(self.tagsets, self.nbest, self.index)
+            session = (tracker, threading.Lock())
+            while len(self.sessions) >= self.max_sessions:
+                self.sessions.popitem(last=False)
+        self.sessions[session_id] = session
+        return session
+
+    def get_num_sessions(self):
+        return len(self.sessions)
+
+    def handle(self, request):
+        session_id = request['session_id']
+        if request.get('end', False):
+            with self.lock:
+                self.sessions.pop(session_id, None)
+            return {'session_id': session_id, 'end': True}
+
+        utter = request['utterance']
+        translations = request.get('translations', {'translated': []})
+
+        with self.lock:
+            tracker, session_lock = self.__get_session(session_id)
+        # the utterances of a session are tracked one at a time, in the order in which they get the lock of the session
+        with session_lock:
+            start_time = time.time()
+            result = tracker.addUtter(utter, translations)
+            # the frame is serialised before the lock is released, since the tracker keeps updating it
+            response = json.loads(json.dumps(result))
+            response['wall_time'] = time.time() - start_time
+        response['session_id'] = session_id
+        return response
+
+    def handle_line(self, line):
+        try:
+            response = self.handle(json.loads(line))
+        except Exception, e:
+            response = {'error': '%s: %s' % (e.__class__.__name__, e)}
+        return json.dumps(response)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Online service for the baseline tracker.')
+    parser.add_argument('--ontology', dest='ontology', action='store', metavar='JSON_FILE', required=True, help='JSON Ontology file')
+    parser.add_argument('--method', dest='method', action='store', choices=['1', '2'], required=True, help='Baseline mode')
+    parser.add_argument('--nbest', dest='nbest', action='store', type=int, default=1, metavar='N', help='Number of translations to match: of the utterances for method 1, of the ontology entries for method 2')
+    parser.add_argument('--port', dest='port', action='store', type=int, metavar='PORT', help='Serve on a TCP port instead of stdin and stdout')
+    parser.add_argument('--host', dest='host', action='store', default='127.0.0.1', metavar='HOST', help='Address to listen on with --port')
+    parser.add_argument('--max-sessions', dest='max_sessions', action='store', type=int, default=1000, metavar='N', help='Number of sessions to keep the state of')
+
+    args = parser.parse_args()
+
+    sys.stderr.write('Loading ontology ... ')
+    service = TrackerService(args.method, args.ontology, args.max_sessions, args.nbest)
+    sys.stderr.write('Done\n')
+
+    if args.port is None:
+        serve_lines(service, sys.stdin, sys.stdout)
+    else:
+        server = JSONLineServer((args.host, args.port), service)
+        sys.stderr.write('Listening on %s:%d\n' % server.server_address)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        server.server_close()
+
+if __name__ == "__main__":
+    main(sys.argv)